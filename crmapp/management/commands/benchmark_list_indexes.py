@@ -0,0 +1,162 @@
+import random
+import re
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from deals.models import Deal
+from leads.models import Lead
+from tasks.models import Task
+
+User = get_user_model()
+
+# Composite indexes added for the list endpoints (leads 0004, deals 0002, tasks 0003)
+LIST_INDEXES = [
+    'lead_owner_created_idx', 'lead_owner_stage_created_idx', 'lead_owner_status_created_idx',
+    'deal_owner_created_idx', 'deal_owner_stage_created_idx', 'deal_owner_status_created_idx',
+    'task_creator_created_idx', 'task_assignee_created_idx',
+    'task_creator_stage_idx', 'task_assignee_stage_idx',
+]
+
+EXECUTION_TIME = re.compile(r'Execution Time: ([\d.]+) ms')
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic leads, deals and tasks inside a transaction and compare the list "
+        "query plans with and without the composite list indexes. Everything is rolled "
+        "back afterwards, but DROP INDEX locks the tables meanwhile: never run against production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=200000,
+            help="Rows seeded per model",
+        )
+        parser.add_argument(
+            '--owners', type=int, default=50,
+            help="Number of synthetic owners the rows are spread across",
+        )
+        parser.add_argument(
+            '--full-plans', action='store_true',
+            help="Print complete EXPLAIN ANALYZE output instead of only the scan and sort nodes",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("The benchmark reads PostgreSQL query plans; run it against PostgreSQL.")
+        if options['rows'] < 1 or options['owners'] < 1:
+            raise CommandError("--rows and --owners must be at least 1.")
+
+        try:
+            with transaction.atomic():
+                owner = self._seed(options['rows'], options['owners'])
+                queries = self._queries(owner)
+
+                with_indexes = self._explain(queries)
+                self._drop_list_indexes()
+                without_indexes = self._explain(queries)
+
+                for label in queries:
+                    self._report(label, without_indexes[label], with_indexes[label], options['full_plans'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished; seeded rows and dropped indexes rolled back."))
+
+    def _seed(self, rows, owners):
+        started = time.monotonic()
+        users = User.objects.bulk_create([
+            User(username=f'bench-{i}-{random.getrandbits(32)}', email=f'bench{i}@example.com')
+            for i in range(owners)
+        ])
+        user_ids = [user.id for user in users]
+
+        def pick(choices):
+            return random.choice(choices)[0]
+
+        for start in range(0, rows, 5000):
+            size = min(5000, rows - start)
+            Lead.objects.bulk_create([
+                Lead(
+                    name=f'Lead {start + i}',
+                    owner_id=random.choice(user_ids),
+                    stage=pick(Lead.STAGE_CHOICES),
+                    status=pick(Lead.STATUS_CHOICES),
+                ) for i in range(size)
+            ])
+            Deal.objects.bulk_create([
+                Deal(
+                    title=f'Deal {start + i}',
+                    owner_id=random.choice(user_ids),
+                    stage=pick(Deal.STAGE_CHOICES),
+                    status=pick(Deal.STATUS_CHOICES),
+                ) for i in range(size)
+            ])
+            Task.objects.bulk_create([
+                Task(
+                    title=f'Task {start + i}',
+                    created_by_id=random.choice(user_ids),
+                    assigned_to_id=random.choice(user_ids),
+                    stage=pick(Task.STAGE_CHOICES),
+                ) for i in range(size)
+            ])
+
+        # auto_now_add stamps every row alike; spread creation over two years
+        with connection.cursor() as cursor:
+            for table in (Lead._meta.db_table, Deal._meta.db_table, Task._meta.db_table):
+                cursor.execute(
+                    f"UPDATE {table} SET created_at = now() - random() * interval '730 days' "
+                    f"WHERE created_at >= %s",
+                    [users[0].date_joined],
+                )
+                cursor.execute(f"ANALYZE {table}")
+
+        self.stdout.write(f"Seeded {rows} rows per model across {owners} owners in {time.monotonic() - started:.1f}s.")
+        return users[0]
+
+    def _queries(self, owner):
+        """The list queries issued by the lead, deal and task endpoints"""
+        leads = Lead.objects.filter(owner=owner).order_by('-created_at', '-id')
+        deals = Deal.objects.filter(owner=owner)
+        tasks = Task.objects.filter(Q(created_by=owner) | Q(assigned_to=owner))
+        return {
+            'leads (first page)': leads[:26],
+            'leads by stage': leads.filter(stage='Interested')[:26],
+            'leads by status': leads.filter(status='Active')[:26],
+            'deals': deals,
+            'deals by stage': deals.filter(stage='Orders'),
+            'deals by status': deals.filter(status='Open'),
+            'tasks': tasks,
+            'tasks by stage': tasks.filter(stage='To Do'),
+        }
+
+    def _explain(self, queries):
+        return {label: queryset.explain(analyze=True) for label, queryset in queries.items()}
+
+    def _drop_list_indexes(self):
+        with connection.cursor() as cursor:
+            for name in LIST_INDEXES:
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+
+    def _report(self, label, before, after, full_plans):
+        def timing(plan):
+            match = EXECUTION_TIME.search(plan)
+            return float(match.group(1)) if match else float('nan')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{label}: {timing(before):.2f} ms -> {timing(after):.2f} ms"
+        ))
+        for title, plan in (('without indexes', before), ('with indexes', after)):
+            shown = plan if full_plans else '\n'.join(
+                line.strip() for line in plan.splitlines() if 'Scan' in line or 'Sort' in line
+            )
+            self.stdout.write(f"  {title}:\n    " + shown.replace('\n', '\n    '))
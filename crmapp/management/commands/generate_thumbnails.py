@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from crmbackend.thumbnails import generate_thumbnails
+from leads.models import Lead
+from tasks.models import Task
+
+MODELS = {'leads': Lead, 'tasks': Task}
+
+
+class Command(BaseCommand):
+    help = (
+        "Render missing image thumbnails for leads and tasks (backfill, or the worker "
+        "for deployments with THUMBNAILS_IN_BACKGROUND=False)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', choices=sorted(MODELS), action='append', dest='models',
+            help="Only process the given model (may be repeated)",
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Re-render thumbnails that already exist as well",
+        )
+
+    def handle(self, *args, **options):
+        for label in options['models'] or sorted(MODELS):
+            model = MODELS[label]
+            rows = model.objects.exclude(image='').exclude(image__isnull=True)
+            if not options['all']:
+                rows = rows.filter(image_thumbnails={})
+
+            done = failed = 0
+            for pk in rows.order_by('pk').values_list('pk', flat=True).iterator():
+                if generate_thumbnails(model, pk):
+                    done += 1
+                else:
+                    failed += 1
+            self.stdout.write(f"{label}: {done} rendered, {failed} failed.")
+
+        self.stdout.write(self.style.SUCCESS("Thumbnails generated."))
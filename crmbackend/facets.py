@@ -0,0 +1,42 @@
+"""
+Facet counts for filter sidebars.
+
+All facet fields are grouped in one query; the per-facet counts are then
+summed in Python. As usual for facets, the count for each value of a field
+honours the other fields' selections but not its own, so a sidebar shows what
+selecting an alternative value would return.
+"""
+import hashlib
+
+from django.db.models import Count
+
+
+def facet_counts(queryset, choices, selected=None):
+    """
+    choices: {field: model choices}, selected: {field: predicate(value)}.
+    Returns {'total': matching rows, 'facets': {field: {value: count}}}.
+    """
+    selected = selected or {}
+    rows = list(queryset.order_by().values(*choices).annotate(count=Count('pk')))
+
+    def matches(row, skip=None):
+        return all(predicate(row[field]) for field, predicate in selected.items() if field != skip)
+
+    facets = {}
+    for field, field_choices in choices.items():
+        counts = {value: 0 for value, _ in field_choices}
+        for row in rows:
+            if matches(row, skip=field):
+                counts[row[field]] = counts.get(row[field], 0) + row['count']
+        facets[field] = counts
+
+    return {
+        'total': sum(row['count'] for row in rows if matches(row)),
+        'facets': facets,
+    }
+
+
+def params_digest(query_params, names):
+    """Stable short hash of the given query parameters, for cache keys"""
+    raw = '&'.join(f'{name}={query_params.get(name, "")}' for name in sorted(names))
+    return hashlib.md5(raw.encode()).hexdigest()[:16]
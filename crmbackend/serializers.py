@@ -0,0 +1,24 @@
+from rest_framework import serializers
+
+
+class ThumbnailsField(serializers.ReadOnlyField):
+    """{size: {format: url}} from a <image_field>_thumbnails column; {} while pending"""
+
+    def __init__(self, image_field='image', **kwargs):
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return {}
+        storage = self.parent.Meta.model._meta.get_field(self.image_field).storage
+        request = self.context.get('request')
+
+        def url(name):
+            location = storage.url(name)
+            return request.build_absolute_uri(location) if request else location
+
+        return {
+            size: {image_format: url(name) for image_format, name in formats.items()}
+            for size, formats in value.items()
+        }
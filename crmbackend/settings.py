@@ -150,6 +150,56 @@ else:
     }
 
 
+# ======================
+# CACHE
+# ======================
+# Per-process memory cache by default; set REDIS_URL to share entries across workers
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Versioned dashboard and facet caching needs a cache shared by every worker:
+# on by default only with Redis, since LocMem versions are per process
+DASHBOARD_CACHE_ENABLED = os.getenv('DASHBOARD_CACHE_ENABLED', str(bool(os.getenv('REDIS_URL')))) == 'True'
+
+# Seconds a cached dashboard summary may be served before it is rebuilt
+DASHBOARD_SUMMARY_CACHE_TTL = int(os.getenv('DASHBOARD_SUMMARY_CACHE_TTL', '60'))
+DASHBOARD_ACTIVITY_SUMMARY_CACHE_TTL = int(os.getenv('DASHBOARD_ACTIVITY_SUMMARY_CACHE_TTL', '30'))
+
+# Optional write-behind buffering for single activity log requests
+DASHBOARD_ACTIVITY_BUFFER_ENABLED = os.getenv('DASHBOARD_ACTIVITY_BUFFER_ENABLED', 'False') == 'True'
+DASHBOARD_ACTIVITY_BUFFER_SIZE = int(os.getenv('DASHBOARD_ACTIVITY_BUFFER_SIZE', '200'))
+DASHBOARD_ACTIVITY_BUFFER_INTERVAL = float(os.getenv('DASHBOARD_ACTIVITY_BUFFER_INTERVAL', '2'))
+# Failed flushes are retried this many times before the events are dropped and counted
+DASHBOARD_ACTIVITY_BUFFER_RETRIES = int(os.getenv('DASHBOARD_ACTIVITY_BUFFER_RETRIES', '5'))
+
+# Activities older than this are moved out by archive_dashboard_activities
+DASHBOARD_ACTIVITY_RETENTION_DAYS = int(os.getenv('DASHBOARD_ACTIVITY_RETENTION_DAYS', '90'))
+
+# Lead imports run in a background thread of the web process; set to False to
+# leave jobs pending for the process_lead_imports command instead. Schedule that
+# command either way: it also resumes imports whose process died mid-run.
+LEAD_IMPORT_IN_BACKGROUND = os.getenv('LEAD_IMPORT_IN_BACKGROUND', 'True') == 'True'
+LEAD_IMPORT_CHUNK_SIZE = int(os.getenv('LEAD_IMPORT_CHUNK_SIZE', '2000'))
+
+# Render image thumbnails in a background thread; set False to leave them to
+# the generate_thumbnails command
+THUMBNAILS_IN_BACKGROUND = os.getenv('THUMBNAILS_IN_BACKGROUND', 'True') == 'True'
+
+# Country code assumed for lead phone numbers without an international prefix
+LEAD_DEFAULT_PHONE_COUNTRY_CODE = os.getenv('LEAD_DEFAULT_PHONE_COUNTRY_CODE', '1')
+
+
 # ======================
 # TEMPLATES
 # ======================
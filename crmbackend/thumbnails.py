@@ -0,0 +1,183 @@
+"""
+Thumbnails for uploaded images.
+
+After a new image is committed, a background thread renders each size in
+THUMBNAIL_SIZES as WebP and JPEG, without EXIF or other metadata. The files
+are saved next to the original (leads/photo.png -> leads/photo_png_256.webp),
+under whatever free name storage.save picks, and their names are recorded in
+the model's <field>_thumbnails JSON column. Only names a row recorded itself
+are ever deleted, so rows whose originals share a stem cannot clobber each
+other's thumbnails or originals. Serializers expose them through
+crmbackend.serializers.ThumbnailsField. Until the column is filled, clients
+fall back to the original image.
+"""
+import io
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Bounding box (longest side, in pixels) per size name
+THUMBNAIL_SIZES = {'small': 64, 'medium': 256, 'large': 768}
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def thumbnail_name(name, size, image_format):
+    """Preferred name; keeps the source extension so photo.png and photo.jpg differ"""
+    root, extension = os.path.splitext(name)
+    source = f'_{extension.lstrip(".").lower()}' if extension else ''
+    return f'{root}{source}_{THUMBNAIL_SIZES[size]}.{EXTENSIONS[image_format]}'
+
+
+def has_new_upload(field_file):
+    """True for a file assigned to the field but not written to storage yet"""
+    return bool(field_file) and not field_file._committed
+
+
+def thumbnail_names(thumbnails):
+    """Every file name recorded in a <field>_thumbnails value"""
+    return [name for formats in (thumbnails or {}).values() for name in formats.values()]
+
+
+def delete_thumbnails(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError as exc:
+            logger.warning("Could not delete thumbnail %s: %s", name, exc)
+
+
+def prepare_thumbnails(instance, save_kwargs, field_name='image'):
+    """
+    Call from save() before saving; returns True when thumbnails need scheduling.
+
+    <field>_thumbnails is reset only when a new upload replaces the image or the
+    stored image is cleared, and the old thumbnail files are deleted once the
+    save commits. Otherwise the column is kept out of the UPDATE, so saving a
+    stale instance cannot wipe thumbnails recorded by the background thread.
+    """
+    column = f'{field_name}_thumbnails'
+    field_file = getattr(instance, field_name)
+    uploaded = has_new_upload(field_file)
+    if instance._state.adding or save_kwargs.get('force_insert'):
+        if uploaded or not field_file:
+            setattr(instance, column, {})
+        return uploaded
+
+    update_fields = save_kwargs.get('update_fields')
+    if update_fields is not None and field_name not in update_fields:
+        return False
+
+    stored = None
+    if uploaded or not field_file:
+        stored = type(instance)._base_manager.filter(pk=instance.pk).values(field_name, column).first()
+    if uploaded or (stored and stored[field_name]):
+        setattr(instance, column, {})
+        names = thumbnail_names(stored and stored[column])
+        if names:
+            storage = field_file.storage
+            # Registered before schedule_thumbnails, so this runs before rendering
+            transaction.on_commit(lambda: delete_thumbnails(storage, names))
+        if update_fields is not None:
+            save_kwargs['update_fields'] = set(update_fields) | {column}
+    elif update_fields is not None:
+        save_kwargs['update_fields'] = set(update_fields) - {column}
+    else:
+        save_kwargs['update_fields'] = [
+            field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name != column
+        ]
+    return uploaded
+
+
+def render_thumbnails(field_file):
+    """Write every size and format for field_file; returns {size: {format: name}}"""
+    with field_file.open('rb'):
+        with Image.open(field_file) as original:
+            # Apply the EXIF rotation before the metadata is dropped
+            image = ImageOps.exif_transpose(original)
+            image.load()
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    # JPEG has no alpha channel: flatten onto white
+    flat = image
+    if image.mode == 'RGBA':
+        flat = Image.new('RGB', image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel('A'))
+
+    storage = field_file.storage
+    thumbnails = {}
+    for size, pixels in THUMBNAIL_SIZES.items():
+        thumbnails[size] = {}
+        for image_format, (pil_format, options) in THUMBNAIL_FORMATS.items():
+            resized = (image if image_format == 'webp' else flat).copy()
+            resized.thumbnail((pixels, pixels), Image.LANCZOS)
+            buffer = io.BytesIO()
+            # New images carry no exif/icc/xmp unless passed explicitly
+            resized.save(buffer, pil_format, **options)
+
+            # Never overwrite: storage.save picks a free name if this one is taken
+            name = thumbnail_name(field_file.name, size, image_format)
+            thumbnails[size][image_format] = storage.save(name, ContentFile(buffer.getvalue()))
+    return thumbnails
+
+
+def generate_thumbnails(model, pk, field_name='image'):
+    """Render thumbnails for one row and record them unless the image changed meanwhile"""
+    column = f'{field_name}_thumbnails'
+    instance = model.objects.filter(pk=pk).only('pk', field_name, column).first()
+    field_file = getattr(instance, field_name, None)
+    if not field_file:
+        return None
+    try:
+        thumbnails = render_thumbnails(field_file)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        logger.warning("Could not create thumbnails for %s %s: %s", model._meta.label, pk, exc)
+        return None
+
+    recorded = model.objects.filter(
+        pk=pk, **{field_name: field_file.name, column: getattr(instance, column)}
+    ).update(**{column: thumbnails})
+    if not recorded:
+        # The image or its thumbnails changed meanwhile: these files belong to no row
+        delete_thumbnails(field_file.storage, thumbnail_names(thumbnails))
+        return None
+    # A re-render replaces the files this row recorded before
+    new_names = set(thumbnail_names(thumbnails))
+    delete_thumbnails(field_file.storage, [
+        name for name in thumbnail_names(getattr(instance, column)) if name not in new_names
+    ])
+    return thumbnails
+
+
+def _run_in_thread(model, pk, field_name):
+    close_old_connections()
+    try:
+        generate_thumbnails(model, pk, field_name)
+    except Exception:
+        logger.exception("Thumbnail generation for %s %s failed", model._meta.label, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule_thumbnails(instance, field_name='image'):
+    """Render thumbnails once the row is committed, unless the generate_thumbnails command does"""
+    if not getattr(settings, 'THUMBNAILS_IN_BACKGROUND', True):
+        return
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: threading.Thread(
+        target=_run_in_thread, args=(model, pk, field_name),
+        name=f'thumbnails-{model._meta.model_name}-{pk}', daemon=True,
+    ).start())
+
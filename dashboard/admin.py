@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import DashboardMetric, DashboardActivity, AISuggestion, MarketingPerformanceMetric
+from .models import (
+    DashboardMetric, DashboardActivity, DashboardActivityArchive,
+    AISuggestion, MarketingPerformanceMetric, PerformanceRollup,
+    LeadFunnelStat,
+)
+from .funnel import rebuild_funnel
 
 
 @admin.register(DashboardMetric)
@@ -12,9 +17,8 @@ class DashboardMetricAdmin(admin.ModelAdmin):
     actions = ['recalculate_metrics']
     
     def recalculate_metrics(self, request, queryset):
-        for metric in queryset:
-            metric.calculate_metrics()
-        self.message_user(request, f"Recalculated metrics for {queryset.count()} users.")
+        metrics = DashboardMetric.recalculate_bulk(queryset)
+        self.message_user(request, f"Recalculated metrics for {len(metrics)} users.")
     recalculate_metrics.short_description = "Recalculate selected metrics"
 
 
@@ -46,12 +50,21 @@ class DashboardActivityAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(DashboardActivityArchive)
+class DashboardActivityArchiveAdmin(admin.ModelAdmin):
+    list_display = ['user', 'activity_type', 'title', 'created_at', 'archived_at']
+    list_filter = ['activity_type', 'created_at']
+    search_fields = ['user__email', 'title']
+    readonly_fields = ['created_at', 'archived_at']
+
+
 @admin.register(AISuggestion)
 class AISuggestionAdmin(admin.ModelAdmin):
     list_display = ['user', 'suggestion_type', 'priority', 'title', 'confidence_score', 'is_actioned', 'created_at']
-    list_filter = ['suggestion_type', 'priority', 'is_actioned', 'created_at']
+    list_filter = ['suggestion_type', 'priority', 'is_actioned', 'is_generated', 'created_at']
     search_fields = ['user__email', 'title', 'description']
     readonly_fields = ['created_at']
+    raw_id_fields = ['leads', 'deals']
     
     fieldsets = (
         ('Suggestion Details', {
@@ -61,11 +74,11 @@ class AISuggestionAdmin(admin.ModelAdmin):
             'fields': ('confidence_score', 'metric_value', 'metric_change')
         }),
         ('Related Objects', {
-            'fields': ('lead_ids', 'deal_ids'),
+            'fields': ('leads', 'deals'),
             'classes': ('collapse',)
         }),
         ('Status', {
-            'fields': ('is_actioned', 'actioned_at', 'action_notes')
+            'fields': ('is_actioned', 'actioned_at', 'action_notes', 'is_generated')
         }),
         ('Timeline', {
             'fields': ('created_at', 'expires_at')
@@ -92,4 +105,27 @@ class MarketingPerformanceAdmin(admin.ModelAdmin):
         ('Performance', {
             'fields': ('conversion_rate', 'avg_deal_value')
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(PerformanceRollup)
+class PerformanceRollupAdmin(admin.ModelAdmin):
+    list_display = ['user', 'period_start', 'rank', 'percentile', 'won_value', 'deals_won', 'leads_created', 'computed_at']
+    list_filter = ['period_start']
+    search_fields = ['user__email']
+    readonly_fields = ['computed_at']
+
+
+@admin.register(LeadFunnelStat)
+class LeadFunnelStatAdmin(admin.ModelAdmin):
+    list_display = ['user', 'source', 'stage', 'reached', 'entered', 'exited', 'current']
+    list_filter = ['stage', 'source']
+    search_fields = ['user__email']
+    
+    actions = ['rebuild']
+    
+    def rebuild(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        rebuild_funnel(user_ids)
+        self.message_user(request, f"Rebuilt the lead funnel for {len(user_ids)} users.")
+    rebuild.short_description = "Rebuild funnel of selected users from the transition log"
@@ -0,0 +1,162 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from .cache import bump_user_version
+from .models import DashboardActivity
+
+logger = logging.getLogger(__name__)
+
+# Counts drops across workers with a shared cache (Redis), per process otherwise
+DROPPED_COUNT_KEY = 'dashboard:activity_buffer:dropped'
+
+
+def dropped_activity_count():
+    """Buffered activities dropped after failed flushes, as recorded in the cache"""
+    return cache.get(DROPPED_COUNT_KEY, 0)
+
+
+class ActivityBuffer:
+    """
+    In-process write-behind buffer for DashboardActivity rows.
+    Events are queued in memory and written with one bulk_create once the
+    buffer reaches max_size or flush_interval seconds have passed.
+
+    A failed write is requeued and retried by the flusher thread up to
+    max_retries times; only then, or when the queue outgrows max_pending
+    while the database is unavailable, are events dropped. Drops are logged
+    and counted in the cache.
+    """
+
+    def __init__(self, max_size=200, flush_interval=2.0, max_retries=5, max_pending=None):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_pending = max_pending or max_size * 50
+        self.dropped = 0
+        self._failures = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    @property
+    def pending(self):
+        """Number of events queued and not yet written"""
+        return len(self._pending)
+
+    def add(self, activity):
+        """Queue an unsaved DashboardActivity, flushing when the buffer is full"""
+        with self._lock:
+            self._pending.append(activity)
+            overflow = self._trim()
+            # While writes are failing, retries are left to the flusher's interval
+            full = len(self._pending) >= self.max_size and not self._failures
+        self._record_dropped(overflow)
+        if full:
+            self.flush()
+        else:
+            self._ensure_flusher()
+
+    def flush(self):
+        """Write all queued activities in a single bulk_create"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+
+        try:
+            # One transaction, so a retried batch never duplicates a partial write
+            with transaction.atomic():
+                DashboardActivity.objects.bulk_create(batch, batch_size=self.max_size)
+        except Exception:
+            with self._lock:
+                self._failures += 1
+                attempt = self._failures
+                retry = attempt <= self.max_retries
+                if retry:
+                    self._pending[:0] = batch
+                    dropped = self._trim()
+                else:
+                    self._failures = 0
+                    dropped = len(batch)
+            logger.exception(
+                "Failed to flush %d buffered dashboard activities (%s)",
+                len(batch), f"attempt {attempt}, will retry" if retry else "dropping them",
+            )
+            self._record_dropped(dropped)
+            if retry:
+                self._ensure_flusher()
+            return 0
+
+        with self._lock:
+            self._failures = 0
+        # bulk_create sends no post_save, so invalidate cached summaries here
+        for user_id in {activity.user_id for activity in batch}:
+            bump_user_version(user_id)
+        return len(batch)
+
+    def _trim(self):
+        """Drop the oldest events beyond max_pending; caller holds the lock"""
+        overflow = len(self._pending) - self.max_pending
+        if overflow <= 0:
+            return 0
+        del self._pending[:overflow]
+        return overflow
+
+    def _record_dropped(self, count):
+        if not count:
+            return
+        self.dropped += count
+        logger.error("Dropped %d buffered dashboard activities (%d by this process)", count, self.dropped)
+        try:
+            if not cache.add(DROPPED_COUNT_KEY, count, timeout=None):
+                cache.incr(DROPPED_COUNT_KEY, count)
+        except Exception:
+            logger.exception("Failed to record dropped dashboard activities")
+
+    def _ensure_flusher(self):
+        if self._flusher and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(
+                target=self._run, name='activity-buffer-flusher', daemon=True
+            )
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_activity_buffer():
+    """Return the process-wide buffer, or None when buffering is disabled"""
+    global _buffer
+    if not getattr(settings, 'DASHBOARD_ACTIVITY_BUFFER_ENABLED', False):
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ActivityBuffer(
+                    max_size=getattr(settings, 'DASHBOARD_ACTIVITY_BUFFER_SIZE', 200),
+                    flush_interval=getattr(settings, 'DASHBOARD_ACTIVITY_BUFFER_INTERVAL', 2.0),
+                    max_retries=getattr(settings, 'DASHBOARD_ACTIVITY_BUFFER_RETRIES', 5),
+                )
+                # Drain whatever is left when the worker shuts down cleanly
+                atexit.register(_buffer.flush)
+    return _buffer
@@ -0,0 +1,75 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+SUMMARY_CACHE_TTL = getattr(settings, 'DASHBOARD_SUMMARY_CACHE_TTL', 60)
+ACTIVITY_SUMMARY_CACHE_TTL = getattr(settings, 'DASHBOARD_ACTIVITY_SUMMARY_CACHE_TTL', 30)
+# Lead and deal writes bump the user's version, so facets can live longer
+FACETS_CACHE_TTL = getattr(settings, 'FACETS_CACHE_TTL', 300)
+
+
+def _version_key(user_id):
+    return f'dashboard:version:{user_id}'
+
+
+def get_user_version(user_id):
+    """Return the current dashboard data version for a user"""
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # Seed from the clock so an evicted key never reuses an old version;
+        # add() keeps concurrent initialisers consistent
+        version = time.time_ns() // 1000
+        cache.add(_version_key(user_id), version, timeout=None)
+        version = cache.get(_version_key(user_id), version)
+    return version
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached dashboard payload for a user"""
+    if user_id is None:
+        return
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        # Key missing (first write or evicted): reseed past any earlier version
+        cache.set(_version_key(user_id), time.time_ns() // 1000, timeout=None)
+
+
+def user_cache_key(prefix, user_id):
+    """Build a cache key stamped with the user's current data version"""
+    return f'dashboard:{prefix}:{user_id}:v{get_user_version(user_id)}'
+
+
+def invalidate_dashboard_cache(*user_ids):
+    """Bump cached dashboard versions once the current transaction commits"""
+    for user_id in set(user_ids):
+        if user_id is not None:
+            transaction.on_commit(lambda user_id=user_id: bump_user_version(user_id))
+
+
+def cache_enabled():
+    """
+    Versions live in the cache itself, so a bump is only seen by processes
+    sharing that cache. With a per-process cache (LocMem) under several
+    workers, caching stays off unless DASHBOARD_CACHE_ENABLED says otherwise.
+    """
+    return getattr(settings, 'DASHBOARD_CACHE_ENABLED', False)
+
+
+def get_or_build(prefix, user_id, build, timeout):
+    """
+    Return build() cached under the user's current data version. The key is
+    taken before building, so a write landing mid-build leaves the result
+    under an already stale key.
+    """
+    if not cache_enabled():
+        return build()
+    key = user_cache_key(prefix, user_id)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, timeout)
+    return data
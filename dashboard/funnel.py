@@ -0,0 +1,289 @@
+"""
+Lead funnel analytics.
+
+Lead saves that change the stage append a LeadStageTransition. The counters in
+LeadFunnelStat and the time-in-stage histogram in LeadStageDuration follow the
+log through F-expression deltas, as DashboardMetric does, so the funnel
+endpoint only reads a few small rows. rebuild_funnel() recomputes both from
+the log, after bulk writes that bypass the save signals and once at deploy
+time (the rebuild_lead_funnel command) for leads that existed before the log.
+"""
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef
+from django.utils import timezone
+
+from leads.models import Lead, LeadStageTransition
+from .models import LeadFunnelStat, LeadStageDuration
+
+User = get_user_model()
+
+# Stages in funnel order; Rejected is the drop-out and has no funnel rank
+FUNNEL_STAGES = ['New', 'Opened', 'Interested', 'Closed']
+FUNNEL_RANK = {stage: rank for rank, stage in enumerate(FUNNEL_STAGES)}
+REPORT_STAGES = FUNNEL_STAGES + ['Rejected']
+STAT_FIELDS = ['reached', 'entered', 'exited', 'current', 'seconds_in_stage']
+
+# Bin 0 is under an hour, bin k >= 1 starts at 2**(k-1) hours; the last bin is open-ended
+DURATION_BINS = 16
+BIN_EDGES_HOURS = np.concatenate([[0.0], 2.0 ** np.arange(DURATION_BINS - 1)])
+
+HISTORY_FIELDS = ['owner_id', 'source', 'from_stage', 'to_stage', 'seconds_in_previous_stage', 'transitioned_at']
+
+
+def duration_bin(seconds):
+    hours = max(seconds, 0) / 3600
+    return int(np.searchsorted(BIN_EDGES_HOURS, hours, side='right')) - 1
+
+
+def histogram_median(counts):
+    """Median hours of a duration histogram, interpolated within its bin"""
+    total = counts.sum()
+    if not total:
+        return None
+    cumulative = np.cumsum(counts)
+    k = int(np.searchsorted(cumulative, total / 2))
+    lower = BIN_EDGES_HOURS[k]
+    upper = BIN_EDGES_HOURS[k + 1] if k + 1 < DURATION_BINS else lower
+    fraction = (total / 2 - (cumulative[k] - counts[k])) / counts[k]
+    return round(float(lower + fraction * (upper - lower)), 2)
+
+
+class FunnelDeltas:
+    """Counter changes keyed by (user_id, source, stage)"""
+
+    def __init__(self):
+        self.stats = defaultdict(lambda: defaultdict(float))
+        self.durations = defaultdict(int)
+
+    def add_history(self, transitions, sign=1):
+        """Add (or with sign=-1 remove) what one lead's transitions, oldest first, contribute"""
+        furthest = -1
+        for transition in transitions:
+            owner_id, source = transition['owner_id'], transition['source']
+            from_stage, to_stage = transition['from_stage'], transition['to_stage']
+            rank = FUNNEL_RANK.get(to_stage, -1)
+            if owner_id is not None:
+                self.stats[(owner_id, source, to_stage)]['entered'] += sign
+                # Skipped stages count as reached: New -> Interested also passed Opened
+                for stage in FUNNEL_STAGES[furthest + 1:rank + 1]:
+                    self.stats[(owner_id, source, stage)]['reached'] += sign
+                if from_stage:
+                    key = (owner_id, source, from_stage)
+                    self.stats[key]['exited'] += sign
+                    seconds = transition['seconds_in_previous_stage']
+                    if seconds is not None:
+                        self.stats[key]['seconds_in_stage'] += sign * seconds
+                        self.durations[key + (duration_bin(seconds),)] += sign
+            furthest = max(furthest, rank)
+
+    def add_current(self, owner_id, source, stage, sign=1):
+        if owner_id is not None:
+            self.stats[(owner_id, source, stage)]['current'] += sign
+
+    def apply(self):
+        """Write the accumulated deltas with F-expression updates"""
+        for (user_id, source, stage), fields in self.stats.items():
+            _increment(LeadFunnelStat, fields, user_id=user_id, source=source, stage=stage)
+        for (user_id, source, stage, bin), count in self.durations.items():
+            _increment(LeadStageDuration, {'count': count}, user_id=user_id, source=source, stage=stage, bin=bin)
+
+
+def _increment(model, deltas, **key):
+    updates = {field: F(field) + value for field, value in deltas.items() if value}
+    if not updates or model.objects.filter(**key).update(**updates):
+        return
+    model.objects.bulk_create([model(**key)], ignore_conflicts=True)
+    model.objects.filter(**key).update(**updates)
+
+
+def lead_history(lead_id):
+    return list(
+        LeadStageTransition.objects.filter(lead_id=lead_id)
+        .order_by('transitioned_at', 'id').values(*HISTORY_FIELDS)
+    )
+
+
+def record_lead_change(previous, lead):
+    """Log a new or changed lead's stage and apply the funnel deltas; previous is None on create"""
+    stage_changed = previous is None or previous['stage'] != lead.stage
+    moved = previous is not None and (
+        previous['owner_id'] != lead.owner_id or previous['source'] != lead.source
+    )
+    if not stage_changed and not moved:
+        return
+
+    deltas = FunnelDeltas()
+    history = lead_history(lead.pk) if previous else []
+    if previous and not history:
+        # Bulk-created and not backfilled yet, so it has contributed nothing:
+        # log and count the stage it was created in first
+        initial = {
+            'owner_id': previous['owner_id'], 'source': previous['source'],
+            'from_stage': '', 'to_stage': previous['stage'],
+            'seconds_in_previous_stage': None, 'transitioned_at': previous['created_at'],
+        }
+        LeadStageTransition.objects.create(lead_id=lead.pk, **initial)
+        deltas.add_history([initial])
+        deltas.add_current(previous['owner_id'], previous['source'], previous['stage'])
+        history = [initial]
+
+    if previous:
+        deltas.add_current(previous['owner_id'], previous['source'], previous['stage'], sign=-1)
+    deltas.add_current(lead.owner_id, lead.source, lead.stage)
+
+    if stage_changed:
+        if previous:
+            now = timezone.now()
+            seconds = max((now - history[-1]['transitioned_at']).total_seconds(), 0)
+        else:
+            now, seconds = lead.created_at, None
+        transition = {
+            'owner_id': lead.owner_id, 'source': lead.source,
+            'from_stage': previous['stage'] if previous else '', 'to_stage': lead.stage,
+            'seconds_in_previous_stage': seconds, 'transitioned_at': now,
+        }
+        LeadStageTransition.objects.create(lead_id=lead.pk, **transition)
+        # Only the new transition changes what the history contributes
+        deltas.add_history(history, sign=-1)
+        deltas.add_history(history + [transition])
+
+    deltas.apply()
+
+
+def remove_lead(lead, history):
+    """Take a deleted lead, and the history it had, out of the funnel"""
+    deltas = FunnelDeltas()
+    deltas.add_current(lead.owner_id, lead.source, lead.stage, sign=-1)
+    deltas.add_history(history, sign=-1)
+    deltas.apply()
+
+
+def backfill_transitions(leads):
+    """Log the current stage of leads with no history yet, e.g. bulk-created ones"""
+    missing = leads.filter(~Exists(LeadStageTransition.objects.filter(lead=OuterRef('pk')))).order_by()
+    LeadStageTransition.objects.bulk_create(
+        (
+            LeadStageTransition(
+                lead_id=lead_id, owner_id=owner_id, source=source,
+                to_stage=stage, transitioned_at=created_at,
+            )
+            for lead_id, owner_id, source, stage, created_at in missing.values_list(
+                'id', 'owner_id', 'source', 'stage', 'created_at'
+            ).iterator(chunk_size=2000)
+        ),
+        batch_size=2000,
+    )
+
+
+def rebuild_funnel(owner_ids):
+    """Recompute the funnel rows of the given owners from the transition log"""
+    owner_ids = {owner_id for owner_id in owner_ids if owner_id}
+    if not owner_ids:
+        return
+
+    with transaction.atomic():
+        # Serialize rebuilds of the same owners (deploy command, bulk signals)
+        list(User.objects.select_for_update().filter(id__in=owner_ids).order_by('id').values_list('id'))
+        backfill_transitions(Lead.objects.filter(owner_id__in=owner_ids))
+
+        deltas = FunnelDeltas()
+        # Whole histories, since reached depends on earlier transitions of the lead
+        lead_ids = LeadStageTransition.objects.filter(owner_id__in=owner_ids).values('lead_id')
+        rows = (
+            LeadStageTransition.objects.filter(lead_id__in=lead_ids)
+            .order_by('lead_id', 'transitioned_at', 'id')
+            .values('lead_id', *HISTORY_FIELDS)
+        )
+        for _, history in groupby(rows.iterator(chunk_size=5000), key=itemgetter('lead_id')):
+            deltas.add_history(list(history))
+        current = (
+            Lead.objects.filter(owner_id__in=owner_ids).order_by()
+            .values('owner_id', 'source', 'stage').annotate(total=Count('id'))
+        )
+        for row in current:
+            deltas.add_current(row['owner_id'], row['source'], row['stage'], sign=row['total'])
+
+        LeadFunnelStat.objects.filter(user_id__in=owner_ids).delete()
+        LeadStageDuration.objects.filter(user_id__in=owner_ids).delete()
+        LeadFunnelStat.objects.bulk_create([
+            LeadFunnelStat(user_id=user_id, source=source, stage=stage, **fields)
+            for (user_id, source, stage), fields in deltas.stats.items()
+            if user_id in owner_ids
+        ], batch_size=1000)
+        LeadStageDuration.objects.bulk_create([
+            LeadStageDuration(user_id=user_id, source=source, stage=stage, bin=bin, count=count)
+            for (user_id, source, stage, bin), count in deltas.durations.items()
+            if user_id in owner_ids and count
+        ], batch_size=1000)
+
+
+def _summarize(stats, durations):
+    counts = np.zeros((len(REPORT_STAGES), len(STAT_FIELDS)))
+    histograms = np.zeros((len(REPORT_STAGES), DURATION_BINS))
+    index = {stage: i for i, stage in enumerate(REPORT_STAGES)}
+    for row in stats:
+        if row['stage'] in index:
+            counts[index[row['stage']]] += [row[field] for field in STAT_FIELDS]
+    for row in durations:
+        if row['stage'] in index:
+            histograms[index[row['stage']], row['bin']] += row['count']
+
+    reached = counts[:, STAT_FIELDS.index('reached')]
+    timed = histograms.sum(axis=1)
+    stages = []
+    for i, stage in enumerate(REPORT_STAGES):
+        in_funnel = stage in FUNNEL_RANK
+        following = i + 1 < len(FUNNEL_STAGES)
+        stages.append({
+            'stage': stage,
+            'reached': int(reached[i]) if in_funnel else None,
+            'entered': int(counts[i, STAT_FIELDS.index('entered')]),
+            'exited': int(counts[i, STAT_FIELDS.index('exited')]),
+            'current': int(counts[i, STAT_FIELDS.index('current')]),
+            # Share of leads reaching this stage that got to the next one
+            'conversion_rate': (
+                round(float(reached[i + 1] / reached[i] * 100), 2)
+                if in_funnel and following and reached[i] else None
+            ),
+            'mean_hours_in_stage': (
+                round(float(counts[i, STAT_FIELDS.index('seconds_in_stage')] / timed[i] / 3600), 2)
+                if timed[i] else None
+            ),
+            'median_hours_in_stage': histogram_median(histograms[i]),
+        })
+
+    first, last = reached[0], reached[len(FUNNEL_STAGES) - 1]
+    return {
+        'stages': stages,
+        'overall_conversion_rate': round(float(last / first * 100), 2) if first else None,
+    }
+
+
+def funnel_report(user_id, source=None):
+    """Funnel counts, conversion ratios and time in stage, overall and per lead source"""
+    # Read-only: rows are maintained by the save signals and rebuild_funnel()
+    stats = LeadFunnelStat.objects.filter(user_id=user_id)
+    durations = LeadStageDuration.objects.filter(user_id=user_id, count__gt=0)
+    if source:
+        stats, durations = stats.filter(source=source), durations.filter(source=source)
+    stats = list(stats.values('source', 'stage', *STAT_FIELDS))
+    durations = list(durations.values('source', 'stage', 'bin', 'count'))
+
+    sources = sorted({row['source'] for row in stats})
+    return {
+        'funnel_stages': FUNNEL_STAGES,
+        'overall': _summarize(stats, durations),
+        'by_source': {
+            name: _summarize(
+                [row for row in stats if row['source'] == name],
+                [row for row in durations if row['source'] == name],
+            )
+            for name in sources
+        },
+    }
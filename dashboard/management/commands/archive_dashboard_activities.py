@@ -0,0 +1,107 @@
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from dashboard.cache import invalidate_dashboard_cache
+from dashboard.models import DashboardActivity, DashboardActivityArchive
+
+
+ARCHIVE_FIELDS = [
+    'id', 'user_id', 'activity_type',
+    'lead_id', 'deal_id', 'task_id',
+    'title', 'description', 'action',
+    'old_value', 'new_value', 'created_at',
+]
+
+
+class Command(BaseCommand):
+    help = "Move dashboard activities older than the retention horizon out of the hot table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            default=getattr(settings, 'DASHBOARD_ACTIVITY_RETENTION_DAYS', 90),
+            help="Archive activities created more than this many days ago",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="Rows moved per transaction; keeps each lock short",
+        )
+        parser.add_argument(
+            '--output',
+            help="Write archived rows to this gzipped NDJSON file instead of the archive table",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report how many rows would be archived",
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        expired = DashboardActivity.objects.filter(created_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f"{expired.count()} activities older than {cutoff:%Y-%m-%d} would be archived.")
+            return
+
+        # Appended one gzip member per chunk; gzip readers treat members as one stream
+        output = open(options['output'], 'ab') if options['output'] else None
+        moved = 0
+        try:
+            while True:
+                rows = list(
+                    expired.order_by('created_at', 'id').values(*ARCHIVE_FIELDS)[:options['batch_size']]
+                )
+                if not rows:
+                    break
+                self._move_batch(rows, output)
+                moved += len(rows)
+                self.stdout.write(f"Archived {moved} activities...")
+        finally:
+            if output:
+                output.close()
+
+        destination = options['output'] or DashboardActivityArchive._meta.db_table
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} activities older than {cutoff:%Y-%m-%d} to {destination}."
+        ))
+
+    def _move_batch(self, rows, output):
+        """Delete one batch from the hot table and copy it to cold storage, atomically"""
+        offset = output.tell() if output else None
+        try:
+            with transaction.atomic():
+                # No per-row instances or post_delete signals: 5000 cache bumps per
+                # chunk otherwise. Each affected user is invalidated once below.
+                doomed = DashboardActivity.objects.filter(pk__in=[row['id'] for row in rows])
+                doomed._raw_delete(doomed.db)
+                if output:
+                    lines = ''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+                    output.write(gzip.compress(lines.encode('utf-8')))
+                    # On disk before the delete commits
+                    output.flush()
+                    os.fsync(output.fileno())
+                else:
+                    DashboardActivityArchive.objects.bulk_create(
+                        [DashboardActivityArchive(**row) for row in rows],
+                        ignore_conflicts=True,
+                    )
+                invalidate_dashboard_cache(*{row['user_id'] for row in rows})
+        except BaseException:
+            if output:
+                # The delete rolled back: drop this chunk's member so no row is archived twice
+                output.seek(offset)
+                output.truncate()
+            raise
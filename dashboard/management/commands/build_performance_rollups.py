@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dashboard.rollups import build_rollups, month_start, previous_month
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly team performance rollups behind the leaderboard (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int, default=2,
+            help="Number of months to rebuild, counting back from the current one",
+        )
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError("--months must be at least 1.")
+
+        period = month_start(timezone.now().date())
+        for _ in range(options['months']):
+            count = build_rollups(period)
+            self.stdout.write(f"{period:%Y-%m}: {count} reps rolled up.")
+            period = previous_month(period)
+
+        self.stdout.write(self.style.SUCCESS("Performance rollups rebuilt."))
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.suggestions import generate_suggestions
+
+
+class Command(BaseCommand):
+    help = "Generate AI suggestions for all users from their leads, deals, tasks and events (schedule daily)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help="Only generate suggestions for the given user id (may be repeated)",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help="Number of users scanned per batch",
+        )
+        parser.add_argument(
+            '--expires-hours', type=int, default=24,
+            help="Hours until generated suggestions expire",
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+
+        created = generate_suggestions(
+            user_ids=options['user_ids'],
+            chunk_size=options['chunk_size'],
+            expires_in=timedelta(hours=options['expires_hours']),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Generated {created} suggestions."))
@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from dashboard.funnel import rebuild_funnel
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute lead funnel counters from the stage transition log, logging the "
+        "current stage of leads without history first (run after deploying the log)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help="Only rebuild the given user id (may be repeated)",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help="Number of users rebuilt together",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user_ids']:
+            users = users.filter(id__in=options['user_ids'])
+
+        user_ids = list(users.values_list('id', flat=True))
+        for start in range(0, len(user_ids), options['batch_size']):
+            rebuild_funnel(user_ids[start:start + options['batch_size']])
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the lead funnel for {len(user_ids)} users."))
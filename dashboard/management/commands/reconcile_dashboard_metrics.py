@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.models import DashboardMetric, METRIC_FIELDS
+
+
+class Command(BaseCommand):
+    help = "Recompute stored dashboard metrics from source data to correct incremental drift (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help="Only reconcile the given user id (may be repeated)",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Number of users recalculated per grouped query",
+        )
+
+    def handle(self, *args, **options):
+        metrics = DashboardMetric.objects.order_by('user_id')
+        if options['user_ids']:
+            metrics = metrics.filter(user_id__in=options['user_ids'])
+
+        checked = drifted = 0
+        batch = []
+        for metric in metrics.iterator(chunk_size=options['batch_size']):
+            batch.append(metric)
+            if len(batch) >= options['batch_size']:
+                drifted += self._reconcile(batch)
+                checked += len(batch)
+                batch = []
+        if batch:
+            drifted += self._reconcile(batch)
+            checked += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {checked} dashboard metrics ({drifted} corrected)."
+        ))
+
+    def _reconcile(self, batch):
+        """Recalculate a batch and return how many rows had drifted"""
+        before = [[getattr(metric, field) for field in METRIC_FIELDS] for metric in batch]
+        DashboardMetric.recalculate_bulk(batch)
+        after = [[getattr(metric, field) for field in METRIC_FIELDS] for metric in batch]
+        return sum(1 for old, new in zip(before, after) if old != new)
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardActivityArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('activity_type', models.CharField(choices=[('lead_created', 'Lead Created'), ('lead_updated', 'Lead Updated'), ('lead_deleted', 'Lead Deleted'), ('deal_created', 'Deal Created'), ('deal_updated', 'Deal Updated'), ('deal_stage_changed', 'Deal Stage Changed'), ('deal_won', 'Deal Won'), ('deal_lost', 'Deal Lost'), ('task_created', 'Task Created'), ('task_completed', 'Task Completed'), ('comment_added', 'Comment Added'), ('file_uploaded', 'File Uploaded'), ('team_joined', 'Team Member Joined')], max_length=30)),
+                ('lead_id', models.IntegerField(blank=True, null=True)),
+                ('deal_id', models.IntegerField(blank=True, null=True)),
+                ('task_id', models.IntegerField(blank=True, null=True)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('action', models.CharField(max_length=255)),
+                ('old_value', models.TextField(blank=True, null=True)),
+                ('new_value', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_dashboard_activities', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived Dashboard Activity',
+                'verbose_name_plural': 'Archived Dashboard Activities',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='dashboard_d_user_id_485dd4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_dashboardactivityarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aisuggestion',
+            name='is_generated',
+            field=models.BooleanField(default=False, help_text='Produced by the batch suggestion engine'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:30
+
+from django.db import migrations, models
+
+
+def _parse_ids(value):
+    if not value:
+        return []
+    return [int(x.strip()) for x in value.split(',') if x.strip().isdigit()]
+
+
+def copy_ids_to_relations(apps, schema_editor):
+    """Move comma-separated lead/deal ids into the relation tables"""
+    AISuggestion = apps.get_model('dashboard', 'AISuggestion')
+    Lead = apps.get_model('leads', 'Lead')
+    Deal = apps.get_model('deals', 'Deal')
+    LeadLink = AISuggestion.leads.through
+    DealLink = AISuggestion.deals.through
+
+    suggestions = AISuggestion.objects.exclude(
+        models.Q(lead_ids__isnull=True) | models.Q(lead_ids=''),
+        models.Q(deal_ids__isnull=True) | models.Q(deal_ids=''),
+    ).values_list('id', 'lead_ids', 'deal_ids')
+
+    lead_links, deal_links = [], []
+    for suggestion_id, lead_ids, deal_ids in suggestions.iterator(chunk_size=2000):
+        lead_links += [(suggestion_id, lead_id) for lead_id in _parse_ids(lead_ids)]
+        deal_links += [(suggestion_id, deal_id) for deal_id in _parse_ids(deal_ids)]
+
+    # Drop references to rows that no longer exist
+    existing_leads = set(Lead.objects.filter(
+        id__in={lead_id for _, lead_id in lead_links}
+    ).values_list('id', flat=True))
+    existing_deals = set(Deal.objects.filter(
+        id__in={deal_id for _, deal_id in deal_links}
+    ).values_list('id', flat=True))
+
+    LeadLink.objects.bulk_create(
+        [LeadLink(aisuggestion_id=s, lead_id=l) for s, l in lead_links if l in existing_leads],
+        batch_size=2000, ignore_conflicts=True,
+    )
+    DealLink.objects.bulk_create(
+        [DealLink(aisuggestion_id=s, deal_id=d) for s, d in deal_links if d in existing_deals],
+        batch_size=2000, ignore_conflicts=True,
+    )
+
+
+def copy_relations_to_ids(apps, schema_editor):
+    """Rebuild the comma-separated columns from the relation tables"""
+    AISuggestion = apps.get_model('dashboard', 'AISuggestion')
+
+    for suggestion in AISuggestion.objects.prefetch_related('leads', 'deals').iterator(chunk_size=2000):
+        suggestion.lead_ids = ','.join(str(lead.id) for lead in suggestion.leads.all())
+        suggestion.deal_ids = ','.join(str(deal.id) for deal in suggestion.deals.all())
+        suggestion.save(update_fields=['lead_ids', 'deal_ids'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0001_initial'),
+        ('leads', '0002_alter_lead_options_lead_company_lead_image_and_more'),
+        ('dashboard', '0003_aisuggestion_is_generated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aisuggestion',
+            name='deals',
+            field=models.ManyToManyField(blank=True, related_name='ai_suggestions', to='deals.deal'),
+        ),
+        migrations.AddField(
+            model_name='aisuggestion',
+            name='leads',
+            field=models.ManyToManyField(blank=True, related_name='ai_suggestions', to='leads.lead'),
+        ),
+        migrations.RunPython(copy_ids_to_relations, copy_relations_to_ids),
+        migrations.RemoveField(
+            model_name='aisuggestion',
+            name='deal_ids',
+        ),
+        migrations.RemoveField(
+            model_name='aisuggestion',
+            name='lead_ids',
+        ),
+    ]
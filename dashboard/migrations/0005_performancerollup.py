@@ -0,0 +1,41 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0004_aisuggestion_relations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField(help_text='First day of the rolled-up month')),
+                ('total_hours', models.FloatField(default=0)),
+                ('active_hours', models.FloatField(default=0)),
+                ('leads_contacted', models.IntegerField(default=0)),
+                ('deals_progressed', models.IntegerField(default=0)),
+                ('calls_made', models.IntegerField(default=0)),
+                ('meetings_held', models.IntegerField(default=0)),
+                ('leads_created', models.IntegerField(default=0)),
+                ('deals_won', models.IntegerField(default=0)),
+                ('won_value', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('rank', models.IntegerField(default=0, help_text='1 is the top performer')),
+                ('percentile', models.FloatField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='performance_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-period_start', 'rank'],
+                'indexes': [models.Index(fields=['period_start', 'rank'], name='dashboard_p_period__7ee3ba_idx')],
+                'unique_together': {('user', 'period_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0005_performancerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadStageDuration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=20)),
+                ('stage', models.CharField(max_length=20)),
+                ('bin', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lead_stage_durations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'source', 'stage', 'bin')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LeadFunnelStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=20)),
+                ('stage', models.CharField(max_length=20)),
+                ('reached', models.IntegerField(default=0, help_text='Leads that got to this funnel stage or further')),
+                ('entered', models.IntegerField(default=0, help_text='Transitions into the stage')),
+                ('exited', models.IntegerField(default=0, help_text='Transitions out of the stage')),
+                ('current', models.IntegerField(default=0, help_text='Leads in the stage right now')),
+                ('seconds_in_stage', models.FloatField(default=0, help_text='Total time spent by exited leads')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lead_funnel_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'source', 'stage')},
+            },
+        ),
+    ]
@@ -1,11 +1,45 @@
 from django.db import models
 from django.contrib.auth import get_user_model
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, F, Case, When, FloatField
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+from .cache import bump_user_version
 
 User = get_user_model()
 
+# Deal buckets shared by the full recompute and the incremental signal handlers
+CLOSED_DEAL_STATUSES = ['Won', 'Lost']
+IN_PROGRESS_DEAL_STAGES = ['Orders', 'Tasks', 'Due Date']
+
+METRIC_FIELDS = [
+    'total_leads', 'new_leads_this_month',
+    'active_deals', 'deals_in_progress',
+    'won_deals_total', 'lost_deals_total',
+    'total_deal_value', 'customer_satisfaction_rate',
+]
+
+
+def lead_metric_aggregates():
+    """Filtered aggregates computing every lead metric in a single pass"""
+    month_start = timezone.now().date().replace(day=1)
+    return {
+        'total_leads': Count('id'),
+        'new_leads_this_month': Count('id', filter=Q(created_at__date__gte=month_start)),
+    }
+
+
+def deal_metric_aggregates():
+    """Filtered aggregates computing every deal metric in a single pass"""
+    return {
+        'active_deals': Count('id', filter=~Q(status__in=CLOSED_DEAL_STATUSES)),
+        'deals_in_progress': Count('id', filter=Q(stage__in=IN_PROGRESS_DEAL_STAGES)),
+        'won_deals_total': Count('id', filter=Q(status='Won')),
+        'lost_deals_total': Count('id', filter=Q(status='Lost')),
+        'total_deal_value': Sum('amount'),
+    }
+
 class DashboardMetric(models.Model):
     """Store calculated metrics for performance optimization"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='dashboard_metric')
@@ -39,24 +73,22 @@ class DashboardMetric(models.Model):
         from leads.models import Lead
         from deals.models import Deal
         
-        # Lead metrics
-        self.total_leads = Lead.objects.filter(owner=self.user).count()
-        today = timezone.now().date()
-        month_start = today.replace(day=1)
-        self.new_leads_this_month = Lead.objects.filter(
-            owner=self.user,
-            created_at__date__gte=month_start
-        ).count()
-        
-        # Deal metrics
-        deals = Deal.objects.filter(owner=self.user)
-        self.active_deals = deals.exclude(status__in=['Won', 'Lost']).count()
-        self.deals_in_progress = deals.filter(
-            stage__in=['Orders', 'Tasks', 'Due Date']
-        ).count()
-        
-        won = deals.filter(status='Won').count()
-        lost = deals.filter(status='Lost').count()
+        # One conditional aggregate per source table
+        lead_row = Lead.objects.filter(owner=self.user).aggregate(**lead_metric_aggregates())
+        deal_row = Deal.objects.filter(owner=self.user).aggregate(**deal_metric_aggregates())
+        
+        self._apply_aggregates(lead_row, deal_row)
+        self.save()
+    
+    def _apply_aggregates(self, lead_row, deal_row):
+        """Copy aggregate rows onto this metric without saving"""
+        self.total_leads = lead_row.get('total_leads') or 0
+        self.new_leads_this_month = lead_row.get('new_leads_this_month') or 0
+        
+        self.active_deals = deal_row.get('active_deals') or 0
+        self.deals_in_progress = deal_row.get('deals_in_progress') or 0
+        won = deal_row.get('won_deals_total') or 0
+        lost = deal_row.get('lost_deals_total') or 0
         self.won_deals_total = won
         self.lost_deals_total = lost
         
@@ -65,9 +97,79 @@ class DashboardMetric(models.Model):
         self.customer_satisfaction_rate = (won / total_closed * 100) if total_closed > 0 else 0
         
         # Total value
-        self.total_deal_value = deals.aggregate(Sum('amount'))['amount__sum'] or 0
+        self.total_deal_value = deal_row.get('total_deal_value') or 0
+    
+    @classmethod
+    def recalculate_bulk(cls, metrics):
+        """Recalculate many metrics with one grouped query per source table"""
+        from leads.models import Lead
+        from deals.models import Deal
         
-        self.save()
+        metrics = list(metrics)
+        user_ids = [metric.user_id for metric in metrics]
+        if not user_ids:
+            return metrics
+        
+        lead_rows = {
+            row['owner_id']: row
+            for row in Lead.objects.filter(owner_id__in=user_ids)
+            .order_by().values('owner_id').annotate(**lead_metric_aggregates())
+        }
+        deal_rows = {
+            row['owner_id']: row
+            for row in Deal.objects.filter(owner_id__in=user_ids)
+            .order_by().values('owner_id').annotate(**deal_metric_aggregates())
+        }
+        
+        # bulk_update skips auto_now, so stamp the calculation time explicitly
+        now = timezone.now()
+        for metric in metrics:
+            metric._apply_aggregates(lead_rows.get(metric.user_id, {}), deal_rows.get(metric.user_id, {}))
+            metric.last_calculated = now
+        
+        cls.objects.bulk_update(metrics, METRIC_FIELDS + ['last_calculated'], batch_size=500)
+        
+        # bulk_update sends no post_save, so invalidate cached summaries here
+        for user_id in user_ids:
+            bump_user_version(user_id)
+        return metrics
+    
+    @classmethod
+    def get_for_user(cls, user):
+        """Return the stored metrics, recomputing only for new rows or a new month"""
+        metric, created = cls.objects.get_or_create(user=user)
+        month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        
+        # new_leads_this_month cannot be rolled over by deltas alone
+        if created or metric.last_calculated < month_start:
+            metric.calculate_metrics()
+        return metric
+    
+    @classmethod
+    def apply_deltas(cls, user_id, create_missing=True, **deltas):
+        """Atomically add deltas to a user's metric row using F-expressions"""
+        deltas = {field: value for field, value in deltas.items() if value}
+        if user_id is None or not deltas:
+            return
+        
+        updates = {field: F(field) + value for field, value in deltas.items()}
+        
+        if 'won_deals_total' in deltas or 'lost_deals_total' in deltas:
+            # Derive the rate from the post-update counts in the same statement
+            won = F('won_deals_total') + deltas.get('won_deals_total', 0)
+            closed = won + F('lost_deals_total') + deltas.get('lost_deals_total', 0)
+            updates['customer_satisfaction_rate'] = Case(
+                When(GreaterThan(closed, 0), then=Cast(won, FloatField()) * 100 / closed),
+                default=0.0,
+                output_field=FloatField(),
+            )
+        
+        updated = cls.objects.filter(user_id=user_id).update(**updates)
+        
+        if not updated and create_missing:
+            # No row yet: a full calculation already includes this change
+            metric, _ = cls.objects.get_or_create(user_id=user_id)
+            metric.calculate_metrics()
 
 
 class DashboardActivity(models.Model):
@@ -119,6 +221,55 @@ class DashboardActivity(models.Model):
         return f"{self.user.email} - {self.activity_type} - {self.created_at}"
 
 
+class DashboardActivityArchive(models.Model):
+    """Cold storage for activity rows older than the retention horizon"""
+    # Keeps the original DashboardActivity id so archiving is idempotent
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_dashboard_activities')
+    activity_type = models.CharField(max_length=30, choices=DashboardActivity.ACTIVITY_TYPE_CHOICES)
+    
+    # Related object info
+    lead_id = models.IntegerField(blank=True, null=True)
+    deal_id = models.IntegerField(blank=True, null=True)
+    task_id = models.IntegerField(blank=True, null=True)
+    
+    # Activity details
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    action = models.CharField(max_length=255)
+    
+    # Change tracking
+    old_value = models.TextField(blank=True, null=True)
+    new_value = models.TextField(blank=True, null=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Archived Dashboard Activity'
+        verbose_name_plural = 'Archived Dashboard Activities'
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.activity_type} - {self.created_at} (archived)"
+
+
+class AISuggestionQuerySet(models.QuerySet):
+    def with_related_ids(self):
+        """Prefetch only the ids of linked leads and deals for serialization"""
+        from leads.models import Lead
+        from deals.models import Deal
+        
+        return self.prefetch_related(
+            models.Prefetch('leads', queryset=Lead.objects.only('id').order_by()),
+            models.Prefetch('deals', queryset=Deal.objects.only('id').order_by()),
+        )
+
+
 class AISuggestion(models.Model):
     """AI-driven suggestions for users"""
     SUGGESTION_TYPE_CHOICES = [
@@ -146,8 +297,8 @@ class AISuggestion(models.Model):
     confidence_score = models.FloatField(default=0.5, validators=[MinValueValidator(0), MaxValueValidator(1)])
     
     # Related objects
-    lead_ids = models.TextField(blank=True, null=True, help_text="Comma-separated lead IDs")
-    deal_ids = models.TextField(blank=True, null=True, help_text="Comma-separated deal IDs")
+    leads = models.ManyToManyField('leads.Lead', blank=True, related_name='ai_suggestions')
+    deals = models.ManyToManyField('deals.Deal', blank=True, related_name='ai_suggestions')
     
     # Metrics
     metric_value = models.CharField(max_length=100, blank=True, null=True)
@@ -157,11 +308,14 @@ class AISuggestion(models.Model):
     is_actioned = models.BooleanField(default=False)
     actioned_at = models.DateTimeField(blank=True, null=True)
     action_notes = models.TextField(blank=True, null=True)
+    is_generated = models.BooleanField(default=False, help_text="Produced by the batch suggestion engine")
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(help_text="When this suggestion becomes outdated")
     
+    objects = AISuggestionQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-priority', '-created_at']
         indexes = [
@@ -203,4 +357,76 @@ class MarketingPerformanceMetric(models.Model):
         ordering = ['-metric_date']
     
     def __str__(self):
-        return f"{self.user.email} - {self.metric_date}"
\ No newline at end of file
+        return f"{self.user.email} - {self.metric_date}"
+
+
+class PerformanceRollup(models.Model):
+    """Precomputed monthly per-user totals backing the team leaderboard"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='performance_rollups')
+    period_start = models.DateField(help_text="First day of the rolled-up month")
+    
+    # From MarketingPerformanceMetric
+    total_hours = models.FloatField(default=0)
+    active_hours = models.FloatField(default=0)
+    leads_contacted = models.IntegerField(default=0)
+    deals_progressed = models.IntegerField(default=0)
+    calls_made = models.IntegerField(default=0)
+    meetings_held = models.IntegerField(default=0)
+    
+    # From leads and deals
+    leads_created = models.IntegerField(default=0)
+    deals_won = models.IntegerField(default=0)
+    won_value = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    
+    # Standing within the period, by won value
+    rank = models.IntegerField(default=0, help_text="1 is the top performer")
+    percentile = models.FloatField(default=0)
+    
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['user', 'period_start']
+        ordering = ['-period_start', 'rank']
+        indexes = [
+            models.Index(fields=['period_start', 'rank']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.period_start:%Y-%m} (#{self.rank})"
+
+
+class LeadFunnelStat(models.Model):
+    """
+    Incrementally maintained funnel counters per owner, lead source and stage,
+    derived from LeadStageTransition (see dashboard.funnel)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lead_funnel_stats')
+    source = models.CharField(max_length=20)
+    stage = models.CharField(max_length=20)
+    
+    reached = models.IntegerField(default=0, help_text="Leads that got to this funnel stage or further")
+    entered = models.IntegerField(default=0, help_text="Transitions into the stage")
+    exited = models.IntegerField(default=0, help_text="Transitions out of the stage")
+    current = models.IntegerField(default=0, help_text="Leads in the stage right now")
+    seconds_in_stage = models.FloatField(default=0, help_text="Total time spent by exited leads")
+    
+    class Meta:
+        unique_together = ['user', 'source', 'stage']
+    
+    def __str__(self):
+        return f"{self.user_id} {self.source}/{self.stage}"
+
+
+class LeadStageDuration(models.Model):
+    """Histogram of time spent in a stage before leaving it, in log2-hour bins"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lead_stage_durations')
+    source = models.CharField(max_length=20)
+    stage = models.CharField(max_length=20)
+    bin = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['user', 'source', 'stage', 'bin']
+    
+    def __str__(self):
+        return f"{self.user_id} {self.source}/{self.stage} bin {self.bin}: {self.count}"
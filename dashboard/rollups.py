@@ -0,0 +1,156 @@
+"""
+Team performance rollups.
+
+Aggregates MarketingPerformanceMetric, Lead and Deal across every user with
+one grouped query per table, ranks the reps with NumPy and upserts the result
+into PerformanceRollup so leaderboard reads never touch the raw tables.
+"""
+from datetime import date
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce, CumeDist, Rank
+
+from deals.models import Deal
+from leads.models import Lead
+from .models import MarketingPerformanceMetric, PerformanceRollup
+
+
+PERFORMANCE_FIELDS = [
+    'total_hours', 'active_hours',
+    'leads_contacted', 'deals_progressed',
+    'calls_made', 'meetings_held',
+]
+ROLLUP_FIELDS = PERFORMANCE_FIELDS + ['leads_created', 'deals_won', 'won_value']
+LEADERBOARD_METRICS = ROLLUP_FIELDS
+# Metric whose rank and percentile build_rollups stores on every row
+STORED_RANK_METRIC = 'won_value'
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def previous_month(day):
+    return date(day.year - (day.month == 1), (day.month - 2) % 12 + 1, 1)
+
+
+def rank_rows(rows, metric):
+    """Attach rank (1 = best) and percentile for `metric` to each row dict"""
+    if not rows:
+        return rows
+    values = np.array([float(row[metric] or 0) for row in rows])
+    # Competition ranking: ties share the best rank
+    order = np.argsort(-values, kind='stable')
+    sorted_values = values[order]
+    first_of_value = np.searchsorted(-sorted_values, -sorted_values, side='left')
+    ranks = np.empty(len(rows), dtype=np.int64)
+    ranks[order] = first_of_value + 1
+    # Share of the team strictly below each rep
+    below = len(rows) - np.searchsorted(-sorted_values, -values, side='right')
+    percentiles = below / max(len(rows) - 1, 1) * 100
+
+    for row, rank, percentile in zip(rows, ranks.tolist(), percentiles.tolist()):
+        row['rank'] = rank
+        row['percentile'] = round(percentile, 2)
+    return rows
+
+
+def leaderboard_rows(period_start, metric, limit):
+    """
+    Team size and the month's top `limit` rollups by metric, best first, as
+    dicts with rank and percentile computed like rank_rows. The stored ranking is read as is;
+    other metrics are ranked with window functions, so either way only the
+    returned rows leave the database.
+    """
+    rollups = PerformanceRollup.objects.filter(period_start=period_start)
+    fields = ['user_id', 'user__email', 'user__first_name', 'user__last_name', metric]
+    team_size = rollups.count()
+    if metric == STORED_RANK_METRIC:
+        return team_size, list(rollups.order_by('rank', 'user_id').values(*fields, 'rank', 'percentile')[:limit])
+
+    order = F(metric).desc()
+    rows = list(
+        rollups.annotate(
+            metric_rank=Window(Rank(), order_by=order),
+            # Share of the team at or above each value
+            at_or_above=Window(CumeDist(), order_by=order),
+        ).order_by(order, 'user_id').values(*fields, 'metric_rank', 'at_or_above')[:limit]
+    )
+    for row in rows:
+        row['rank'] = row.pop('metric_rank')
+        below = team_size - round(row.pop('at_or_above') * team_size)
+        row['percentile'] = round(below / max(team_size - 1, 1) * 100, 2)
+    return team_size, rows
+
+
+def previous_standing(period_start, metric, user_ids):
+    """{user_id: (value, rank)} by metric in the month for the given users only"""
+    rollups = PerformanceRollup.objects.filter(period_start=period_start, user_id__in=user_ids)
+    if metric == STORED_RANK_METRIC:
+        return {row[0]: row[1:] for row in rollups.values_list('user_id', metric, 'rank')}
+
+    # Competition rank: one more than the number of reps strictly ahead
+    ahead = PerformanceRollup.objects.filter(
+        period_start=period_start, **{f'{metric}__gt': OuterRef(metric)}
+    ).order_by().values('period_start').annotate(count=Count('id')).values('count')
+    rollups = rollups.annotate(
+        metric_rank=Coalesce(Subquery(ahead), Value(0), output_field=IntegerField()) + 1
+    )
+    return {row[0]: row[1:] for row in rollups.values_list('user_id', metric, 'metric_rank')}
+
+
+def build_rollups(period_start):
+    """Recompute and upsert PerformanceRollup rows for the month starting at period_start"""
+    period_start = month_start(period_start)
+    period_end = next_month(period_start)
+
+    rows = {}
+
+    def merge(user_id, values):
+        row = rows.setdefault(user_id, {field: 0 for field in ROLLUP_FIELDS})
+        row.update({key: value or 0 for key, value in values.items()})
+
+    performance = MarketingPerformanceMetric.objects.filter(
+        metric_date__gte=period_start, metric_date__lt=period_end
+    ).order_by().values('user_id').annotate(**{field: Sum(field) for field in PERFORMANCE_FIELDS})
+    for entry in performance:
+        merge(entry.pop('user_id'), entry)
+
+    leads = Lead.objects.filter(
+        owner__isnull=False, created_at__date__gte=period_start, created_at__date__lt=period_end
+    ).order_by().values('owner_id').annotate(leads_created=Count('id'))
+    for entry in leads:
+        merge(entry.pop('owner_id'), entry)
+
+    # Deals carry no close timestamp, so the last update of a won deal stands in for it
+    deals = Deal.objects.filter(
+        status='Won', updated_at__date__gte=period_start, updated_at__date__lt=period_end
+    ).order_by().values('owner_id').annotate(deals_won=Count('id'), won_value=Sum('amount'))
+    for entry in deals:
+        merge(entry.pop('owner_id'), entry)
+
+    user_ids = list(rows)
+    ranked = rank_rows([rows[user_id] for user_id in user_ids], 'won_value')
+    rollups = [
+        PerformanceRollup(user_id=user_id, period_start=period_start, **row)
+        for user_id, row in zip(user_ids, ranked)
+    ]
+
+    with transaction.atomic():
+        PerformanceRollup.objects.filter(period_start=period_start).exclude(
+            user_id__in=user_ids
+        ).delete()
+        PerformanceRollup.objects.bulk_create(
+            rollups,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['user', 'period_start'],
+            update_fields=ROLLUP_FIELDS + ['rank', 'percentile', 'computed_at'],
+        )
+    return len(rollups)
@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import DashboardMetric, DashboardActivity, AISuggestion, MarketingPerformanceMetric
+from .models import (
+    DashboardMetric, DashboardActivity, AISuggestion,
+    MarketingPerformanceMetric, PerformanceRollup,
+)
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -46,6 +49,22 @@ class DashboardActivitySerializer(serializers.ModelSerializer):
         return colors[index]
 
 
+class DashboardActivityCreateSerializer(serializers.ModelSerializer):
+    """Validate incoming activity events for single and batch logging"""
+    
+    class Meta:
+        model = DashboardActivity
+        fields = [
+            'activity_type', 'title', 'description', 'action',
+            'lead_id', 'deal_id', 'task_id',
+            'old_value', 'new_value'
+        ]
+        extra_kwargs = {
+            'description': {'required': False, 'allow_blank': True, 'default': ''},
+            'action': {'required': False, 'allow_blank': True, 'default': ''},
+        }
+
+
 class AISuggestionSerializer(serializers.ModelSerializer):
     icon_color = serializers.SerializerMethodField()
     is_valid = serializers.BooleanField(read_only=True)
@@ -57,11 +76,11 @@ class AISuggestionSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'suggestion_type', 'priority', 'title', 'description',
             'confidence_score', 'metric_value', 'metric_change',
-            'is_actioned', 'actioned_at', 'action_notes',
+            'is_actioned', 'actioned_at', 'action_notes', 'is_generated',
             'icon_color', 'is_valid', 'related_leads', 'related_deals',
             'created_at', 'expires_at'
         ]
-        read_only_fields = ['id', 'created_at', 'expires_at', 'is_valid']
+        read_only_fields = ['id', 'created_at', 'expires_at', 'is_valid', 'is_generated']
     
     def get_icon_color(self, obj):
         """Get icon color based on suggestion type"""
@@ -75,16 +94,12 @@ class AISuggestionSerializer(serializers.ModelSerializer):
         return color_map.get(obj.suggestion_type, 'bg-gray-400')
     
     def get_related_leads(self, obj):
-        """Parse and return related lead IDs"""
-        if not obj.lead_ids:
-            return []
-        return [int(x.strip()) for x in obj.lead_ids.split(',') if x.strip().isdigit()]
+        """Return related lead IDs"""
+        return [lead.id for lead in obj.leads.all()]
     
     def get_related_deals(self, obj):
-        """Parse and return related deal IDs"""
-        if not obj.deal_ids:
-            return []
-        return [int(x.strip()) for x in obj.deal_ids.split(',') if x.strip().isdigit()]
+        """Return related deal IDs"""
+        return [deal.id for deal in obj.deals.all()]
 
 
 class MarketingPerformanceSerializer(serializers.ModelSerializer):
@@ -98,6 +113,35 @@ class MarketingPerformanceSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class MarketingPerformanceRecordSerializer(serializers.ModelSerializer):
+    """Validate one day of performance metrics for bulk recording"""
+    
+    class Meta:
+        model = MarketingPerformanceMetric
+        fields = [
+            'metric_date', 'total_hours', 'active_hours',
+            'leads_contacted', 'deals_progressed', 'calls_made',
+            'meetings_held', 'conversion_rate', 'avg_deal_value'
+        ]
+        # Unique with user, which is never part of the payload; duplicates are checked per batch
+        validators = []
+
+
+class PerformanceRollupSerializer(serializers.ModelSerializer):
+    user_email = serializers.CharField(source='user.email', read_only=True)
+    user_name = serializers.CharField(source='user.get_full_name', read_only=True)
+    
+    class Meta:
+        model = PerformanceRollup
+        fields = [
+            'id', 'user', 'user_email', 'user_name', 'period_start',
+            'total_hours', 'active_hours', 'leads_contacted', 'deals_progressed',
+            'calls_made', 'meetings_held', 'leads_created', 'deals_won', 'won_value',
+            'rank', 'percentile', 'computed_at'
+        ]
+        read_only_fields = fields
+
+
 class DashboardSummarySerializer(serializers.Serializer):
     """Comprehensive dashboard summary"""
     metrics = DashboardMetricSerializer()
@@ -0,0 +1,181 @@
+from collections import defaultdict
+from functools import wraps
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from leads.models import Lead
+from leads.signals import leads_bulk_changed, per_lead_receivers_suspended
+from deals.models import Deal
+from .cache import invalidate_dashboard_cache
+from .funnel import lead_history, rebuild_funnel, record_lead_change, remove_lead
+from .models import (
+    DashboardMetric, DashboardActivity, AISuggestion,
+    CLOSED_DEAL_STATUSES, IN_PROGRESS_DEAL_STAGES,
+)
+
+
+def _lead_contribution(values):
+    """Return the metric counters a single lead adds to its owner"""
+    month_start = timezone.now().date().replace(day=1)
+    created_at = values['created_at']
+    return {
+        'total_leads': 1,
+        'new_leads_this_month': 1 if created_at and created_at.date() >= month_start else 0,
+    }
+
+
+def _deal_contribution(values):
+    """Return the metric counters a single deal adds to its owner"""
+    return {
+        'active_deals': 0 if values['status'] in CLOSED_DEAL_STATUSES else 1,
+        'deals_in_progress': 1 if values['stage'] in IN_PROGRESS_DEAL_STAGES else 0,
+        'won_deals_total': 1 if values['status'] == 'Won' else 0,
+        'lost_deals_total': 1 if values['status'] == 'Lost' else 0,
+        'total_deal_value': values['amount'] or 0,
+    }
+
+
+def _apply_change(contribution, old_values, new_values, create_missing=True):
+    """Apply new minus old contribution to each affected owner's metric row"""
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    if old_values:
+        for field, value in contribution(old_values).items():
+            deltas[old_values['owner_id']][field] -= value
+
+    if new_values:
+        for field, value in contribution(new_values).items():
+            deltas[new_values['owner_id']][field] += value
+
+    for owner_id, fields in deltas.items():
+        DashboardMetric.apply_deltas(owner_id, create_missing=create_missing, **fields)
+
+
+def _per_lead(receiver_function):
+    """Skip a Lead receiver while a bulk write has suspended them"""
+    @wraps(receiver_function)
+    def wrapper(sender, **kwargs):
+        if sender is Lead and per_lead_receivers_suspended():
+            return None
+        return receiver_function(sender, **kwargs)
+    return wrapper
+
+
+def _snapshot(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+LEAD_FIELDS = ['owner_id', 'created_at', 'stage', 'source']
+DEAL_FIELDS = ['owner_id', 'status', 'stage', 'amount']
+
+
+@receiver(pre_save, sender=Lead)
+@_per_lead
+def remember_previous_lead(sender, instance, **kwargs):
+    instance._dashboard_previous = (
+        sender.objects.filter(pk=instance.pk).values(*LEAD_FIELDS).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Lead)
+@_per_lead
+def update_metrics_on_lead_save(sender, instance, **kwargs):
+    _apply_change(
+        _lead_contribution,
+        getattr(instance, '_dashboard_previous', None),
+        _snapshot(instance, LEAD_FIELDS),
+    )
+
+
+@receiver(post_delete, sender=Lead)
+@_per_lead
+def update_metrics_on_lead_delete(sender, instance, **kwargs):
+    _apply_change(_lead_contribution, _snapshot(instance, LEAD_FIELDS), None, create_missing=False)
+
+
+@receiver(post_save, sender=Lead)
+@_per_lead
+def record_lead_funnel_on_save(sender, instance, **kwargs):
+    record_lead_change(getattr(instance, '_dashboard_previous', None), instance)
+
+
+@receiver(pre_delete, sender=Lead)
+@_per_lead
+def remember_lead_history(sender, instance, **kwargs):
+    # The transitions are cascade-deleted before post_delete runs
+    instance._funnel_history = lead_history(instance.pk)
+
+
+@receiver(post_delete, sender=Lead)
+@_per_lead
+def remove_lead_from_funnel(sender, instance, **kwargs):
+    remove_lead(instance, getattr(instance, '_funnel_history', []))
+
+
+@receiver(pre_save, sender=Deal)
+def remember_previous_deal(sender, instance, **kwargs):
+    instance._dashboard_previous = (
+        sender.objects.filter(pk=instance.pk).values(*DEAL_FIELDS).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Deal)
+def update_metrics_on_deal_save(sender, instance, **kwargs):
+    _apply_change(
+        _deal_contribution,
+        getattr(instance, '_dashboard_previous', None),
+        _snapshot(instance, DEAL_FIELDS),
+    )
+
+
+@receiver(post_delete, sender=Deal)
+def update_metrics_on_deal_delete(sender, instance, **kwargs):
+    _apply_change(_deal_contribution, _snapshot(instance, DEAL_FIELDS), None, create_missing=False)
+
+
+@receiver(leads_bulk_changed)
+def recalculate_metrics_on_bulk_change(sender, owner_ids, **kwargs):
+    owner_ids = {owner_id for owner_id in owner_ids if owner_id}
+    # Owners without a metric row yet get a full calculation on their next read
+    DashboardMetric.recalculate_bulk(DashboardMetric.objects.filter(user_id__in=owner_ids))
+    rebuild_funnel(owner_ids)
+    invalidate_dashboard_cache(*owner_ids)
+
+
+@receiver(post_save, sender=Lead)
+@receiver(post_delete, sender=Lead)
+@receiver(post_save, sender=Deal)
+@receiver(post_delete, sender=Deal)
+@_per_lead
+def invalidate_cache_on_owned_change(sender, instance, **kwargs):
+    previous = getattr(instance, '_dashboard_previous', None) or {}
+    invalidate_dashboard_cache(instance.owner_id, previous.get('owner_id'))
+
+
+@receiver(post_save, sender=DashboardMetric)
+@receiver(post_save, sender=DashboardActivity)
+@receiver(post_delete, sender=DashboardActivity)
+@receiver(post_save, sender=AISuggestion)
+@receiver(post_delete, sender=AISuggestion)
+def invalidate_cache_on_user_change(sender, instance, **kwargs):
+    invalidate_dashboard_cache(instance.user_id)
+
+
+@receiver(m2m_changed, sender=AISuggestion.leads.through)
+@receiver(m2m_changed, sender=AISuggestion.deals.through)
+def invalidate_cache_on_suggestion_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Suggestion payloads list their lead/deal ids, so relinking changes them"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_dashboard_cache(instance.user_id)
+    elif action == 'pre_clear':
+        invalidate_dashboard_cache(*instance.ai_suggestions.values_list('user_id', flat=True))
+    else:
+        invalidate_dashboard_cache(
+            *AISuggestion.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+        )
@@ -0,0 +1,334 @@
+"""
+Batch suggestion engine.
+
+Scans leads, deals, tasks and calendar events for a chunk of users at a time,
+computes signals over column arrays with NumPy and replaces each user's
+previously generated, unactioned suggestions with a fresh set in one
+transaction.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from calendar_events.models import CalendarEvent
+from deals.models import Deal
+from leads.models import Lead
+from tasks.models import Task
+from .cache import invalidate_dashboard_cache
+from .models import AISuggestion, CLOSED_DEAL_STATUSES
+
+User = get_user_model()
+
+# Tunable thresholds
+FOLLOW_UP_AFTER_DAYS = 7
+STALE_DEAL_AFTER_DAYS = 14
+CLOSE_DATE_WINDOW_DAYS = 7
+MEETING_FOLLOW_UP_DAYS = 3
+OPPORTUNITY_PERCENTILE = 75
+MAX_RELATED_IDS = 50
+
+INACTIVE_LEAD_STAGES = ['Rejected', 'Closed']
+SECONDS_PER_DAY = 86400.0
+
+
+def _epoch_seconds(values):
+    """Convert a list of aware datetimes (or None) to a float array, NaN for missing"""
+    return np.fromiter(
+        (value.timestamp() if value else np.nan for value in values),
+        dtype=float,
+        count=len(values),
+    )
+
+
+def _columns(rows, count):
+    """Transpose values_list rows into per-column tuples"""
+    if not rows:
+        return [()] * count
+    return list(zip(*rows))
+
+
+def _group(owners, mask, *columns):
+    """
+    Map owner id -> tuple of per-column arrays for the rows selected by mask.
+    One sort by owner serves every column, so grouping stays O(n log n)
+    instead of a full-array scan per user.
+    """
+    owners = owners[mask]
+    if not len(owners):
+        return {}
+    order = np.argsort(owners, kind='stable')
+    unique_owners, starts = np.unique(owners[order], return_index=True)
+    splits = [np.split(column[mask][order], starts[1:]) for column in columns]
+    return {owner: tuple(parts) for owner, *parts in zip(unique_owners.tolist(), *splits)}
+
+
+def _priority(count, high_at, critical_at=None):
+    if critical_at is not None and count >= critical_at:
+        return 'critical'
+    if count >= high_at:
+        return 'high'
+    return 'medium' if count > 1 else 'low'
+
+
+def _id_list(ids):
+    return ids[:MAX_RELATED_IDS].tolist()
+
+
+class SuggestionEngine:
+    """Generate AISuggestion rows for a chunk of users"""
+
+    def __init__(self, now=None, expires_in=timedelta(hours=24)):
+        self.now = now or timezone.now()
+        self.today = self.now.date()
+        self.expires_at = self.now + expires_in
+
+    def run(self, user_ids):
+        user_ids = list(user_ids)
+        suggestions = (
+            self._lead_suggestions(user_ids)
+            + self._deal_suggestions(user_ids)
+            + self._task_suggestions(user_ids)
+            + self._meeting_suggestions(user_ids)
+        )
+
+        with transaction.atomic():
+            # Replace the previous generation, expired or not; actioned rows are kept as history
+            AISuggestion.objects.filter(
+                user_id__in=user_ids,
+                is_generated=True,
+                is_actioned=False,
+            ).delete()
+            AISuggestion.objects.bulk_create(suggestions, batch_size=500)
+            self._link_related(suggestions)
+            invalidate_dashboard_cache(*user_ids)
+
+        return len(suggestions)
+
+    def _suggestion(self, user_id, lead_ids=(), deal_ids=(), **fields):
+        suggestion = AISuggestion(
+            user_id=user_id,
+            is_generated=True,
+            expires_at=self.expires_at,
+            **fields
+        )
+        # Linked once the rows have primary keys
+        suggestion._related_lead_ids = lead_ids
+        suggestion._related_deal_ids = deal_ids
+        return suggestion
+
+    def _link_related(self, suggestions):
+        """Insert relation rows for freshly created suggestions"""
+        LeadLink = AISuggestion.leads.through
+        DealLink = AISuggestion.deals.through
+        LeadLink.objects.bulk_create([
+            LeadLink(aisuggestion_id=suggestion.id, lead_id=lead_id)
+            for suggestion in suggestions
+            for lead_id in suggestion._related_lead_ids
+        ], batch_size=2000)
+        DealLink.objects.bulk_create([
+            DealLink(aisuggestion_id=suggestion.id, deal_id=deal_id)
+            for suggestion in suggestions
+            for deal_id in suggestion._related_deal_ids
+        ], batch_size=2000)
+
+    def _lead_suggestions(self, user_ids):
+        rows = list(
+            Lead.objects.filter(owner_id__in=user_ids, status='Active')
+            .exclude(stage__in=INACTIVE_LEAD_STAGES)
+            .annotate(last_activity=Max('activities__activity_date'))
+            .order_by()
+            .values_list('id', 'owner_id', 'stage', 'value', 'updated_at', 'last_activity')
+        )
+        ids, owners, stages, values, updated, last_activity = _columns(rows, 6)
+        ids = np.array(ids, dtype=np.int64)
+        owners = np.array(owners, dtype=np.int64)
+        stages = np.array(stages, dtype=object)
+        values = np.array(values, dtype=float)
+
+        # Most recent touch is the later of the last edit and the last logged activity
+        last_touch = np.fmax(_epoch_seconds(updated), _epoch_seconds(last_activity))
+        idle_days = (self.now.timestamp() - last_touch) / SECONDS_PER_DAY
+
+        suggestions = []
+
+        follow_up = _group(owners, idle_days >= FOLLOW_UP_AFTER_DAYS, ids, idle_days)
+        for user_id, (lead_ids, lead_idle_days) in follow_up.items():
+            median_idle = float(np.median(lead_idle_days))
+            count = len(lead_ids)
+            suggestions.append(self._suggestion(
+                user_id,
+                suggestion_type='follow_up',
+                priority=_priority(count, high_at=5, critical_at=20),
+                title=f"{count} lead{'s need' if count != 1 else ' needs'} a follow-up",
+                description=(
+                    f"These leads have had no updates or logged activity for at least "
+                    f"{FOLLOW_UP_AFTER_DAYS} days (median {median_idle:.0f} days). "
+                    f"Reach out before they go cold."
+                ),
+                confidence_score=round(min(1.0, 0.5 + median_idle / 60), 2),
+                lead_ids=_id_list(lead_ids),
+                metric_value=str(count),
+            ))
+
+        # Opportunities: interested leads in the top value band of each owner's pipeline
+        priced = values > 0
+        unique_owners, owner_index = np.unique(owners, return_inverse=True)
+        thresholds = np.full(len(unique_owners), np.inf)
+        for index, (owner_values,) in _group(owner_index, priced, values).items():
+            thresholds[index] = np.percentile(owner_values, OPPORTUNITY_PERCENTILE)
+        selected = (stages == 'Interested') & priced & (values >= thresholds[owner_index])
+        for user_id, (lead_ids, lead_values) in _group(owners, selected, ids, values).items():
+            total = float(lead_values.sum())
+            suggestions.append(self._suggestion(
+                user_id,
+                suggestion_type='opportunity',
+                priority='high' if len(lead_ids) >= 3 else 'medium',
+                title=f"{len(lead_ids)} high-value interested lead{'s' if len(lead_ids) != 1 else ''}",
+                description=(
+                    f"Interested leads worth {total:,.2f} in total sit in the top "
+                    f"{100 - OPPORTUNITY_PERCENTILE}% of your pipeline by value. "
+                    f"Consider converting them to deals."
+                ),
+                confidence_score=0.7,
+                lead_ids=_id_list(lead_ids),
+                metric_value=f"{total:,.2f}",
+            ))
+
+        return suggestions
+
+    def _deal_suggestions(self, user_ids):
+        rows = list(
+            Deal.objects.filter(owner_id__in=user_ids)
+            .exclude(status__in=CLOSED_DEAL_STATUSES)
+            .order_by()
+            .values_list('id', 'owner_id', 'amount', 'due_date', 'updated_at')
+        )
+        ids, owners, amounts, due_dates, updated = _columns(rows, 5)
+        ids = np.array(ids, dtype=np.int64)
+        owners = np.array(owners, dtype=np.int64)
+        amounts = np.array(amounts, dtype=float)
+        due_dates = np.array(due_dates, dtype='datetime64[D]')
+
+        idle_days = (self.now.timestamp() - _epoch_seconds(updated)) / SECONDS_PER_DAY
+        days_to_due = (due_dates - np.datetime64(self.today, 'D')).astype(float)
+        has_due = ~np.isnat(due_dates)
+
+        suggestions = []
+
+        at_risk = _group(owners, idle_days >= STALE_DEAL_AFTER_DAYS, ids, amounts)
+        for user_id, (deal_ids, deal_amounts) in at_risk.items():
+            value = float(deal_amounts.sum())
+            count = len(deal_ids)
+            suggestions.append(self._suggestion(
+                user_id,
+                suggestion_type='risk_alert',
+                priority=_priority(count, high_at=3, critical_at=10),
+                title=f"{count} open deal{'s' if count != 1 else ''} at risk",
+                description=(
+                    f"Deals worth {value:,.2f} have not moved in {STALE_DEAL_AFTER_DAYS}+ days. "
+                    f"Review next steps with the client."
+                ),
+                confidence_score=0.65,
+                deal_ids=_id_list(deal_ids),
+                metric_value=f"{value:,.2f}",
+            ))
+
+        closing = has_due & (days_to_due <= CLOSE_DATE_WINDOW_DAYS)
+        by_owner = _group(owners, closing, ids, days_to_due)
+        for user_id, (deal_ids, deal_days_to_due) in by_owner.items():
+            overdue = int((deal_days_to_due < 0).sum())
+            count = len(deal_ids)
+            suggestions.append(self._suggestion(
+                user_id,
+                suggestion_type='close_date',
+                priority='critical' if overdue else _priority(count, high_at=3),
+                title=(
+                    f"{overdue} deal{'s' if overdue != 1 else ''} past due date" if overdue
+                    else f"{count} deal{'s' if count != 1 else ''} due this week"
+                ),
+                description=(
+                    f"{count} open deal{'s' if count != 1 else ''} reach their due date within "
+                    f"{CLOSE_DATE_WINDOW_DAYS} days ({overdue} already overdue)."
+                ),
+                confidence_score=0.9,
+                deal_ids=_id_list(deal_ids),
+                metric_value=str(count),
+            ))
+
+        return suggestions
+
+    def _task_suggestions(self, user_ids):
+        rows = list(
+            Task.objects.filter(assigned_to_id__in=user_ids, due_date__lt=self.today)
+            .exclude(stage='Done')
+            .order_by()
+            .values_list('id', 'assigned_to_id')
+        )
+        _, owners = _columns(rows, 2)
+        owners = np.array(owners, dtype=np.int64)
+
+        suggestions = []
+        unique_owners, counts = np.unique(owners, return_counts=True)
+        for user_id, count in zip(unique_owners.tolist(), counts.tolist()):
+            suggestions.append(self._suggestion(
+                user_id,
+                suggestion_type='performance',
+                priority=_priority(count, high_at=5, critical_at=15),
+                title=f"{count} overdue task{'s' if count != 1 else ''}",
+                description="Clearing overdue tasks keeps deals and follow-ups on schedule.",
+                confidence_score=0.8,
+                metric_value=str(count),
+            ))
+        return suggestions
+
+    def _meeting_suggestions(self, user_ids):
+        rows = list(
+            CalendarEvent.objects.filter(
+                owner_id__in=user_ids,
+                event_type='meeting',
+                event_date__gte=self.today - timedelta(days=MEETING_FOLLOW_UP_DAYS),
+                event_date__lt=self.today,
+            )
+            .order_by()
+            .values_list('id', 'owner_id')
+        )
+        _, owners = _columns(rows, 2)
+        owners = np.array(owners, dtype=np.int64)
+
+        suggestions = []
+        unique_owners, counts = np.unique(owners, return_counts=True)
+        for user_id, count in zip(unique_owners.tolist(), counts.tolist()):
+            suggestions.append(self._suggestion(
+                user_id,
+                suggestion_type='follow_up',
+                priority='medium',
+                title=f"Follow up on {count} recent meeting{'s' if count != 1 else ''}",
+                description=(
+                    f"You held {count} meeting{'s' if count != 1 else ''} in the last "
+                    f"{MEETING_FOLLOW_UP_DAYS} days. Send recaps and next steps."
+                ),
+                confidence_score=0.6,
+                metric_value=str(count),
+            ))
+        return suggestions
+
+
+def generate_suggestions(user_ids=None, chunk_size=200, expires_in=timedelta(hours=24)):
+    """Run the engine over all (or the given) users in chunks; returns rows created"""
+    users = User.objects.filter(is_active=True).order_by('id')
+    if user_ids:
+        users = users.filter(id__in=user_ids)
+
+    engine = SuggestionEngine(expires_in=expires_in)
+    all_ids = list(users.values_list('id', flat=True))
+    created = 0
+    for start in range(0, len(all_ids), chunk_size):
+        created += engine.run(all_ids[start:start + chunk_size])
+
+    # Users no longer scanned (deactivated, or outside user_ids) keep nothing stale
+    AISuggestion.objects.filter(is_generated=True, is_actioned=False, expires_at__lte=engine.now).delete()
+    return created
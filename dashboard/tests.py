@@ -1,3 +1,559 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from deals.models import Deal
+from leads.bulk import bulk_delete_leads, bulk_update_leads
+from leads.models import Lead
+from .buffer import ActivityBuffer, dropped_activity_count
+from .cache import bump_user_version, user_cache_key
+from .funnel import STAT_FIELDS, rebuild_funnel
+from .models import (
+    METRIC_FIELDS, DashboardActivity, DashboardActivityArchive, DashboardMetric, LeadFunnelStat,
+    AISuggestion, LeadStageDuration, MarketingPerformanceMetric, PerformanceRollup,
+)
+from .rollups import month_start, previous_month, rank_rows
+from .suggestions import SuggestionEngine, generate_suggestions
+from .timeseries import build_series
+
+
+class DashboardMetricDeltaTests(TestCase):
+    """Metrics kept up to date by signal deltas must equal a full recalculation"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@example.com')
+        self.bob = User.objects.create_user('bob', 'bob@example.com')
+
+    def assertMatchesRecalculation(self, *users):
+        for user in users:
+            # Rows missing after a bulk change are calculated on first read
+            incremental = DashboardMetric.get_for_user(user)
+            expected, = DashboardMetric.recalculate_bulk([DashboardMetric.objects.get(user=user)])
+            for field in METRIC_FIELDS:
+                self.assertAlmostEqual(getattr(incremental, field), getattr(expected, field), msg=field)
+
+    def test_saves_and_deletes(self):
+        leads = [Lead.objects.create(owner=self.alice, name=f'Lead {i}') for i in range(3)]
+        open_deal = Deal.objects.create(owner=self.alice, title='Open', stage='Orders', amount=Decimal('100'))
+        won_deal = Deal.objects.create(owner=self.alice, title='Won', status='Won', amount=Decimal('250'))
+        Deal.objects.create(owner=self.alice, title='Lost', status='Lost', amount=Decimal('50'))
+        self.assertMatchesRecalculation(self.alice)
+
+        open_deal.status = 'Won'
+        open_deal.amount = Decimal('120.50')
+        open_deal.save()
+        won_deal.owner = self.bob
+        won_deal.save()
+        leads[0].owner = self.bob
+        leads[0].save()
+        leads[1].delete()
+        self.assertMatchesRecalculation(self.alice, self.bob)
+
+        open_deal.delete()
+        self.assertMatchesRecalculation(self.alice, self.bob)
+
+    def test_bulk_lead_changes(self):
+        for i in range(5):
+            Lead.objects.create(owner=self.alice, name=f'Lead {i}')
+
+        bulk_update_leads(self.alice, Lead.objects.filter(owner=self.alice, name__in=['Lead 0', 'Lead 1']),
+                          {'owner': self.bob})
+        self.assertMatchesRecalculation(self.alice, self.bob)
+
+        bulk_delete_leads(self.alice, Lead.objects.filter(owner=self.alice))
+        self.assertMatchesRecalculation(self.alice, self.bob)
+
+
+class FunnelDeltaTests(TestCase):
+    """Funnel rows updated per lead change must equal rebuild_funnel's output"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@example.com')
+        self.bob = User.objects.create_user('bob', 'bob@example.com')
+
+    def funnel_state(self):
+        stats = sorted(
+            (row[0], row[1], row[2], *(round(value, 6) for value in row[3:]))
+            for row in LeadFunnelStat.objects.values_list('user_id', 'source', 'stage', *STAT_FIELDS)
+            if any(row[3:])
+        )
+        durations = sorted(
+            LeadStageDuration.objects.exclude(count=0)
+            .values_list('user_id', 'source', 'stage', 'bin', 'count')
+        )
+        return stats, durations
+
+    def assertMatchesRebuild(self):
+        incremental = self.funnel_state()
+        rebuild_funnel([self.alice.id, self.bob.id])
+        self.assertEqual(incremental, self.funnel_state())
+
+    def test_stage_owner_and_source_changes(self):
+        leads = [Lead.objects.create(owner=self.alice, name=f'Lead {i}') for i in range(4)]
+        for stage in ['Opened', 'Interested', 'Closed']:
+            leads[0].stage = stage
+            leads[0].save()
+        leads[1].stage = 'Rejected'
+        leads[1].save()
+        leads[2].stage = 'Opened'
+        leads[2].source = 'Referral'
+        leads[2].save()
+        leads[3].owner = self.bob
+        leads[3].save()
+        self.assertMatchesRebuild()
+
+        leads[2].delete()
+        leads[3].stage = 'Interested'
+        leads[3].save()
+        self.assertMatchesRebuild()
+
+    def test_bulk_changes(self):
+        for i in range(6):
+            Lead.objects.create(owner=self.alice, name=f'Lead {i}', stage='Opened' if i % 2 else 'New')
+        Lead.objects.bulk_create([Lead(owner=self.alice, name='Never logged', stage='Interested')])
+
+        bulk_update_leads(self.alice, Lead.objects.filter(owner=self.alice, stage='Opened'), {'stage': 'Closed'})
+        self.assertMatchesRebuild()
+
+        bulk_delete_leads(self.alice, Lead.objects.filter(owner=self.alice, stage='New'))
+        self.assertMatchesRebuild()
+
+
+@override_settings(DASHBOARD_CACHE_ENABLED=True)
+class DashboardSummaryCacheTests(TestCase):
+    url = '/api/dashboard/dashboard/summary/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bump_changes_every_key(self):
+        key = user_cache_key('summary', self.user.id)
+        bump_user_version(self.user.id)
+        self.assertNotEqual(user_cache_key('summary', self.user.id), key)
+
+    def test_not_modified_without_database_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_serves_fresh_summary(self):
+        first = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Lead.objects.create(owner=self.user, name='New lead')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['metrics']['total_leads'], 1)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    @override_settings(DASHBOARD_CACHE_ENABLED=False)
+    def test_without_shared_cache_every_read_is_fresh(self):
+        first = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        # No on_commit version bump here: only an uncached read sees the lead
+        Lead.objects.create(owner=self.user, name='New lead')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['metrics']['total_leads'], 1)
+
+
+class ArchiveActivitiesTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@example.com')
+        self.bob = User.objects.create_user('bob', 'bob@example.com')
+        DashboardActivity.objects.bulk_create([
+            DashboardActivity(user=user, activity_type='lead_created', title=f'Lead {i}', action='Lead created')
+            for i in range(5) for user in (self.alice, self.bob)
+        ])
+        self.old_ids = sorted(DashboardActivity.objects.values_list('id', flat=True))[:8]
+        DashboardActivity.objects.filter(id__in=self.old_ids).update(created_at=timezone.now() - timedelta(days=200))
+
+    def archive(self, *args):
+        call_command('archive_dashboard_activities', '--days=90', '--batch-size=3', *args, stdout=io.StringIO())
+
+    def test_moves_old_rows_to_the_archive_table(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.archive()
+        self.assertEqual(sorted(DashboardActivityArchive.objects.values_list('id', flat=True)), self.old_ids)
+        self.assertEqual(DashboardActivity.objects.count(), 2)
+        self.assertFalse(DashboardActivity.objects.filter(id__in=self.old_ids).exists())
+        # One version bump per distinct user per chunk, not one per row
+        self.assertEqual(len(callbacks), 6)
+
+    def test_writes_old_rows_to_a_gzip_file(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'activities.ndjson.gz')
+        self.archive(f'--output={path}')
+        with gzip.open(path, 'rt') as archive:
+            rows = [json.loads(line) for line in archive]
+        self.assertEqual([row['id'] for row in rows], self.old_ids)
+        self.assertFalse(DashboardActivityArchive.objects.exists())
+        self.assertEqual(DashboardActivity.objects.count(), 2)
+
+    def test_failed_chunk_is_not_left_in_the_file(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'activities.ndjson.gz')
+        target = 'dashboard.management.commands.archive_dashboard_activities.invalidate_dashboard_cache'
+        with mock.patch(target, side_effect=[None, RuntimeError('boom')]):
+            with self.assertRaises(RuntimeError):
+                self.archive(f'--output={path}')
+        with gzip.open(path, 'rt') as archive:
+            archived = [json.loads(line)['id'] for line in archive]
+        self.assertEqual(archived, self.old_ids[:3])
+        self.assertEqual(
+            sorted(DashboardActivity.objects.filter(id__in=self.old_ids).values_list('id', flat=True)),
+            self.old_ids[3:],
+        )
+
+
+class ActivityBatchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def event(self, i):
+        return {'activity_type': 'lead_created', 'title': f'Lead {i}', 'lead_id': i}
+
+    def test_log_batch_inserts_every_event(self):
+        response = self.client.post(
+            '/api/dashboard/activities/log_batch/',
+            {'activities': [self.event(i) for i in range(3)]}, format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'created': 3})
+        self.assertEqual(
+            sorted(DashboardActivity.objects.filter(user=self.user).values_list('lead_id', flat=True)), [0, 1, 2]
+        )
+
+    def test_log_batch_rejects_invalid_batches(self):
+        for payload in [[], [self.event(0), {'title': 'No type'}], [self.event(i) for i in range(501)]]:
+            with self.subTest(size=len(payload)):
+                response = self.client.post('/api/dashboard/activities/log_batch/', payload, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(DashboardActivity.objects.exists())
+
+    def test_buffer_status_is_staff_only(self):
+        self.assertEqual(self.client.get('/api/dashboard/activities/buffer_status/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/dashboard/activities/buffer_status/')
+        self.assertEqual(response.data, {'enabled': False, 'pending': 0, 'dropped': 0})
+
+
+@mock.patch.object(ActivityBuffer, '_ensure_flusher')
+class ActivityBufferTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com')
+
+    def fill(self, buffer, count):
+        for i in range(count):
+            buffer.add(DashboardActivity(user=self.user, activity_type='lead_created', title=f'Lead {i}'))
+
+    def failing_insert(self):
+        return mock.patch.object(DashboardActivity.objects, 'bulk_create', side_effect=DatabaseError('down'))
+
+    def test_full_buffer_is_written_in_one_insert(self, ensure_flusher):
+        buffer = ActivityBuffer(max_size=3)
+        with self.assertNumQueries(3):  # savepoint, insert, release
+            self.fill(buffer, 3)
+        self.assertEqual(DashboardActivity.objects.count(), 3)
+        self.assertEqual(buffer.pending, 0)
+
+    def test_failed_flush_is_requeued(self, ensure_flusher):
+        buffer = ActivityBuffer(max_size=10)
+        self.fill(buffer, 3)
+        with self.failing_insert(), self.assertLogs('dashboard.buffer', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(buffer.pending, 3)
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(DashboardActivity.objects.count(), 3)
+        self.assertEqual(buffer.dropped, 0)
+
+    def test_events_are_dropped_and_counted_after_the_last_retry(self, ensure_flusher):
+        buffer = ActivityBuffer(max_size=10, max_retries=1)
+        self.fill(buffer, 3)
+        with self.failing_insert(), self.assertLogs('dashboard.buffer', 'ERROR'):
+            buffer.flush()
+            buffer.flush()
+        self.assertEqual(buffer.pending, 0)
+        self.assertEqual(buffer.dropped, 3)
+        self.assertEqual(dropped_activity_count(), 3)
+
+    def test_queue_is_bounded_while_writes_fail(self, ensure_flusher):
+        buffer = ActivityBuffer(max_size=2, max_pending=4)
+        with self.failing_insert(), self.assertLogs('dashboard.buffer', 'ERROR'):
+            self.fill(buffer, 6)
+        # The first flush failed; later adds queue without retrying inline
+        self.assertEqual(buffer.pending, 4)
+        self.assertEqual(dropped_activity_count(), 2)
+        self.assertEqual(buffer.flush(), 4)
+        self.assertEqual(
+            sorted(DashboardActivity.objects.values_list('title', flat=True)),
+            ['Lead 2', 'Lead 3', 'Lead 4', 'Lead 5'],
+        )
+
+
+class ActivityFeedPaginationTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@example.com')
+        bob = User.objects.create_user('bob', 'bob@example.com')
+        DashboardActivity.objects.bulk_create([
+            DashboardActivity(user=self.alice, activity_type='lead_created', title=f'Lead {i}')
+            for i in range(12)
+        ] + [DashboardActivity(user=bob, activity_type='lead_created', title='Not mine')])
+        # Several rows per timestamp, so pages must break ties on id
+        now = timezone.now()
+        mine = DashboardActivity.objects.filter(user=self.alice).order_by('id')
+        for i, pk in enumerate(mine.values_list('id', flat=True)):
+            DashboardActivity.objects.filter(pk=pk).update(created_at=now - timedelta(minutes=i // 3))
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 5)
+            ids.extend(activity['id'] for activity in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pages_cover_the_feed_once_in_order(self):
+        expected = list(
+            DashboardActivity.objects.filter(user=self.alice).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(self.walk('/api/dashboard/activities/?page_size=5'), expected)
+        self.assertEqual(self.walk('/api/dashboard/activities/recent/?limit=5'), expected)
+
+    def test_page_size_is_capped(self):
+        DashboardActivity.objects.bulk_create([
+            DashboardActivity(user=self.alice, activity_type='lead_created', title=f'Lead {i}')
+            for i in range(100)
+        ])
+        response = self.client.get('/api/dashboard/activities/recent/?limit=1000')
+        self.assertEqual(len(response.data['results']), 100)
+        self.assertIsNotNone(response.data['next'])
+
+
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        self.period = month_start(timezone.now().date())
+        self.previous = previous_month(self.period)
+        # Ties in both metrics, and a rep with no rollup last month
+        won = [500, 300, 300, 100, 0, 900]
+        calls = [4, 9, 4, 1, 9, 0]
+        last_won = [100, 200, 300, 400, 500, None]
+        last_month = timezone.make_aware(datetime(self.previous.year, self.previous.month, 15, 12))
+        self.users = [User.objects.create_user(f'rep{i}', f'rep{i}@example.com') for i in range(6)]
+        for user, amount, call_count, last_amount in zip(self.users, won, calls, last_won):
+            MarketingPerformanceMetric.objects.create(user=user, metric_date=self.period, calls_made=call_count)
+            if amount:
+                Deal.objects.create(owner=user, title='Won', status='Won', amount=Decimal(amount))
+            if last_amount is not None:
+                MarketingPerformanceMetric.objects.create(
+                    user=user, metric_date=self.previous, calls_made=last_amount // 100
+                )
+                deal = Deal.objects.create(owner=user, title='Last month', status='Won', amount=Decimal(last_amount))
+                Deal.objects.filter(pk=deal.pk).update(updated_at=last_month)
+        call_command('build_performance_rollups', '--months=3', stdout=io.StringIO())
+
+        admin = User.objects.create_user('admin', 'admin@example.com', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def reference(self, period, metric):
+        """Full ranking of the month recomputed in Python"""
+        rows = list(PerformanceRollup.objects.filter(period_start=period).values('user_id', metric))
+        return {row['user_id']: row for row in rank_rows(rows, metric)}
+
+    def test_command_stores_won_value_ranks(self):
+        expected = self.reference(self.period, 'won_value')
+        stored = PerformanceRollup.objects.filter(period_start=self.period)
+        self.assertEqual(stored.count(), 6)
+        for rollup in stored:
+            self.assertEqual((rollup.rank, rollup.percentile), (
+                expected[rollup.user_id]['rank'], expected[rollup.user_id]['percentile'],
+            ))
+
+    def test_leaderboard_matches_a_full_ranking(self):
+        for metric in ['won_value', 'calls_made']:
+            current = self.reference(self.period, metric)
+            previous = self.reference(self.previous, metric)
+            expected = sorted(current.values(), key=lambda row: (row['rank'], row['user_id']))[:4]
+            with self.subTest(metric=metric):
+                data = self.client.get(f'/api/dashboard/team/leaderboard/?metric={metric}&limit=4').data
+                self.assertEqual(data['team_size'], 6)
+                self.assertEqual(
+                    [(row['user_id'], row['rank'], row['percentile']) for row in data['results']],
+                    [(row['user_id'], row['rank'], row['percentile']) for row in expected],
+                )
+                for row in data['results']:
+                    before = previous.get(row['user_id'])
+                    self.assertEqual(row['previous_rank'], before['rank'] if before else None)
+                    self.assertEqual(row['previous_value'], float(before[metric]) if before else None)
+
+
+# calendar_events migrations lag behind its models, so the test database has no
+# CalendarEvent.owner column to scan
+@mock.patch.object(SuggestionEngine, '_meeting_suggestions', return_value=[])
+class SuggestionEngineTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@example.com')
+        self.bob = User.objects.create_user('bob', 'bob@example.com')
+        idle = timezone.now() - timedelta(days=10)
+        # Owners interleaved, so per-user groups are not contiguous in the scan
+        for value, stage in [(100, 'New'), (200, 'New'), (300, 'Interested'), (1000, 'Interested')]:
+            for user in (self.alice, self.bob):
+                scale = 2 if user == self.bob else 1
+                Lead.objects.create(owner=user, name=f'Lead {value}', value=value * scale, stage=stage)
+        Lead.objects.filter(owner=self.alice, value__lte=200).update(updated_at=idle)
+        for amount in (50, 70):
+            Deal.objects.create(owner=self.bob, title='Stalled', amount=Decimal(amount))
+        Deal.objects.create(owner=self.alice, title='Moving', amount=Decimal('10'))
+        Deal.objects.filter(owner=self.bob).update(updated_at=idle - timedelta(days=10))
+
+    def generated(self, user, suggestion_type):
+        return AISuggestion.objects.filter(user=user, suggestion_type=suggestion_type, is_actioned=False)
+
+    def test_signals_are_grouped_per_owner(self, meeting_suggestions):
+        SuggestionEngine().run([self.alice.id, self.bob.id])
+
+        follow_up, = self.generated(self.alice, 'follow_up')
+        self.assertEqual(
+            set(follow_up.leads.values_list('id', flat=True)),
+            set(Lead.objects.filter(owner=self.alice, value__lte=200).values_list('id', flat=True)),
+        )
+        self.assertFalse(self.generated(self.bob, 'follow_up').exists())
+
+        for user in (self.alice, self.bob):
+            opportunity, = self.generated(user, 'opportunity')
+            self.assertEqual(list(opportunity.leads.values_list('owner_id', 'stage')), [(user.id, 'Interested')])
+            self.assertEqual(opportunity.leads.get().value, 2000 if user == self.bob else 1000)
+
+        risk, = self.generated(self.bob, 'risk_alert')
+        self.assertEqual(risk.metric_value, '120.00')
+        self.assertEqual(risk.deals.count(), 2)
+        self.assertFalse(self.generated(self.alice, 'risk_alert').exists())
+
+    def test_rerun_replaces_unactioned_suggestions(self, meeting_suggestions):
+        generate_suggestions()
+        first = AISuggestion.objects.count()
+        actioned = AISuggestion.objects.filter(user=self.alice).first()
+        actioned.is_actioned = True
+        actioned.save()
+
+        generate_suggestions()
+        self.assertEqual(AISuggestion.objects.count(), first + 1)
+        self.assertTrue(AISuggestion.objects.filter(pk=actioned.pk).exists())
+
+    def test_expired_suggestions_of_unscanned_users_are_purged(self, meeting_suggestions):
+        generate_suggestions()
+        self.bob.is_active = False
+        self.bob.save()
+        AISuggestion.objects.filter(user=self.bob).update(expires_at=timezone.now() - timedelta(hours=1))
+        generate_suggestions()
+        self.assertFalse(AISuggestion.objects.filter(user=self.bob).exists())
+        self.assertTrue(AISuggestion.objects.filter(user=self.alice).exists())
+
+
+class TimeSeriesTests(TestCase):
+
+    def daily(self, first, count):
+        return [(first + timedelta(days=i), 1.0) for i in range(count)]
+
+    def test_partial_weeks_are_flagged_and_excluded(self):
+        # Wednesday to the Saturday two weeks later: only the middle week is whole
+        rows = self.daily(date(2026, 9, 28), 20)
+        series = build_series(rows, ['calls'], date(2026, 9, 30), date(2026, 10, 17), 'week')
+        self.assertEqual(series['dates'], ['2026-09-28', '2026-10-05', '2026-10-12'])
+        self.assertEqual(series['partial'], [True, False, True])
+        self.assertEqual(series['values']['calls'], [5.0, 7.0, 6.0])
+        self.assertEqual(series['moving_average']['calls'], [None, 7.0, None])
+        self.assertEqual(series['change_pct']['calls'], [None, None, None])
+
+    def test_moving_average_skips_partial_buckets(self):
+        rows = [(date(2026, month, 1), value) for month, value in [(1, 10.0), (2, 20.0), (3, 30.0), (4, 99.0)]]
+        series = build_series(rows, ['calls'], date(2026, 1, 1), date(2026, 4, 10), 'month', window=3)
+        self.assertEqual(series['partial'], [False, False, False, True])
+        self.assertEqual(series['moving_average']['calls'], [10.0, 15.0, 20.0, None])
+        self.assertEqual(series['change_pct']['calls'], [None, 100.0, 50.0, None])
+
+    def test_trend_starts_on_a_whole_bucket(self):
+        user = User.objects.create_user('alice', 'alice@example.com')
+        client = APIClient()
+        client.force_authenticate(user)
+        data = client.get('/api/dashboard/performance/trend/?resolution=week&days=30').data
+        first = date.fromisoformat(data['dates'][0])
+        self.assertEqual(first.weekday(), 0)
+        self.assertFalse(data['partial'][0])
+        self.assertEqual(data['partial'][-1], timezone.now().date().weekday() != 6)
+
+
+class PerformanceBulkRecordTests(TestCase):
+    url = '/api/dashboard/performance/record_performance_bulk/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com')
+        self.other = User.objects.create_user('bob', 'bob@example.com')
+        MarketingPerformanceMetric.objects.create(user=self.other, metric_date=date(2026, 3, 2), calls_made=7)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def metrics(self):
+        return dict(
+            MarketingPerformanceMetric.objects.filter(user=self.user)
+            .order_by('metric_date').values_list('metric_date', 'calls_made')
+        )
+
+    def test_upserts_every_day(self):
+        days = [{'metric_date': f'2026-03-0{day}', 'calls_made': day, 'meetings_held': 1} for day in (1, 2, 3)]
+        response = self.client.post(self.url, {'metrics': days}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['recorded'], 3)
+        self.assertEqual(str(response.data['start_date']), '2026-03-01')
+
+        # Overwrites, resetting omitted fields like record_performance does
+        response = self.client.post(self.url, [{'metric_date': '2026-03-02', 'calls_made': 20}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.metrics(), {date(2026, 3, 1): 1, date(2026, 3, 2): 20, date(2026, 3, 3): 3})
+        self.assertEqual(
+            MarketingPerformanceMetric.objects.get(user=self.user, metric_date=date(2026, 3, 2)).meetings_held, 0
+        )
+        self.assertEqual(MarketingPerformanceMetric.objects.get(user=self.other).calls_made, 7)
+
+    def test_rejects_invalid_batches(self):
+        too_many = [{'metric_date': str(date(2025, 1, 1) + timedelta(days=i))} for i in range(367)]
+        for payload in [
+            [],
+            [{'metric_date': '2026-03-01'}, {'metric_date': '2026-03-01'}],
+            [{'metric_date': 'not-a-date'}],
+            too_many,
+        ]:
+            with self.subTest(size=len(payload)):
+                self.assertEqual(self.client.post(self.url, payload, format='json').status_code, 400)
+        self.assertEqual(self.metrics(), {})
@@ -0,0 +1,119 @@
+"""
+Dense, bucketed time series built with NumPy.
+
+Rows fetched with values_list are scattered onto a day grid (so missing days
+become zeros), summed into day/week/month buckets and decorated with trailing
+moving averages and period-over-period changes. Buckets the range covers only
+in part are flagged and left out of the averages and changes, so a three-day
+week never reads as a 57% drop.
+"""
+import numpy as np
+
+
+RESOLUTIONS = ('day', 'week', 'month')
+DEFAULT_WINDOWS = {'day': 7, 'week': 4, 'month': 3}
+
+
+def _to_list(values):
+    """Convert a float array to a JSON-friendly list with None for NaN"""
+    return [None if np.isnan(value) else round(float(value), 4) for value in values]
+
+
+def _bucket_starts(days, resolution):
+    if resolution == 'day':
+        return days
+    if resolution == 'week':
+        # Weeks start on Monday; numpy day 0 (1970-01-01) was a Thursday
+        return days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+    return days.astype('datetime64[M]').astype('datetime64[D]')
+
+
+def _bucket_lengths(labels, resolution):
+    """Number of days in each full bucket"""
+    if resolution == 'day':
+        return np.ones(len(labels), dtype=np.int64)
+    if resolution == 'week':
+        return np.full(len(labels), 7, dtype=np.int64)
+    next_months = (labels.astype('datetime64[M]') + 1).astype('datetime64[D]')
+    return (next_months - labels).astype(np.int64)
+
+
+def bucket_start(day, resolution):
+    """First day of the bucket containing `day`, as a date"""
+    return _bucket_starts(np.array([day], dtype='datetime64[D]'), resolution)[0].astype(object)
+
+
+def _bucket_index(days, resolution):
+    """Return (bucket id per day, first day of each bucket, whether each bucket is partial)"""
+    labels, buckets = np.unique(_bucket_starts(days, resolution), return_inverse=True)
+    partial = np.bincount(buckets, minlength=len(labels)) < _bucket_lengths(labels, resolution)
+    return buckets, labels, partial
+
+
+def trailing_mean(values, window, mask=None):
+    """
+    Mean of the last `window` points, using a shorter window at the start.
+    Points where mask is False are skipped: they get NaN and add nothing to
+    their neighbours' means.
+    """
+    if mask is None:
+        mask = np.ones(len(values), dtype=bool)
+    weights = mask.astype(float)[:, None]
+    cumulative = np.cumsum(np.where(weights > 0, values, 0), axis=0)
+    counted = np.cumsum(weights, axis=0)
+    shifted, shifted_counted = np.zeros_like(cumulative), np.zeros_like(counted)
+    shifted[window:], shifted_counted[window:] = cumulative[:-window], counted[:-window]
+    counts = counted - shifted_counted
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = (cumulative - shifted) / counts
+    return np.where(weights > 0, means, np.nan)
+
+
+def period_change(values, mask=None):
+    """Absolute and percentage change from the previous bucket, NaN where mask excludes either"""
+    if mask is not None:
+        values = np.where(mask[:, None], values, np.nan)
+    previous = np.vstack([np.full((1, values.shape[1]), np.nan), values[:-1]])
+    delta = values - previous
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(previous != 0, delta / previous * 100, np.nan)
+    return delta, pct
+
+
+def build_series(rows, fields, start, end, resolution='day', window=None):
+    """
+    rows: iterable of (date, *field values) tuples.
+    Returns a dict of bucket labels, summed values, moving averages and changes.
+    Pass a start from bucket_start() so only the trailing, in-progress bucket
+    can be partial.
+    """
+    start64 = np.datetime64(start, 'D')
+    days = np.arange(start64, np.datetime64(end, 'D') + 1)
+    dense = np.zeros((len(days), len(fields)))
+
+    rows = list(rows)
+    if rows:
+        dates = np.array([row[0] for row in rows], dtype='datetime64[D]')
+        values = np.array([row[1:] for row in rows], dtype=float)
+        offsets = (dates - start64).astype(np.int64)
+        in_range = (offsets >= 0) & (offsets < len(days))
+        np.add.at(dense, offsets[in_range], values[in_range])
+
+    buckets, labels, partial = _bucket_index(days, resolution)
+    summed = np.zeros((len(labels), len(fields)))
+    np.add.at(summed, buckets, dense)
+
+    window = max(1, window or DEFAULT_WINDOWS[resolution])
+    averages = trailing_mean(summed, window, mask=~partial)
+    delta, pct = period_change(summed, mask=~partial)
+
+    return {
+        'resolution': resolution,
+        'window': window,
+        'dates': [str(label) for label in labels],
+        'partial': partial.tolist(),
+        'values': {field: _to_list(summed[:, i]) for i, field in enumerate(fields)},
+        'moving_average': {field: _to_list(averages[:, i]) for i, field in enumerate(fields)},
+        'change': {field: _to_list(delta[:, i]) for i, field in enumerate(fields)},
+        'change_pct': {field: _to_list(pct[:, i]) for i, field in enumerate(fields)},
+    }
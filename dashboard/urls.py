@@ -1,12 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DashboardViewSet, ActivityViewSet, AISuggestionViewSet, MarketingPerformanceViewSet
+from .views import (
+    DashboardViewSet, ActivityViewSet, AISuggestionViewSet,
+    MarketingPerformanceViewSet, TeamPerformanceViewSet,
+)
 
 router = DefaultRouter()
 router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 router.register(r'activities', ActivityViewSet, basename='activity')
 router.register(r'suggestions', AISuggestionViewSet, basename='suggestion')
 router.register(r'performance', MarketingPerformanceViewSet, basename='performance')
+router.register(r'team', TeamPerformanceViewSet, basename='team')
 
 urlpatterns = [
     path('', include(router.urls)),
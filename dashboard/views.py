@@ -1,20 +1,57 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from datetime import datetime, timedelta
 from django.db.models import Count, Q, Sum, Avg
-from .models import DashboardMetric, DashboardActivity, AISuggestion, MarketingPerformanceMetric
+from django.db.models.functions import TruncDate
+from collections import defaultdict
+import hashlib
+import json
+from crmbackend.pagination import KeysetPagination
+from deals.models import Deal
+from leads.models import Lead
+from .buffer import dropped_activity_count, get_activity_buffer
+from .funnel import funnel_report
+from .timeseries import RESOLUTIONS, bucket_start, build_series
+from .cache import (
+    SUMMARY_CACHE_TTL, ACTIVITY_SUMMARY_CACHE_TTL,
+    cache_enabled, get_or_build, invalidate_dashboard_cache, user_cache_key,
+)
+from .models import (
+    DashboardMetric, DashboardActivity, AISuggestion,
+    MarketingPerformanceMetric, PerformanceRollup,
+)
+from .rollups import (
+    LEADERBOARD_METRICS, ROLLUP_FIELDS, leaderboard_rows, month_start, previous_month, previous_standing,
+)
 from .serializers import (
     DashboardMetricSerializer,
     DashboardActivitySerializer,
+    DashboardActivityCreateSerializer,
     AISuggestionSerializer,
     MarketingPerformanceSerializer,
+    MarketingPerformanceRecordSerializer,
+    PerformanceRollupSerializer,
     DashboardSummarySerializer
 )
 
 
+def parse_id_list(value):
+    """Accept a list of ids or a comma-separated string and return ints"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [int(str(item).strip()) for item in value if str(item).strip().isdigit()]
+
+
 class DashboardViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     
@@ -26,38 +63,70 @@ class DashboardViewSet(viewsets.ReadOnlyModelViewSet):
     def summary(self, request):
         """Get comprehensive dashboard summary"""
         user = request.user
+        # Entries are keyed by the user's data version, so any write makes them
+        # unreachable; the month is in the key because the month's first read
+        # recomputes new_leads_this_month. A hit answers without touching the database.
+        prefix = f'summary:{timezone.now():%Y-%m}'
+        cached = cache.get(user_cache_key(prefix, user.id)) if cache_enabled() else None
+        if cached is None:
+            # That recompute bumps the user's version, so resolve metrics before the key
+            metric = DashboardMetric.get_for_user(user)
+            cached = get_or_build(
+                prefix, user.id, lambda: self._summary_entry(user, metric), SUMMARY_CACHE_TTL
+            )
         
-        # Get or create dashboard metric
-        metric, _ = DashboardMetric.objects.get_or_create(user=user)
-        metric.calculate_metrics()
+        response = get_conditional_response(
+            request,
+            etag=cached['etag'],
+            last_modified=cached['last_modified'],
+        )
+        if response is None:
+            response = Response(cached['data'])
         
+        response['ETag'] = cached['etag']
+        response['Last-Modified'] = http_date(cached['last_modified'])
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    def _summary_entry(self, user, metric):
+        """Summary payload with the validators conditional requests are checked against"""
+        data = self._build_summary(user, metric)
+        fingerprint = json.dumps(
+            {key: value for key, value in data.items() if key != 'dashboard_timestamp'},
+            cls=DjangoJSONEncoder,
+            sort_keys=True,
+        )
+        return {
+            'data': data,
+            'etag': quote_etag(hashlib.md5(fingerprint.encode()).hexdigest()),
+            'last_modified': int(timezone.now().timestamp()),
+        }
+    
+    def _build_summary(self, user, metric):
+        """Assemble the summary payload from the database"""
         # Get recent activities
         activities = DashboardActivity.objects.filter(
             user=user
-        ).order_by('-created_at')[:10]
+        ).select_related('user').order_by('-created_at')[:10]
         
         # Get active AI suggestions
         suggestions = AISuggestion.objects.filter(
             user=user,
             expires_at__gt=timezone.now(),
             is_actioned=False
-        ).order_by('-priority', '-created_at')[:5]
+        ).with_related_ids().order_by('-priority', '-created_at')[:5]
         
-        data = {
+        return {
             'metrics': DashboardMetricSerializer(metric).data,
             'recent_activities': DashboardActivitySerializer(activities, many=True).data,
             'ai_suggestions': AISuggestionSerializer(suggestions, many=True).data,
             'dashboard_timestamp': timezone.now().isoformat()
         }
-        
-        return Response(data)
     
     @action(detail=False, methods=['get'])
     def metrics(self, request):
         """Get dashboard metrics"""
-        user = request.user
-        metric, _ = DashboardMetric.objects.get_or_create(user=user)
-        metric.calculate_metrics()
+        metric = DashboardMetric.get_for_user(request.user)
         
         serializer = DashboardMetricSerializer(metric)
         return Response(serializer.data)
@@ -71,15 +140,62 @@ class DashboardViewSet(viewsets.ReadOnlyModelViewSet):
         
         serializer = DashboardMetricSerializer(metric)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def funnel(self, request):
+        """Lead funnel: counts, conversion rates and time in stage, per lead source"""
+        source = request.query_params.get('source') or None
+        if source and source not in dict(Lead.SOURCE_CHOICES):
+            raise ValidationError({'source': f'Unknown source "{source}".'})
+        
+        data = get_or_build(
+            f'funnel:{source or ""}', request.user.id,
+            lambda: funnel_report(request.user.id, source=source), SUMMARY_CACHE_TTL,
+        )
+        return Response(data)
+
+
+# Upper bound on events accepted by a single log_batch request
+MAX_ACTIVITY_BATCH_SIZE = 500
+
+# Longest per-day histogram the activity summary will build
+MAX_HISTOGRAM_DAYS = 90
+
+# Upper bound on days accepted by a single record_performance_bulk request
+MAX_PERFORMANCE_BATCH_SIZE = 366
+
+# Longest window, in days, the performance trend will cover
+MAX_TREND_DAYS = 5 * 366
+
+TREND_FIELDS = [
+    'total_hours', 'active_hours',
+    'leads_contacted', 'deals_progressed',
+    'calls_made', 'meetings_held',
+]
+
+PERFORMANCE_RECORD_FIELDS = TREND_FIELDS + ['conversion_rate', 'avg_deal_value']
+
+
+class ActivityPagination(KeysetPagination):
+    page_size = 25
+    max_page_size = 100
+
+
+class RecentActivityPagination(ActivityPagination):
+    page_size = 15
+    page_size_query_param = 'limit'
 
 
 class ActivityViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = DashboardActivitySerializer
+    pagination_class = ActivityPagination
     
     def get_queryset(self):
         """Return activities for current user"""
-        queryset = DashboardActivity.objects.filter(user=self.request.user)
+        queryset = DashboardActivity.objects.filter(
+            user=self.request.user
+        ).select_related('user')
         
         # Filter by type
         activity_type = self.request.query_params.get('type')
@@ -100,72 +216,136 @@ class ActivityViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['post'])
     def log_activity(self, request):
         """Create a new activity log"""
-        activity_type = request.data.get('activity_type')
-        title = request.data.get('title')
-        description = request.data.get('description', '')
-        action = request.data.get('action', '')
-        
-        if not activity_type or not title:
+        if not request.data.get('activity_type') or not request.data.get('title'):
             return Response(
                 {'detail': 'activity_type and title are required.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        activity = DashboardActivity.objects.create(
-            user=request.user,
-            activity_type=activity_type,
-            title=title,
-            description=description,
-            action=action,
-            lead_id=request.data.get('lead_id'),
-            deal_id=request.data.get('deal_id'),
-            task_id=request.data.get('task_id'),
-            old_value=request.data.get('old_value'),
-            new_value=request.data.get('new_value'),
+        serializer = DashboardActivityCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        buffer = get_activity_buffer()
+        if buffer is not None:
+            # Write-behind: queue the row and acknowledge before it is persisted
+            activity = DashboardActivity(user=request.user, **serializer.validated_data)
+            buffer.add(activity)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+        
+        activity = serializer.save(user=request.user)
+        return Response(
+            DashboardActivitySerializer(activity).data,
+            status=status.HTTP_201_CREATED
         )
+    
+    @action(detail=False, methods=['post'])
+    def log_batch(self, request):
+        """Create many activity logs with a single insert"""
+        events = request.data.get('activities') if isinstance(request.data, dict) else request.data
+        if not isinstance(events, list) or not events:
+            return Response(
+                {'detail': 'Expected a non-empty list of activities.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(events) > MAX_ACTIVITY_BATCH_SIZE:
+            return Response(
+                {'detail': f'At most {MAX_ACTIVITY_BATCH_SIZE} activities can be logged per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        serializer = DashboardActivitySerializer(activity)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        serializer = DashboardActivityCreateSerializer(data=events, many=True)
+        serializer.is_valid(raise_exception=True)
+        
+        activities = DashboardActivity.objects.bulk_create([
+            DashboardActivity(user=request.user, **item)
+            for item in serializer.validated_data
+        ])
+        # bulk_create sends no post_save, so invalidate cached summaries here
+        invalidate_dashboard_cache(request.user.id)
+        
+        return Response({'created': len(activities)}, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def buffer_status(self, request):
+        """Write-behind buffer health for operators: queued and dropped events"""
+        buffer = get_activity_buffer()
+        return Response({
+            'enabled': buffer is not None,
+            'pending': buffer.pending if buffer is not None else 0,
+            'dropped': dropped_activity_count(),
+        })
     
     @action(detail=False, methods=['get'])
     def recent(self, request):
         """Get recent activities"""
-        limit = request.query_params.get('limit', 15)
-        try:
-            limit = int(limit)
-        except ValueError:
-            limit = 15
-        
-        activities = self.get_queryset()[:limit]
+        # Same cursor format as the list endpoint; ?limit= is capped by max_page_size
+        paginator = RecentActivityPagination()
+        activities = paginator.paginate_queryset(self.get_queryset(), request, view=self)
         serializer = self.get_serializer(activities, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Get activity summary"""
+        """Get activity summary with a per-day histogram"""
+        try:
+            days = min(max(int(request.query_params.get('days', 14)), 1), MAX_HISTOGRAM_DAYS)
+        except ValueError:
+            days = 14
+        
+        data = get_or_build(
+            f'activity_summary:{days}', request.user.id,
+            lambda: self._build_summary(request.user, days), ACTIVITY_SUMMARY_CACHE_TTL,
+        )
+        return Response(data)
+    
+    def _build_summary(self, user, days):
+        """Compute every summary figure from one grouped aggregate query"""
         now = timezone.now()
         today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        week_start = now - timedelta(days=7)
+        month_start = now - timedelta(days=30)
+        histogram_start = today_start - timedelta(days=days - 1)
         
-        today_activities = DashboardActivity.objects.filter(
-            user=request.user,
-            created_at__gte=today_start
-        ).count()
-        
-        week_activities = DashboardActivity.objects.filter(
-            user=request.user,
-            created_at__gte=now - timedelta(days=7)
-        ).count()
-        
-        activity_types = DashboardActivity.objects.filter(
-            user=request.user,
-            created_at__gte=now - timedelta(days=30)
-        ).values('activity_type').annotate(count=Count('id'))
+        rows = DashboardActivity.objects.filter(
+            user=user,
+            created_at__gte=min(month_start, histogram_start)
+        ).order_by().values('activity_type', day=TruncDate('created_at')).annotate(
+            today=Count('id', filter=Q(created_at__gte=today_start)),
+            week=Count('id', filter=Q(created_at__gte=week_start)),
+            month=Count('id', filter=Q(created_at__gte=month_start)),
+            histogram=Count('id', filter=Q(created_at__gte=histogram_start)),
+        )
         
-        return Response({
+        today_activities = week_activities = month_activities = 0
+        type_counts = defaultdict(int)
+        daily_counts = defaultdict(int)
+        for row in rows:
+            today_activities += row['today']
+            week_activities += row['week']
+            month_activities += row['month']
+            if row['month']:
+                type_counts[row['activity_type']] += row['month']
+            if row['histogram']:
+                daily_counts[row['day']] += row['histogram']
+        
+        # Gap-fill so every day in the window is present
+        first_day = histogram_start.date()
+        daily = [
+            {'date': (first_day + timedelta(days=offset)).isoformat(),
+             'count': daily_counts.get(first_day + timedelta(days=offset), 0)}
+            for offset in range(days)
+        ]
+        
+        return {
             'today_activities': today_activities,
             'week_activities': week_activities,
-            'activity_types': activity_types
-        })
+            'month_activities': month_activities,
+            'activity_types': [
+                {'activity_type': activity_type, 'count': count}
+                for activity_type, count in sorted(type_counts.items())
+            ],
+            'daily': daily,
+        }
 
 
 class AISuggestionViewSet(viewsets.ModelViewSet):
@@ -186,6 +366,15 @@ class AISuggestionViewSet(viewsets.ModelViewSet):
         if suggestion_type:
             queryset = queryset.filter(suggestion_type=suggestion_type)
         
+        # Filter by referenced lead or deal
+        lead_id = self.request.query_params.get('lead')
+        if lead_id and lead_id.isdigit():
+            queryset = queryset.filter(leads__id=lead_id)
+        
+        deal_id = self.request.query_params.get('deal')
+        if deal_id and deal_id.isdigit():
+            queryset = queryset.filter(deals__id=deal_id)
+        
         # Only active suggestions
         active_only = self.request.query_params.get('active_only', 'true')
         if active_only == 'true':
@@ -194,7 +383,7 @@ class AISuggestionViewSet(viewsets.ModelViewSet):
                 is_actioned=False
             )
         
-        return queryset.order_by('-priority', '-created_at')
+        return queryset.with_related_ids().order_by('-priority', '-created_at')
     
     @action(detail=True, methods=['post'])
     def mark_actioned(self, request, pk=None):
@@ -218,13 +407,19 @@ class AISuggestionViewSet(viewsets.ModelViewSet):
             title=request.data.get('title'),
             description=request.data.get('description'),
             confidence_score=request.data.get('confidence_score', 0.5),
-            lead_ids=request.data.get('lead_ids', ''),
-            deal_ids=request.data.get('deal_ids', ''),
             metric_value=request.data.get('metric_value'),
             metric_change=request.data.get('metric_change'),
             expires_at=timezone.now() + timedelta(days=int(request.data.get('days', 7)))
         )
         
+        # Only link records the user owns
+        lead_ids = parse_id_list(request.data.get('lead_ids'))
+        if lead_ids:
+            suggestion.leads.set(Lead.objects.filter(owner=request.user, id__in=lead_ids))
+        deal_ids = parse_id_list(request.data.get('deal_ids'))
+        if deal_ids:
+            suggestion.deals.set(Deal.objects.filter(owner=request.user, id__in=deal_ids))
+        
         serializer = self.get_serializer(suggestion)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
@@ -282,30 +477,39 @@ class MarketingPerformanceViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=['get'])
     def trend(self, request):
-        """Get performance trend data"""
-        days = int(request.query_params.get('days', 30))
-        start_date = timezone.now() - timedelta(days=days)
+        """Get gap-filled performance trend data at day, week or month resolution"""
+        resolution = request.query_params.get('resolution', 'day')
+        if resolution not in RESOLUTIONS:
+            return Response(
+                {'resolution': f'Must be one of: {", ".join(RESOLUTIONS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        metrics = MarketingPerformanceMetric.objects.filter(
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), MAX_TREND_DAYS)
+            window = int(request.query_params['window']) if 'window' in request.query_params else None
+        except ValueError:
+            return Response(
+                {'detail': 'days and window must be integers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        end_date = timezone.now().date()
+        # Widen to a whole first bucket; only the current bucket is then partial
+        start_date = bucket_start(end_date - timedelta(days=days - 1), resolution)
+        
+        rows = MarketingPerformanceMetric.objects.filter(
             user=request.user,
-            metric_date__gte=start_date.date()
-        ).order_by('metric_date')
-        
-        data = {
-            'dates': [],
-            'total_hours': [],
-            'active_hours': [],
-            'leads_contacted': [],
-            'deals_progressed': [],
-        }
+            metric_date__gte=start_date,
+            metric_date__lte=end_date
+        ).order_by().values_list('metric_date', *TREND_FIELDS)
         
-        for metric in metrics:
-            data['dates'].append(metric.metric_date.isoformat())
-            data['total_hours'].append(metric.total_hours)
-            data['active_hours'].append(metric.active_hours)
-            data['leads_contacted'].append(metric.leads_contacted)
-            data['deals_progressed'].append(metric.deals_progressed)
+        series = build_series(rows, TREND_FIELDS, start_date, end_date, resolution, window)
         
+        # Keep the flat per-field lists earlier clients read
+        data = {'dates': series.pop('dates')}
+        data.update(series.pop('values'))
+        data.update(series)
         return Response(data)
     
     @action(detail=False, methods=['post'])
@@ -330,4 +534,142 @@ class MarketingPerformanceViewSet(viewsets.ReadOnlyModelViewSet):
         
         serializer = self.get_serializer(metric)
         status_code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
-        return Response(serializer.data, status=status_code)
\ No newline at end of file
+        return Response(serializer.data, status=status_code)
+    
+    @action(detail=False, methods=['post'])
+    def record_performance_bulk(self, request):
+        """Insert or overwrite performance metrics for many days in one statement"""
+        rows = request.data.get('metrics') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'detail': 'Expected a non-empty list of metrics.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > MAX_PERFORMANCE_BATCH_SIZE:
+            return Response(
+                {'detail': f'At most {MAX_PERFORMANCE_BATCH_SIZE} days can be recorded per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = MarketingPerformanceRecordSerializer(data=rows, many=True)
+        serializer.is_valid(raise_exception=True)
+        
+        # A single upsert cannot touch the same row twice
+        dates = [item['metric_date'] for item in serializer.validated_data]
+        duplicates = sorted({str(day) for day in dates if dates.count(day) > 1})
+        if duplicates:
+            return Response(
+                {'metric_date': f'Duplicate dates in request: {", ".join(duplicates)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Same semantics as record_performance: omitted fields are reset to zero
+        MarketingPerformanceMetric.objects.bulk_create(
+            [
+                MarketingPerformanceMetric(user=request.user, **item)
+                for item in serializer.validated_data
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'metric_date'],
+            update_fields=PERFORMANCE_RECORD_FIELDS,
+        )
+        
+        return Response({
+            'recorded': len(dates),
+            'start_date': min(dates),
+            'end_date': max(dates),
+        })
+
+
+class TeamPerformanceViewSet(viewsets.ReadOnlyModelViewSet):
+    """Org-wide rollups and leaderboard, served from PerformanceRollup"""
+    permission_classes = [IsAdminUser]
+    serializer_class = PerformanceRollupSerializer
+    
+    def get_period(self):
+        """Month requested via ?period=YYYY-MM, defaulting to the current month"""
+        period = self.request.query_params.get('period')
+        if not period:
+            return month_start(timezone.now().date())
+        try:
+            return datetime.strptime(period, '%Y-%m').date()
+        except ValueError:
+            raise ValidationError({'period': 'Use the YYYY-MM format.'})
+    
+    def get_queryset(self):
+        return PerformanceRollup.objects.filter(
+            period_start=self.get_period()
+        ).select_related('user').order_by('rank')
+    
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        """Rank reps by a metric with percentiles and previous-period comparison"""
+        metric = request.query_params.get('metric', 'won_value')
+        if metric not in LEADERBOARD_METRICS:
+            return Response(
+                {'metric': f'Must be one of: {", ".join(LEADERBOARD_METRICS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 500)
+        except ValueError:
+            limit = 50
+        
+        period = self.get_period()
+        team_size, rows = leaderboard_rows(period, metric, limit)
+        previous_by_user = previous_standing(
+            previous_month(period), metric, [row['user_id'] for row in rows]
+        )
+        
+        results = []
+        for row in rows:
+            before = previous_by_user.get(row['user_id'])
+            value = float(row[metric] or 0)
+            previous_value = float(before[0] or 0) if before else None
+            results.append({
+                'user_id': row['user_id'],
+                'user_email': row['user__email'],
+                'user_name': f"{row['user__first_name']} {row['user__last_name']}".strip(),
+                'value': value,
+                'rank': row['rank'],
+                'percentile': row['percentile'],
+                'previous_value': previous_value,
+                'previous_rank': before[1] if before else None,
+                'change': value - previous_value if before else None,
+            })
+        
+        return Response({
+            'period': period.strftime('%Y-%m'),
+            'metric': metric,
+            'team_size': team_size,
+            'results': results,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Org totals for the period compared with the previous one"""
+        period = self.get_period()
+        previous = previous_month(period)
+        totals = {
+            row['period_start']: row
+            for row in PerformanceRollup.objects.filter(
+                period_start__in=[period, previous]
+            ).order_by().values('period_start').annotate(
+                team_size=Count('id'),
+                **{f'total_{field}': Sum(field) for field in ROLLUP_FIELDS}
+            )
+        }
+        
+        current = totals.get(period, {})
+        before = totals.get(previous, {})
+        data = {'period': period.strftime('%Y-%m'), 'team_size': current.get('team_size', 0)}
+        for field in ROLLUP_FIELDS:
+            value = float(current.get(f'total_{field}') or 0)
+            previous_value = float(before.get(f'total_{field}') or 0)
+            data[field] = {
+                'total': value,
+                'previous': previous_value,
+                'change': value - previous_value,
+                'change_pct': round((value - previous_value) / previous_value * 100, 2) if previous_value else None,
+            }
+        return Response(data)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:36
+
+from django.db import migrations, models
+
+from crmbackend.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('deals', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(fields=['owner', '-created_at'], name='deal_owner_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(fields=['owner', 'stage', '-created_at'], name='deal_owner_stage_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(fields=['owner', 'status', '-created_at'], name='deal_owner_status_created_idx'),
+        ),
+    ]
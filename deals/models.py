@@ -44,6 +44,12 @@ class Deal(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # Match the list filters (owner, then stage or status) and the default ordering
+        indexes = [
+            models.Index(fields=['owner', '-created_at'], name='deal_owner_created_idx'),
+            models.Index(fields=['owner', 'stage', '-created_at'], name='deal_owner_stage_created_idx'),
+            models.Index(fields=['owner', 'status', '-created_at'], name='deal_owner_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.client or 'No Client'}"
@@ -1,3 +1,22 @@
+from unittest import skipUnless
+
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Deal
+
+
+@skipUnless(connection.vendor == 'sqlite', "Asserts on SQLite query plans")
+class DealListIndexTests(TestCase):
+
+    def test_list_filters_use_composite_indexes(self):
+        cases = [
+            ({}, 'deal_owner_created_idx'),
+            ({'stage': 'Orders'}, 'deal_owner_stage_created_idx'),
+            ({'status': 'Open'}, 'deal_owner_status_created_idx'),
+        ]
+        for filters, index in cases:
+            with self.subTest(index=index):
+                plan = Deal.objects.filter(owner_id=1, **filters).order_by('-created_at').explain()
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
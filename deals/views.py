@@ -4,6 +4,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.db.models import Q
+from crmbackend.facets import facet_counts, params_digest
+from dashboard.cache import FACETS_CACHE_TTL, get_or_build
+from dashboard.models import CLOSED_DEAL_STATUSES
 from .models import Deal, DealComment, DealAttachment
 from .serializers import (
     DealSerializer, 
@@ -13,26 +16,35 @@ from .serializers import (
 )
 
 
+# Deals have no lead source, so stage and status are their only facets
+DEAL_FACETS = {
+    'stage': Deal.STAGE_CHOICES,
+    'status': Deal.STATUS_CHOICES,
+}
+DEAL_FILTER_PARAMS = ['stage', 'status', 'search']
+
+
 class DealViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
     
-    def get_queryset(self):
-        """Return deals owned by the current user"""
+    def filter_queryset_by_params(self, apply_facets=True):
+        """Deals owned by the current user, narrowed by the list query parameters"""
         queryset = Deal.objects.filter(owner=self.request.user)
         
-        # Filter by stage
-        stage = self.request.query_params.get('stage')
-        if (stage):
-            queryset = queryset.filter(stage=stage)
-        
-        # Filter by status
-        status_filter = self.request.query_params.get('status')
-        if status_filter:
-            if status_filter == 'Active':
-                queryset = queryset.exclude(status__in=['Won', 'Lost'])
-            else:
-                queryset = queryset.filter(status=status_filter)
+        if apply_facets:
+            # Filter by stage
+            stage = self.request.query_params.get('stage')
+            if (stage):
+                queryset = queryset.filter(stage=stage)
+            
+            # Filter by status
+            status_filter = self.request.query_params.get('status')
+            if status_filter:
+                if status_filter == 'Active':
+                    queryset = queryset.exclude(status__in=CLOSED_DEAL_STATUSES)
+                else:
+                    queryset = queryset.filter(status=status_filter)
         
         # Search by title, client, or description
         search = self.request.query_params.get('search')
@@ -43,7 +55,11 @@ class DealViewSet(viewsets.ModelViewSet):
                 Q(description__icontains=search)
             )
         
-        return queryset.select_related('owner').prefetch_related(
+        return queryset
+    
+    def get_queryset(self):
+        """Return deals owned by the current user"""
+        return self.filter_queryset_by_params().select_related('owner').prefetch_related(
             'comments', 'attachments'
         )
     
@@ -57,6 +73,26 @@ class DealViewSet(viewsets.ModelViewSet):
         """Set the owner to the current user"""
         serializer.save(owner=self.request.user)
     
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Deal counts per stage and status for the current search and filters"""
+        selected = {}
+        stage = request.query_params.get('stage')
+        if stage:
+            selected['stage'] = lambda value: value == stage
+        status_filter = request.query_params.get('status')
+        # ?status=Active means not closed
+        if status_filter == 'Active':
+            selected['status'] = lambda value: value not in CLOSED_DEAL_STATUSES
+        elif status_filter:
+            selected['status'] = lambda value: value == status_filter
+        data = get_or_build(
+            f'deal_facets:{params_digest(request.query_params, DEAL_FILTER_PARAMS)}', request.user.id,
+            lambda: facet_counts(self.filter_queryset_by_params(apply_facets=False), DEAL_FACETS, selected),
+            FACETS_CACHE_TTL,
+        )
+        return Response(data)
+    
     @action(detail=True, methods=['post'])
     def add_comment(self, request, pk=None):
         """Add a comment to a deal"""
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Lead, LeadNote, LeadActivity
+from .models import Lead, LeadNote, LeadActivity, LeadStageTransition, LeadImportJob
 
 @admin.register(Lead)
 class LeadAdmin(admin.ModelAdmin):
@@ -33,4 +33,18 @@ class LeadNoteAdmin(admin.ModelAdmin):
 class LeadActivityAdmin(admin.ModelAdmin):
     list_display = ['lead', 'activity_type', 'activity_date', 'created_by']
     list_filter = ['activity_type', 'activity_date']
-    search_fields = ['lead__name', 'description']
\ No newline at end of file
+    search_fields = ['lead__name', 'description']
+
+@admin.register(LeadStageTransition)
+class LeadStageTransitionAdmin(admin.ModelAdmin):
+    list_display = ['lead', 'from_stage', 'to_stage', 'source', 'owner', 'transitioned_at']
+    list_filter = ['to_stage', 'source', 'transitioned_at']
+    search_fields = ['lead__name']
+    raw_id_fields = ['lead', 'owner']
+
+@admin.register(LeadImportJob)
+class LeadImportJobAdmin(admin.ModelAdmin):
+    list_display = ['original_name', 'owner', 'status', 'processed_rows', 'created_count', 'error_count', 'created_at']
+    list_filter = ['status', 'file_format', 'created_at']
+    search_fields = ['original_name', 'owner__email']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
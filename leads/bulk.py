@@ -0,0 +1,93 @@
+"""
+Bulk lead mutations.
+
+An update runs as a single owner-scoped UPDATE. A delete goes through the ORM
+in chunks, with the per-lead receivers suspended. Either way, leads_bulk_changed
+is sent once at the end, so dashboard metrics, the funnel and caches catch up
+in one go.
+"""
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import DEDUP_KEY_SOURCES, Lead, LeadStageTransition
+from .signals import leads_bulk_changed, suspend_per_lead_receivers
+
+DELETE_CHUNK_SIZE = 1000
+
+
+def owned(owner, queryset):
+    """The owner's leads among queryset, as a plain queryset safe to update or delete"""
+    return Lead.objects.filter(owner=owner, pk__in=queryset.values('pk'))
+
+
+def _log_stage_changes(leads, patch, now):
+    """Write the stage transitions an UPDATE of leads with patch is about to make"""
+    entered_at = (
+        LeadStageTransition.objects.filter(lead=OuterRef('pk'))
+        .order_by('-transitioned_at', '-id').values('transitioned_at')[:1]
+    )
+    rows = (
+        leads.select_for_update().order_by()
+        .annotate(entered_at=Subquery(entered_at))
+        .values_list('id', 'owner_id', 'source', 'stage', 'created_at', 'entered_at')
+    )
+    new_owner = patch.get('owner')
+    transitions = []
+    for lead_id, owner_id, source, stage, created_at, entered in rows:
+        if entered is None:
+            # Bulk-created and never logged: record the stage it was created in first
+            transitions.append(LeadStageTransition(
+                lead_id=lead_id, owner_id=owner_id, source=source,
+                to_stage=stage, transitioned_at=created_at,
+            ))
+            entered = created_at
+        transitions.append(LeadStageTransition(
+            lead_id=lead_id,
+            owner_id=new_owner.pk if new_owner else owner_id,
+            source=patch.get('source', source),
+            from_stage=stage,
+            to_stage=patch['stage'],
+            transitioned_at=now,
+            seconds_in_previous_stage=max((now - entered).total_seconds(), 0),
+        ))
+    LeadStageTransition.objects.bulk_create(transitions, batch_size=2000)
+
+
+def bulk_update_leads(owner, queryset, patch):
+    """Apply a validated field patch to the owner's leads in queryset; returns the rows updated"""
+    leads = owned(owner, queryset)
+    now = timezone.now()
+    # update() skips save(): keep auto_now and the dedup keys in step by hand
+    values = dict(patch, updated_at=now)
+    for key, (source, normalize) in DEDUP_KEY_SOURCES.items():
+        if source in patch:
+            values[key] = normalize(patch[source])
+
+    with transaction.atomic():
+        if 'stage' in patch:
+            _log_stage_changes(leads.exclude(stage=patch['stage']), patch, now)
+        updated = leads.update(**values)
+
+    if updated:
+        # Only the requester and a reassignment target validated by the caller are affected
+        owner_ids = {owner.pk}
+        if patch.get('owner'):
+            owner_ids.add(patch['owner'].pk)
+        leads_bulk_changed.send(sender=Lead, owner_ids=sorted(owner_ids))
+    return updated
+
+
+def bulk_delete_leads(owner, queryset, chunk_size=DELETE_CHUNK_SIZE):
+    """Delete the owner's leads in queryset, chunk by chunk; returns the leads deleted"""
+    lead_ids = list(owned(owner, queryset).order_by('pk').values_list('pk', flat=True))
+    deleted = 0
+    with suspend_per_lead_receivers():
+        for start in range(0, len(lead_ids), chunk_size):
+            with transaction.atomic():
+                _, counts = Lead.objects.filter(owner=owner, pk__in=lead_ids[start:start + chunk_size]).delete()
+            deleted += counts.get(Lead._meta.label, 0)
+
+    if deleted:
+        leads_bulk_changed.send(sender=Lead, owner_ids=[owner.pk])
+    return deleted
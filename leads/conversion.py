@@ -0,0 +1,45 @@
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Lead
+from .signals import leads_bulk_changed
+
+
+def deal_for_lead(Deal, lead):
+    """Unsaved Deal carrying over the lead's company, value and notes"""
+    return Deal(
+        title=f"Deal with {lead.company or lead.name}",
+        client=lead.company or lead.name,
+        description=lead.notes,
+        amount=lead.value,
+        owner_id=lead.owner_id,
+    )
+
+
+def convert_leads(owner, lead_ids):
+    """
+    Convert the owner's unconverted leads among lead_ids to deals: one
+    bulk_create for the deals and one UPDATE for the lead status.
+    Returns a list of (lead, deal) pairs.
+    """
+    Deal = apps.get_model('deals', 'Deal')
+    with transaction.atomic():
+        leads = list(
+            Lead.objects.select_for_update()
+            .filter(owner=owner, id__in=lead_ids)
+            .exclude(status='Converted')
+            .order_by('id')
+        )
+        if not leads:
+            return []
+        deals = Deal.objects.bulk_create([deal_for_lead(Deal, lead) for lead in leads])
+        Lead.objects.filter(id__in=[lead.id for lead in leads]).update(
+            status='Converted', updated_at=timezone.now()
+        )
+
+    for lead in leads:
+        lead.status = 'Converted'
+    # bulk_create and update() skip the per-row signals the dashboard metrics rely on
+    leads_bulk_changed.send(sender=Lead, owner_ids=[owner.id])
+    return list(zip(leads, deals))
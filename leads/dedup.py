@@ -0,0 +1,135 @@
+"""
+Duplicate detection and merging for leads.
+
+Candidates are found with grouped equality queries on the indexed blocking
+keys (see leads.keys), never by comparing leads pairwise. Leads that share an
+email key or a phone key are duplicates; leads that share a company key are
+duplicates only when their names also match. Overlapping matches are joined
+into one group with a union-find.
+"""
+from collections import defaultdict
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count
+
+from crmbackend.thumbnails import schedule_thumbnails
+
+from .keys import normalize_name
+from .models import Lead, LeadNote, LeadActivity
+
+# Survivor fields filled from the first duplicate that has a value
+MERGE_FILL_FIELDS = ['email', 'phone', 'company', 'position', 'image']
+
+
+def _shared_values(queryset, key):
+    """Key values held by more than one lead in the queryset"""
+    return (
+        queryset.exclude(**{key: ''})
+        .order_by()
+        .values(key)
+        .annotate(lead_count=Count('id'))
+        .filter(lead_count__gt=1)
+        .values(key)
+    )
+
+
+def find_duplicate_groups(queryset):
+    """Return [(lead ids, matched_on labels)] for every duplicate group, largest first"""
+    parent = {}
+
+    def find(lead_id):
+        parent.setdefault(lead_id, lead_id)
+        while parent[lead_id] != lead_id:
+            parent[lead_id] = parent[parent[lead_id]]
+            lead_id = parent[lead_id]
+        return lead_id
+
+    edges = []
+
+    def link(ids, label):
+        if len(ids) < 2:
+            return
+        root = find(ids[0])
+        for lead_id in ids[1:]:
+            parent[find(lead_id)] = root
+        edges.append((ids[0], label))
+
+    for key, label in (('email_key', 'email'), ('phone_key', 'phone')):
+        blocks = defaultdict(list)
+        rows = queryset.filter(**{f'{key}__in': _shared_values(queryset, key)}).order_by().values_list('id', key)
+        for lead_id, value in rows:
+            blocks[value].append(lead_id)
+        for ids in blocks.values():
+            link(ids, label)
+
+    # A shared company alone is not a duplicate: compare names inside each company block
+    blocks = defaultdict(list)
+    rows = queryset.filter(
+        company_key__in=_shared_values(queryset, 'company_key')
+    ).order_by().values_list('id', 'company_key', 'name')
+    for lead_id, company_key, name in rows:
+        blocks[(company_key, normalize_name(name))].append(lead_id)
+    for ids in blocks.values():
+        link(ids, 'company_and_name')
+
+    members = defaultdict(list)
+    for lead_id in parent:
+        members[find(lead_id)].append(lead_id)
+    labels = defaultdict(set)
+    for lead_id, label in edges:
+        labels[find(lead_id)].add(label)
+
+    groups = [(sorted(ids), sorted(labels[root])) for root, ids in members.items()]
+    groups.sort(key=lambda group: (-len(group[0]), group[0][0]))
+    return groups
+
+
+def merge_leads(survivor, duplicates):
+    """
+    Fold duplicates into survivor in one transaction: re-point notes,
+    activities, suggestion links and related tasks, fill blank fields (an
+    image comes with its thumbnails), then delete the duplicates.
+    """
+    duplicate_ids = [lead.id for lead in duplicates]
+    with transaction.atomic():
+        LeadNote.objects.filter(lead_id__in=duplicate_ids).update(lead=survivor)
+        LeadActivity.objects.filter(lead_id__in=duplicate_ids).update(lead=survivor)
+
+        # Suggestion links: drop those the survivor already has, move the rest
+        links = Lead.ai_suggestions.through.objects
+        already_linked = links.filter(lead_id=survivor.id).values('aisuggestion_id')
+        links.filter(lead_id__in=duplicate_ids, aisuggestion_id__in=already_linked).delete()
+        links.filter(lead_id__in=duplicate_ids).update(lead_id=survivor.id)
+
+        Task = apps.get_model('tasks', 'Task')
+        Task.objects.filter(
+            content_type=ContentType.objects.get_for_model(Lead),
+            object_id__in=duplicate_ids,
+        ).update(object_id=survivor.id)
+
+        image_donor = None
+        for field in MERGE_FILL_FIELDS:
+            if not getattr(survivor, field):
+                donor = next((lead for lead in duplicates if getattr(lead, field)), None)
+                if donor:
+                    setattr(survivor, field, getattr(donor, field))
+                    if field == 'image':
+                        image_donor = donor
+        survivor.value = max([survivor.value] + [lead.value for lead in duplicates])
+        notes = [survivor.notes] + [lead.notes for lead in duplicates]
+        survivor.notes = '\n\n'.join(note for note in notes if note) or None
+        survivor.save()
+
+        if image_donor:
+            # The image is no new upload, so save() left the thumbnails column alone
+            survivor.image_thumbnails = Lead.objects.filter(pk=image_donor.pk).values_list(
+                'image_thumbnails', flat=True
+            ).first() or {}
+            Lead.objects.filter(pk=survivor.pk).update(image_thumbnails=survivor.image_thumbnails)
+            if not survivor.image_thumbnails:
+                schedule_thumbnails(survivor)
+
+        Lead.objects.filter(id__in=duplicate_ids).delete()
+    return survivor
@@ -0,0 +1,269 @@
+"""
+Background lead imports.
+
+Uploaded CSV and XLSX files are streamed row by row, validated with the same
+field rules as LeadSerializer and inserted with bulk_create in chunks. Progress
+and a capped per-row error report are stored on the LeadImportJob.
+
+Every progress write refreshes heartbeat_at, and each chunk commits together
+with a checkpoint of the counters. If the process running an import dies, the
+process_lead_imports command reclaims the job once its heartbeat is stale and
+resumes after the last committed chunk. Progress writes are conditional on
+the heartbeat the importer last wrote, so an importer whose job was reclaimed
+stops at its next write instead of inserting rows twice.
+"""
+import codecs
+import csv
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Lead, LeadImportJob
+from .serializers import LeadImportRowSerializer
+from .signals import leads_bulk_changed
+
+logger = logging.getLogger(__name__)
+
+# Stop storing per-row errors beyond this many; error_count keeps counting
+MAX_REPORTED_ERRORS = 1000
+
+# Persist progress (and the heartbeat) at least this often, in processed rows
+PROGRESS_INTERVAL = 500
+
+# A running job whose heartbeat is older than this is presumed dead
+STALE_IMPORT_AFTER = timedelta(minutes=10)
+
+PROGRESS_FIELDS = ['processed_rows', 'created_count', 'error_count', 'errors', 'checkpoint']
+
+
+class ImportReclaimed(Exception):
+    """Another process took over the job; this importer must stop writing"""
+
+
+def normalize_header(value):
+    """'Company Name ' -> 'company_name'"""
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def _clean_cell(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store phone numbers and whole amounts as floats
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def iter_csv_rows(handle):
+    """Yield one dict per CSV data row, decoding the binary file as it is read"""
+    reader = csv.reader(codecs.iterdecode(handle, 'utf-8-sig'))
+    header = [normalize_header(name) for name in next(reader, [])]
+    for values in reader:
+        yield dict(zip(header, values))
+
+
+def iter_xlsx_rows(handle):
+    """Yield one dict per row of the first worksheet in read-only (streaming) mode"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(handle, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [normalize_header(name) for name in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def count_rows(job):
+    """Number of data rows, used to report progress"""
+    with job.file.open('rb') as handle:
+        if job.file_format == 'xlsx':
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(handle, read_only=True)
+            try:
+                return max((workbook.worksheets[0].max_row or 1) - 1, 0)
+            finally:
+                workbook.close()
+        return max(sum(1 for _ in csv.reader(codecs.iterdecode(handle, 'utf-8-sig'))) - 1, 0)
+
+
+def stale_imports(stale_before):
+    """Running jobs whose importer last wrote progress before stale_before"""
+    return Q(status='running') & (
+        Q(heartbeat_at__lt=stale_before)
+        # Started before heartbeats were recorded
+        | Q(heartbeat_at__isnull=True, started_at__lt=stale_before)
+    )
+
+
+def _error_messages(detail):
+    """Flatten DRF error detail into plain strings for JSON storage"""
+    if isinstance(detail, dict):
+        return {field: _error_messages(messages) for field, messages in detail.items()}
+    if isinstance(detail, list):
+        return [str(message) for message in detail]
+    return [str(detail)]
+
+
+class LeadImporter:
+    """Process one LeadImportJob from start to finish"""
+
+    def __init__(self, job, chunk_size=None):
+        self.job = job
+        self.chunk_size = chunk_size or getattr(settings, 'LEAD_IMPORT_CHUNK_SIZE', 2000)
+        self.validator = LeadImportRowSerializer()
+        self.pending = []
+
+    def run(self, stale_before=None):
+        """Claim the job if pending (or running with a heartbeat before stale_before) and process it"""
+        job = self.job
+        now = timezone.now()
+        claim = Q(status='pending')
+        if stale_before is not None:
+            claim |= stale_imports(stale_before)
+        claimed = LeadImportJob.objects.filter(claim, pk=job.pk).update(status='running', heartbeat_at=now)
+        if not claimed:
+            return job
+        job.refresh_from_db()
+        if job.started_at is None:
+            job.started_at = now
+            self._save_progress('started_at')
+
+        # Resume after the last committed chunk; rows processed after it were not inserted
+        checkpoint = job.checkpoint
+        job.processed_rows = checkpoint.get('processed_rows', 0)
+        job.created_count = checkpoint.get('created_count', 0)
+        job.error_count = checkpoint.get('error_count', 0)
+        job.errors = job.errors[:checkpoint.get('reported_errors', 0)]
+        resume_after = checkpoint.get('row', 1)
+
+        try:
+            job.total_rows = count_rows(job)
+            self._save_progress('total_rows')
+
+            with job.file.open('rb') as handle:
+                rows = iter_xlsx_rows(handle) if job.file_format == 'xlsx' else iter_csv_rows(handle)
+                # Row 1 is the header, so data starts on spreadsheet row 2
+                for row_number, row in enumerate(rows, start=2):
+                    if row_number <= resume_after:
+                        continue
+                    if not self._process_row(row_number, row):
+                        continue
+                    if len(self.pending) >= self.chunk_size:
+                        self._flush(row_number)
+                    elif job.processed_rows % PROGRESS_INTERVAL == 0:
+                        self._save_progress()
+            self._flush()
+            job.status = 'completed'
+            job.message = f"Imported {job.created_count} of {job.processed_rows} rows."
+        except ImportReclaimed:
+            logger.warning("Lead import %s was reclaimed by another process; stopping", job.pk)
+            return job
+        except Exception as exc:
+            logger.exception("Lead import %s failed", job.pk)
+            job.status = 'failed'
+            job.message = f"Import stopped after {job.processed_rows} rows: {exc}"
+
+        # Refresh dependent metrics before the job reports that it has finished
+        if job.created_count:
+            leads_bulk_changed.send_robust(sender=Lead, owner_ids=[job.owner_id])
+        job.finished_at = timezone.now()
+        try:
+            self._save_progress('status', 'message', 'finished_at')
+        except ImportReclaimed:
+            logger.warning("Lead import %s was reclaimed by another process; stopping", job.pk)
+        return job
+
+    def _process_row(self, row_number, row):
+        """Validate one row and queue it for insert; returns False for blank rows"""
+        data = {
+            field: value
+            for field, value in ((field, _clean_cell(value)) for field, value in row.items())
+            if field and value is not None
+        }
+        if not data:
+            # Blank line, not counted as a row
+            return False
+
+        self.job.processed_rows += 1
+        try:
+            validated = self.validator.run_validation(data)
+        except ValidationError as exc:
+            self.job.error_count += 1
+            if len(self.job.errors) < MAX_REPORTED_ERRORS:
+                self.job.errors.append({'row': row_number, 'errors': _error_messages(exc.detail)})
+            return True
+        lead = Lead(owner_id=self.job.owner_id, **validated)
+        lead.set_dedup_keys()
+        self.pending.append(lead)
+        return True
+
+    def _flush(self, row_number=None):
+        """Insert the queued leads; row_number is the last row they cover"""
+        job = self.job
+        if self.pending:
+            with transaction.atomic():
+                Lead.objects.bulk_create(self.pending, batch_size=self.chunk_size)
+                job.created_count += len(self.pending)
+                if row_number is not None:
+                    job.checkpoint = {
+                        'row': row_number,
+                        'processed_rows': job.processed_rows,
+                        'created_count': job.created_count,
+                        'error_count': job.error_count,
+                        'reported_errors': len(job.errors),
+                    }
+                # Raises (rolling the insert back) if the job was reclaimed meanwhile
+                self._save_progress()
+            self.pending = []
+        else:
+            self._save_progress()
+
+    def _save_progress(self, *extra_fields):
+        """Write progress and a fresh heartbeat, provided this importer still owns the job"""
+        job = self.job
+        now = timezone.now()
+        saved = LeadImportJob.objects.filter(
+            pk=job.pk, status='running', heartbeat_at=job.heartbeat_at
+        ).update(
+            heartbeat_at=now,
+            **{field: getattr(job, field) for field in [*PROGRESS_FIELDS, *extra_fields]},
+        )
+        if not saved:
+            raise ImportReclaimed(job.pk)
+        job.heartbeat_at = now
+
+
+def run_import(job_id, stale_before=None):
+    """Run a pending (or stale running) import in the current thread"""
+    job = LeadImportJob.objects.get(pk=job_id)
+    return LeadImporter(job).run(stale_before=stale_before)
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_import(job_id)
+    except Exception:
+        logger.exception("Lead import %s could not be started", job_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_import(job):
+    """Start the import once the job row is committed, unless a worker picks it up"""
+    if not getattr(settings, 'LEAD_IMPORT_IN_BACKGROUND', True):
+        return
+    transaction.on_commit(lambda: threading.Thread(
+        target=_run_in_thread, args=(job.pk,), name=f'lead-import-{job.pk}', daemon=True
+    ).start())
@@ -0,0 +1,65 @@
+"""
+Normalized blocking keys for lead deduplication.
+
+Each key maps the many ways people type the same email, phone number or
+company onto one value, so likely duplicates share an indexed column and can
+be found with equality lookups instead of pairwise comparison.
+"""
+import re
+
+from django.conf import settings
+
+COMPANY_SUFFIXES = {
+    'inc', 'incorporated', 'llc', 'llp', 'ltd', 'limited', 'corp', 'corporation',
+    'co', 'company', 'gmbh', 'plc', 'pvt', 'private', 'sa', 'ag', 'bv', 'pty', 'srl',
+}
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+_NON_DIGIT = re.compile(r'\D')
+
+
+def normalize_email(value):
+    """' John.Doe@Example.COM ' -> 'john.doe@example.com'"""
+    return (value or '').strip().lower()
+
+
+def normalize_phone(value):
+    """
+    Best-effort E.164: '+44 (0)20 7946 0958' -> '+442079460958'.
+    Numbers without an international prefix get LEAD_DEFAULT_PHONE_COUNTRY_CODE.
+    Returns '' when the result cannot be a valid E.164 number.
+    """
+    raw = (value or '').strip()
+    digits = _NON_DIGIT.sub('', raw)
+    if not digits:
+        return ''
+
+    country_code = getattr(settings, 'LEAD_DEFAULT_PHONE_COUNTRY_CODE', '1')
+    if raw.startswith('+'):
+        # '+44 (0)20 ...': the bracketed trunk zero is not dialled internationally
+        digits = _NON_DIGIT.sub('', raw.replace('(0)', ''))
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif len(digits) > 10 and digits.startswith(country_code):
+        pass
+    else:
+        digits = country_code + digits.lstrip('0')
+
+    if not 8 <= len(digits) <= 15:
+        return ''
+    return '+' + digits
+
+
+def normalize_company(value):
+    """'The ACME Corp., Inc.' -> 'acme'"""
+    words = _NON_ALNUM.sub(' ', (value or '').lower()).split()
+    if words and words[0] == 'the':
+        words = words[1:]
+    while words and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+
+def normalize_name(value):
+    """'  Jane   DOE ' -> 'jane doe'"""
+    return ' '.join(_NON_ALNUM.sub(' ', (value or '').lower()).split())
@@ -0,0 +1,98 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from leads.models import Lead
+from leads.scoring import build_features, compute_scores, lead_arrays
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the scoring pipeline on synthetic leads without touching the database: "
+        "conversion of rows to arrays (lead_arrays), feature building and scoring."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=1000000,
+            help="Synthetic leads to score",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help="Leads per chunk, as in score_leads",
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+        )
+
+    def handle(self, *args, **options):
+        rows, chunk_size = options['rows'], options['chunk_size']
+        if rows < 1 or chunk_size < 1:
+            raise CommandError("--rows and --chunk-size must be at least 1.")
+
+        rng = np.random.default_rng(options['seed'])
+        now = timezone.now()
+        stages = [choice for choice, _ in Lead.STAGE_CHOICES]
+        sources = [choice for choice, _ in Lead.SOURCE_CHOICES]
+        statuses = [choice for choice, _ in Lead.STATUS_CHOICES]
+
+        started = time.monotonic()
+        # Shaped like what score_chunk reads: LEAD_COLUMNS rows, activity stats and note counts
+        created = [now - timedelta(days=float(days)) for days in rng.uniform(0, 730, rows)]
+        lead_rows = list(zip(
+            range(1, rows + 1),
+            rng.integers(1, 50, rows).tolist(),
+            [stages[i] for i in rng.integers(0, len(stages), rows)],
+            [sources[i] for i in rng.integers(0, len(sources), rows)],
+            [statuses[i] for i in rng.integers(0, len(statuses), rows)],
+            rng.lognormal(8, 1.5, rows).round(2).tolist(),
+            ['lead@example.com' if flag else None for flag in rng.random(rows) < 0.8],
+            ['+15550100' if flag else None for flag in rng.random(rows) < 0.6],
+            ['Acme' if flag else None for flag in rng.random(rows) < 0.7],
+            created,
+        ))
+        activity = {
+            lead_id: {'total': total, 'recent': min(recent, total), 'last': now - timedelta(days=float(days))}
+            for lead_id, total, recent, days in zip(
+                range(1, rows + 1), rng.poisson(3, rows).tolist(),
+                rng.poisson(1, rows).tolist(), rng.exponential(30, rows),
+            )
+            if total
+        }
+        notes = {
+            lead_id: count
+            for lead_id, count in zip(range(1, rows + 1), rng.poisson(2, rows).tolist()) if count
+        }
+        self.stdout.write(f"Generated {rows} synthetic leads in {time.monotonic() - started:.1f}s.")
+
+        convert = features = scoring = 0.0
+        scores = []
+        for start in range(0, rows, chunk_size):
+            tick = time.perf_counter()
+            categories, arrays = lead_arrays(lead_rows[start:start + chunk_size], activity, notes, now)
+            convert += time.perf_counter() - tick
+
+            tick = time.perf_counter()
+            matrix = build_features(*categories, **arrays)
+            features += time.perf_counter() - tick
+
+            tick = time.perf_counter()
+            scores.append(compute_scores(matrix))
+            scoring += time.perf_counter() - tick
+
+        scores = np.concatenate(scores)
+        total = convert + features + scoring
+        for label, seconds in (
+            ('rows -> arrays', convert), ('feature matrix', features), ('scoring', scoring), ('total', total),
+        ):
+            self.stdout.write(f"  {label:<15} {seconds:8.3f}s  {rows / seconds:>12,.0f} leads/s")
+        self.stdout.write(
+            f"Score distribution: p10 {np.percentile(scores, 10):.1f}, median {np.median(scores):.1f}, "
+            f"p90 {np.percentile(scores, 90):.1f}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Benchmark finished. Database time (reads per chunk and bulk_update) is not included."
+        ))
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from leads.imports import STALE_IMPORT_AFTER, run_import, stale_imports
+from leads.models import LeadImportJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Run pending lead imports (the worker for LEAD_IMPORT_IN_BACKGROUND=False) and resume "
+        "running imports whose process died. Schedule it periodically in every deployment."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--job', type=int, action='append', dest='job_ids',
+            help="Only run the given job id (may be repeated)",
+        )
+        parser.add_argument(
+            '--stale-minutes', type=float, default=STALE_IMPORT_AFTER.total_seconds() / 60,
+            help="Reclaim running imports whose last heartbeat is older than this",
+        )
+
+    def handle(self, *args, **options):
+        if options['stale_minutes'] <= 0:
+            raise CommandError("--stale-minutes must be positive.")
+        stale_before = timezone.now() - timedelta(minutes=options['stale_minutes'])
+
+        jobs = LeadImportJob.objects.filter(
+            Q(status='pending') | stale_imports(stale_before)
+        ).order_by('created_at')
+        if options['job_ids']:
+            jobs = jobs.filter(id__in=options['job_ids'])
+
+        for job_id in jobs.values_list('id', flat=True):
+            job = run_import(job_id, stale_before=stale_before)
+            self.stdout.write(f"Import {job.pk} ({job.original_name}): {job.status}. {job.message}")
+
+        self.stdout.write(self.style.SUCCESS("Pending and stale lead imports processed."))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from leads.scoring import score_leads
+
+
+class Command(BaseCommand):
+    help = (
+        "Score leads touched since their last score. Schedule frequently, plus a "
+        "periodic --full run so activity recency keeps decaying for idle leads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Rescore every lead, not only the stale ones",
+        )
+        parser.add_argument(
+            '--owner', type=int, action='append', dest='owner_ids',
+            help="Only score leads of the given owner id (may be repeated)",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help="Leads loaded and scored per batch",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        scored = score_leads(
+            full=options['full'],
+            owner_ids=options['owner_ids'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {scored} lead{'s' if scored != 1 else ''} in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:41
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+from crmbackend.operations import AddIndexConcurrently
+
+# Copies of the leads.keys normalizers as of this migration, so later edits to
+# that module cannot change what the backfill writes
+COMPANY_SUFFIXES = {
+    'inc', 'incorporated', 'llc', 'llp', 'ltd', 'limited', 'corp', 'corporation',
+    'co', 'company', 'gmbh', 'plc', 'pvt', 'private', 'sa', 'ag', 'bv', 'pty', 'srl',
+}
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+_NON_DIGIT = re.compile(r'\D')
+
+
+def normalize_email(value):
+    return (value or '').strip().lower()
+
+
+def normalize_phone(value):
+    raw = (value or '').strip()
+    digits = _NON_DIGIT.sub('', raw)
+    if not digits:
+        return ''
+
+    country_code = getattr(settings, 'LEAD_DEFAULT_PHONE_COUNTRY_CODE', '1')
+    if raw.startswith('+'):
+        digits = _NON_DIGIT.sub('', raw.replace('(0)', ''))
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif len(digits) > 10 and digits.startswith(country_code):
+        pass
+    else:
+        digits = country_code + digits.lstrip('0')
+
+    if not 8 <= len(digits) <= 15:
+        return ''
+    return '+' + digits
+
+
+def normalize_company(value):
+    words = _NON_ALNUM.sub(' ', (value or '').lower()).split()
+    if words and words[0] == 'the':
+        words = words[1:]
+    while words and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+
+def backfill_dedup_keys(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    batch = []
+    for lead in Lead.objects.only('id', 'email', 'phone', 'company').iterator(chunk_size=2000):
+        lead.email_key = normalize_email(lead.email)
+        lead.phone_key = normalize_phone(lead.phone)
+        lead.company_key = normalize_company(lead.company)
+        batch.append(lead)
+        if len(batch) >= 2000:
+            Lead.objects.bulk_update(batch, ['email_key', 'phone_key', 'company_key'])
+            batch = []
+    if batch:
+        Lead.objects.bulk_update(batch, ['email_key', 'phone_key', 'company_key'])
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('leads', '0005_leadimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='company_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='email_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='phone_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_dedup_keys, migrations.RunPython.noop, atomic=True),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['owner', 'email_key'], name='lead_owner_email_key_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['owner', 'phone_key'], name='lead_owner_phone_key_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['owner', 'company_key'], name='lead_owner_company_key_idx'),
+        ),
+    ]
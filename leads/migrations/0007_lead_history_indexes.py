@@ -0,0 +1,25 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:43
+
+from django.db import migrations, models
+
+from crmbackend.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('leads', '0006_lead_dedup_keys'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='leadactivity',
+            index=models.Index(fields=['lead', '-activity_date', '-id'], name='leadactivity_lead_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='leadnote',
+            index=models.Index(fields=['lead', '-created_at', '-id'], name='leadnote_lead_created_idx'),
+        ),
+    ]
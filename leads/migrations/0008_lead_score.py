@@ -0,0 +1,31 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:45
+
+from django.db import migrations, models
+
+from crmbackend.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('leads', '0007_lead_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='scored_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['owner', '-score', '-id'], name='lead_owner_score_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def log_current_stages(apps, schema_editor):
+    """Seed the log with each existing lead's current stage as of its creation"""
+    Lead = apps.get_model('leads', 'Lead')
+    LeadStageTransition = apps.get_model('leads', 'LeadStageTransition')
+    rows = Lead.objects.order_by().values_list('id', 'owner_id', 'source', 'stage', 'created_at')
+    LeadStageTransition.objects.bulk_create(
+        (
+            LeadStageTransition(
+                lead_id=lead_id, owner_id=owner_id, source=source,
+                to_stage=stage, transitioned_at=created_at,
+            )
+            for lead_id, owner_id, source, stage, created_at in rows.iterator(chunk_size=2000)
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('leads', '0008_lead_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadStageTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('Direct', 'Direct'), ('Linkedin', 'Linkedin'), ('Twitter', 'Twitter'), ('Facebook', 'Facebook'), ('Website', 'Website'), ('Referral', 'Referral'), ('Other', 'Other')], max_length=20)),
+                ('from_stage', models.CharField(blank=True, choices=[('New', 'New'), ('Opened', 'Opened'), ('Interested', 'Interested'), ('Rejected', 'Rejected'), ('Closed', 'Closed')], default='', max_length=20)),
+                ('to_stage', models.CharField(choices=[('New', 'New'), ('Opened', 'Opened'), ('Interested', 'Interested'), ('Rejected', 'Rejected'), ('Closed', 'Closed')], max_length=20)),
+                ('transitioned_at', models.DateTimeField()),
+                ('seconds_in_previous_stage', models.FloatField(blank=True, null=True)),
+                ('lead', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stage_transitions', to='leads.lead')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-transitioned_at'],
+                'indexes': [models.Index(fields=['lead', 'transitioned_at', 'id'], name='leadtransition_lead_idx'), models.Index(fields=['owner', 'transitioned_at'], name='leadtransition_owner_idx')],
+            },
+        ),
+        migrations.RunPython(log_current_stages, migrations.RunPython.noop),
+    ]
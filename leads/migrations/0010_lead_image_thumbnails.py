@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-17 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0009_lead_stage_transitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='image_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
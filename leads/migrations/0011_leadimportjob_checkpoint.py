@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-17 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0010_lead_image_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leadimportjob',
+            name='checkpoint',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='leadimportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Last progress write of the running importer; stale means it died', null=True),
+        ),
+    ]
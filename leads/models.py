@@ -1,8 +1,19 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from crmbackend.thumbnails import prepare_thumbnails, schedule_thumbnails
+
+from .keys import normalize_company, normalize_email, normalize_phone
+
 User = get_user_model()
 
+# Source field -> normalized blocking key used for duplicate detection
+DEDUP_KEY_SOURCES = {
+    'email_key': ('email', normalize_email),
+    'phone_key': ('phone', normalize_phone),
+    'company_key': ('company', normalize_company),
+}
+
 class Lead(models.Model):
     STAGE_CHOICES = [
         ('New', 'New'),
@@ -44,6 +55,7 @@ class Lead(models.Model):
     value = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     notes = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='leads/', blank=True, null=True)
+    image_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     
     # Ownership & Timestamps
     owner = models.ForeignKey(
@@ -57,11 +69,47 @@ class Lead(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Deduplication blocking keys, kept in sync with email/phone/company on save
+    email_key = models.CharField(max_length=254, blank=True, default='', editable=False)
+    phone_key = models.CharField(max_length=20, blank=True, default='', editable=False)
+    company_key = models.CharField(max_length=255, blank=True, default='', editable=False)
+    
+    # Written by the batch scorer (leads.scoring); scored_at is null until first scored
+    score = models.FloatField(default=0, editable=False)
+    scored_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
     class Meta:
         ordering = ['-created_at']
+        # Match the list filters (owner, then stage or status) and the keyset ordering
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='lead_owner_created_idx'),
+            models.Index(fields=['owner', 'stage', '-created_at', '-id'], name='lead_owner_stage_created_idx'),
+            models.Index(fields=['owner', 'status', '-created_at', '-id'], name='lead_owner_status_created_idx'),
+            models.Index(fields=['owner', 'email_key'], name='lead_owner_email_key_idx'),
+            models.Index(fields=['owner', 'phone_key'], name='lead_owner_phone_key_idx'),
+            models.Index(fields=['owner', 'company_key'], name='lead_owner_company_key_idx'),
+            models.Index(fields=['owner', '-score', '-id'], name='lead_owner_score_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.company or 'No Company'}"
+    
+    def set_dedup_keys(self):
+        """Recompute the blocking keys; call before bulk_create/bulk_update"""
+        for key, (source, normalize) in DEDUP_KEY_SOURCES.items():
+            setattr(self, key, normalize(getattr(self, source)))
+    
+    def save(self, *args, **kwargs):
+        self.set_dedup_keys()
+        image_uploaded = prepare_thumbnails(self, kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            sources = {source for source, _ in DEDUP_KEY_SOURCES.values()}
+            if sources.intersection(update_fields):
+                kwargs['update_fields'] = set(update_fields) | set(DEDUP_KEY_SOURCES)
+        super().save(*args, **kwargs)
+        if image_uploaded:
+            schedule_thumbnails(self)
 
 
 class LeadNote(models.Model):
@@ -72,6 +120,9 @@ class LeadNote(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['lead', '-created_at', '-id'], name='leadnote_lead_created_idx'),
+        ]
     
     def __str__(self):
         return f"Note for {self.lead.name}"
@@ -96,6 +147,82 @@ class LeadActivity(models.Model):
     class Meta:
         ordering = ['-activity_date']
         verbose_name_plural = 'Lead activities'
+        indexes = [
+            models.Index(fields=['lead', '-activity_date', '-id'], name='leadactivity_lead_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.activity_type} - {self.lead.name}"
+
+
+class LeadStageTransition(models.Model):
+    """One stage change of a lead; from_stage is blank for the stage a lead was created in"""
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name='stage_transitions')
+    # Owner and source at the time of the change, so history keeps its attribution
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    source = models.CharField(max_length=20, choices=Lead.SOURCE_CHOICES)
+    from_stage = models.CharField(max_length=20, choices=Lead.STAGE_CHOICES, blank=True, default='')
+    to_stage = models.CharField(max_length=20, choices=Lead.STAGE_CHOICES)
+    transitioned_at = models.DateTimeField()
+    seconds_in_previous_stage = models.FloatField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-transitioned_at']
+        indexes = [
+            models.Index(fields=['lead', 'transitioned_at', 'id'], name='leadtransition_lead_idx'),
+            models.Index(fields=['owner', 'transitioned_at'], name='leadtransition_owner_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.lead_id}: {self.from_stage or '-'} -> {self.to_stage}"
+
+
+class LeadImportJob(models.Model):
+    """A spreadsheet of leads imported in the background"""
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lead_imports')
+    file = models.FileField(upload_to='lead_imports/')
+    original_name = models.CharField(max_length=255)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Progress
+    total_rows = models.IntegerField(default=0, help_text="Data rows in the file, excluding the header")
+    processed_rows = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="Per-row validation errors (capped)")
+    message = models.TextField(blank=True, default='')
+    # Counters as of the last committed chunk, so a reclaimed job resumes exactly
+    checkpoint = models.JSONField(default=dict, blank=True, editable=False)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text="Last progress write of the running importer; stale means it died",
+    )
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.activity_type} - {self.lead.name}"
\ No newline at end of file
+        return f"Import {self.original_name} ({self.status})"
+    
+    @property
+    def progress(self):
+        if not self.total_rows:
+            return 100.0 if self.status == 'completed' else 0.0
+        return round(min(self.processed_rows / self.total_rows, 1) * 100, 1)
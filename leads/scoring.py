@@ -0,0 +1,167 @@
+"""
+Batch lead scoring.
+
+Builds a feature matrix per chunk of leads from Lead fields plus grouped
+LeadActivity and LeadNote aggregates, scores it with a fixed logistic model in
+NumPy and writes Lead.score (0-100) and Lead.scored_at back with bulk_update.
+Incremental runs only rescore leads edited, noted or logged since their last
+score; a periodic full run keeps the recency features current.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Count, Exists, F, Max, OuterRef, Q
+from django.utils import timezone
+
+from dashboard.cache import invalidate_dashboard_cache
+from .models import Lead, LeadActivity, LeadNote
+
+STAGE_WEIGHTS = {'New': 0.0, 'Opened': 0.4, 'Interested': 1.2, 'Rejected': -2.5, 'Closed': -1.0}
+SOURCE_WEIGHTS = {'Referral': 0.8, 'Website': 0.5, 'Linkedin': 0.3, 'Direct': 0.2}
+STATUS_WEIGHTS = {'Active': 0.0, 'Inactive': -1.5, 'Converted': 2.0}
+
+# Column order of the feature matrix and the logistic weight of each column
+FEATURES = [
+    'stage', 'source', 'status',
+    'value', 'activity_count', 'recent_activity_count',
+    'activity_recency', 'note_count', 'completeness', 'freshness',
+]
+WEIGHTS = np.array([1.0, 1.0, 1.0, 1.0, 0.6, 0.8, 1.0, 0.4, 0.8, 0.5])
+BIAS = -3.5
+
+RECENT_ACTIVITY_DAYS = 30
+ACTIVITY_HALF_LIFE_DAYS = 14
+FRESHNESS_HALF_LIFE_DAYS = 90
+VALUE_SCALE = np.log1p(100000)
+SECONDS_PER_DAY = 86400.0
+
+# Lead columns read per chunk, in the order lead_arrays unpacks them
+LEAD_COLUMNS = ['id', 'owner_id', 'stage', 'source', 'status', 'value', 'email', 'phone', 'company', 'created_at']
+NO_ACTIVITY = {'total': 0, 'recent': 0, 'last': None}
+
+
+def category_weights(values, weights):
+    """Map an array of category labels to their weights (0 for unknown labels)"""
+    return np.fromiter((weights.get(value, 0.0) for value in values), dtype=float, count=len(values))
+
+
+def decay(days, half_life):
+    """exp-style decay to 0.5 at half_life days; NaN (never) decays to 0"""
+    return np.nan_to_num(np.power(0.5, days / half_life), nan=0.0)
+
+
+def build_features(stages, sources, statuses, values, has_email, has_phone, has_company,
+                   age_days, activity_counts, recent_activity_counts, days_since_activity, note_counts):
+    """Stack per-lead columns into the (n, len(FEATURES)) feature matrix"""
+    return np.column_stack([
+        category_weights(stages, STAGE_WEIGHTS),
+        category_weights(sources, SOURCE_WEIGHTS),
+        category_weights(statuses, STATUS_WEIGHTS),
+        np.clip(np.log1p(np.maximum(values, 0)) / VALUE_SCALE, 0, 1.5),
+        np.log1p(activity_counts),
+        np.log1p(recent_activity_counts),
+        decay(days_since_activity, ACTIVITY_HALF_LIFE_DAYS),
+        np.log1p(note_counts),
+        (has_email.astype(float) + has_phone + has_company) / 3,
+        decay(age_days, FRESHNESS_HALF_LIFE_DAYS),
+    ])
+
+
+def lead_arrays(rows, activity, notes, now):
+    """
+    Convert LEAD_COLUMNS rows, per-lead activity stats ({lead_id: {'total',
+    'recent', 'last'}}) and note counts ({lead_id: count}) into the
+    (stages, sources, statuses) columns and keyword arrays of build_features.
+    """
+    ids, _, stages, sources, statuses, values, emails, phones, companies, created = zip(*rows)
+    now = now.timestamp()
+    stats = [activity.get(lead_id, NO_ACTIVITY) for lead_id in ids]
+    return (stages, sources, statuses), dict(
+        values=np.array(values, dtype=float),
+        has_email=np.array([bool(value) for value in emails]),
+        has_phone=np.array([bool(value) for value in phones]),
+        has_company=np.array([bool(value) for value in companies]),
+        age_days=(now - np.array([value.timestamp() for value in created])) / SECONDS_PER_DAY,
+        activity_counts=np.array([row['total'] for row in stats], dtype=float),
+        recent_activity_counts=np.array([row['recent'] for row in stats], dtype=float),
+        days_since_activity=np.array([
+            (now - row['last'].timestamp()) / SECONDS_PER_DAY if row['last'] else np.nan
+            for row in stats
+        ]),
+        note_counts=np.array([notes.get(lead_id, 0) for lead_id in ids], dtype=float),
+    )
+
+
+def compute_scores(features):
+    """Logistic score in [0, 100] for each row of the feature matrix"""
+    logits = features @ WEIGHTS + BIAS
+    return np.round(100 / (1 + np.exp(-logits)), 2)
+
+
+def stale_leads(queryset):
+    """Leads never scored, or edited, noted or logged since their last score"""
+    noted = LeadNote.objects.filter(lead=OuterRef('pk'), created_at__gt=OuterRef('scored_at'))
+    logged = LeadActivity.objects.filter(lead=OuterRef('pk'), created_at__gt=OuterRef('scored_at'))
+    return queryset.filter(
+        Q(scored_at__isnull=True) | Q(updated_at__gt=F('scored_at')) | Exists(noted) | Exists(logged)
+    )
+
+
+class LeadScorer:
+    """Score leads chunk by chunk"""
+
+    def __init__(self, now=None, chunk_size=5000):
+        self.now = now or timezone.now()
+        self.chunk_size = chunk_size
+
+    def run(self, queryset):
+        """Score every lead in queryset; returns the number scored"""
+        lead_ids = list(queryset.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(lead_ids), self.chunk_size):
+            self.score_chunk(lead_ids[start:start + self.chunk_size])
+        return len(lead_ids)
+
+    def score_chunk(self, lead_ids):
+        rows = list(Lead.objects.filter(id__in=lead_ids).order_by().values_list(*LEAD_COLUMNS))
+        if not rows:
+            return
+        ids = [row[0] for row in rows]
+
+        recent_since = self.now - timedelta(days=RECENT_ACTIVITY_DAYS)
+        activity = {
+            row['lead_id']: row
+            for row in LeadActivity.objects.filter(lead_id__in=ids).order_by().values('lead_id').annotate(
+                total=Count('id'),
+                recent=Count('id', filter=Q(activity_date__gte=recent_since)),
+                last=Max('activity_date'),
+            )
+        }
+        notes = dict(
+            LeadNote.objects.filter(lead_id__in=ids).order_by()
+            .values('lead_id').annotate(total=Count('id')).values_list('lead_id', 'total')
+        )
+
+        categories, arrays = lead_arrays(rows, activity, notes, self.now)
+        features = build_features(*categories, **arrays)
+        scores = compute_scores(features)
+
+        Lead.objects.bulk_update(
+            [
+                Lead(id=lead_id, score=score, scored_at=self.now)
+                for lead_id, score in zip(ids, scores.tolist())
+            ],
+            ['score', 'scored_at'],
+            batch_size=1000,
+        )
+        # bulk_update sends no signals; cached ?min_score= facets must not outlive it
+        invalidate_dashboard_cache(*{row[1] for row in rows})
+
+
+def score_leads(full=False, owner_ids=None, chunk_size=5000):
+    """Rescore stale leads (or every lead with full=True); returns leads scored"""
+    queryset = Lead.objects.all()
+    if owner_ids:
+        queryset = queryset.filter(owner_id__in=owner_ids)
+    if not full:
+        queryset = stale_leads(queryset)
+    return LeadScorer(chunk_size=chunk_size).run(queryset)
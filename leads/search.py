@@ -0,0 +1,42 @@
+"""
+Lead search.
+
+On PostgreSQL the ?search= filter is served by pg_trgm GIN indexes on the
+upper-cased searchable columns (created in migration 0003), which match the
+UPPER(col) LIKE '%term%' that icontains emits, and results are ranked by
+trigram similarity. Other backends (SQLite in tests) fall back to the same
+icontains filters without ranking.
+"""
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.functions import Cast, Greatest
+
+SEARCH_FIELDS = ['name', 'email', 'company', 'phone']
+RANKED_FIELDS = ['name', 'email', 'company']
+
+
+def search_leads(queryset, term):
+    """Filter a Lead queryset by term, ordered by relevance where supported"""
+    term = term.strip()
+    if not term:
+        return queryset
+
+    query = Q()
+    for field in SEARCH_FIELDS:
+        query |= Q(**{f'{field}__icontains': term})
+    queryset = queryset.filter(query)
+
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset
+
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    # Greatest ignores NULL columns on PostgreSQL. similarity() returns real;
+    # widen it to double precision so the value keyset cursors carry round-trips
+    # exactly and compares equal to the column on the next page
+    return queryset.annotate(
+        search_rank=Cast(
+            Greatest(*[TrigramSimilarity(field, term) for field in RANKED_FIELDS]),
+            FloatField(),
+        )
+    ).order_by('-search_rank', '-created_at', '-id')
@@ -1,5 +1,10 @@
+from django.contrib.auth import get_user_model
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
-from .models import Lead, LeadNote, LeadActivity
+from crmbackend.serializers import ThumbnailsField
+from .models import Lead, LeadNote, LeadActivity, LeadImportJob
+
+User = get_user_model()
 
 class LeadNoteSerializer(serializers.ModelSerializer):
     author = serializers.CharField(source='created_by.email', read_only=True)
@@ -20,20 +25,53 @@ class LeadActivitySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_by_email', 'created_at']
 
 
+# Notes and activities embedded in lead detail; the full history is paginated
+# under /leads/{id}/notes/ and /leads/{id}/activities/
+NESTED_PREVIEW_LIMIT = 10
+
+
 class LeadSerializer(serializers.ModelSerializer):
-    lead_notes = LeadNoteSerializer(many=True, read_only=True)
-    activities = LeadActivitySerializer(many=True, read_only=True)
+    lead_notes = serializers.SerializerMethodField()
+    activities = serializers.SerializerMethodField()
+    lead_notes_count = serializers.SerializerMethodField()
+    activities_count = serializers.SerializerMethodField()
+    image_thumbnails = ThumbnailsField()
     owner_email = serializers.CharField(source='owner.email', read_only=True)
     
     class Meta:
         model = Lead
         fields = [
             'id', 'name', 'email', 'phone', 'company', 'position',
-            'stage', 'status', 'source', 'value', 'notes', 'image',
+            'stage', 'status', 'source', 'value', 'score', 'notes', 'image', 'image_thumbnails',
             'owner', 'owner_email', 'created_at', 'updated_at',
-            'lead_notes', 'activities'
+            'lead_notes', 'activities', 'lead_notes_count', 'activities_count'
         ]
-        read_only_fields = ['id', 'owner', 'owner_email', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'owner', 'owner_email', 'score', 'created_at', 'updated_at']
+    
+    # The recent_* and *_count attributes come from with_recent_history() in the
+    # views; fall back to queries for instances loaded without it
+    
+    @extend_schema_field(LeadNoteSerializer(many=True))
+    def get_lead_notes(self, obj):
+        notes = getattr(obj, 'recent_notes', None)
+        if notes is None:
+            notes = obj.lead_notes.select_related('created_by')[:NESTED_PREVIEW_LIMIT]
+        return LeadNoteSerializer(notes, many=True, context=self.context).data
+    
+    @extend_schema_field(LeadActivitySerializer(many=True))
+    def get_activities(self, obj):
+        activities = getattr(obj, 'recent_activities', None)
+        if activities is None:
+            activities = obj.activities.select_related('created_by')[:NESTED_PREVIEW_LIMIT]
+        return LeadActivitySerializer(activities, many=True, context=self.context).data
+    
+    def get_lead_notes_count(self, obj) -> int:
+        count = getattr(obj, 'notes_count', None)
+        return obj.lead_notes.count() if count is None else count
+    
+    def get_activities_count(self, obj) -> int:
+        count = getattr(obj, 'activities_count', None)
+        return obj.activities.count() if count is None else count
     
     def create(self, validated_data):
         # Set owner from request context
@@ -41,14 +79,147 @@ class LeadSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class LeadListSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """Limit output to the comma-separated ?fields= list from the request"""
+    fields_query_param = 'fields'
+    
+    @classmethod
+    def get_requested_fields(cls, request):
+        allowed = cls.Meta.fields
+        raw = request.query_params.get(cls.fields_query_param) if request else None
+        if not raw:
+            return list(allowed)
+        requested = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in requested if name not in allowed]
+        if unknown:
+            raise serializers.ValidationError({
+                cls.fields_query_param: f'Unknown fields: {", ".join(unknown)}.'
+            })
+        return requested
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = set(self.get_requested_fields(self.context.get('request')))
+        for name in list(self.fields):
+            if name not in requested:
+                self.fields.pop(name)
+
+
+class LeadListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Lighter serializer for list views"""
+    image_thumbnails = ThumbnailsField()
     owner_email = serializers.CharField(source='owner.email', read_only=True)
     
     class Meta:
         model = Lead
         fields = [
             'id', 'name', 'email', 'phone', 'company', 'position',
-            'stage', 'status', 'source', 'value', 'owner_email', 'created_at'
+            'stage', 'status', 'source', 'value', 'score', 'image_thumbnails', 'owner_email', 'created_at'
         ]
-        read_only_fields = ['id', 'owner_email', 'created_at']
\ No newline at end of file
+        read_only_fields = ['id', 'owner_email', 'score', 'created_at']
+
+
+class LeadImportRowSerializer(serializers.ModelSerializer):
+    """Validates one imported row with the same field rules as LeadSerializer"""
+    
+    class Meta:
+        model = Lead
+        fields = [
+            'name', 'email', 'phone', 'company', 'position',
+            'stage', 'status', 'source', 'value', 'notes'
+        ]
+
+
+class LeadImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = LeadImportJob
+        fields = [
+            'id', 'original_name', 'file_format', 'status', 'progress',
+            'total_rows', 'processed_rows', 'created_count', 'error_count',
+            'errors', 'message', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class LeadImportUploadSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    
+    def validate_file(self, value):
+        extension = value.name.rsplit('.', 1)[-1].lower() if '.' in value.name else ''
+        if extension not in dict(LeadImportJob.FORMAT_CHOICES):
+            raise serializers.ValidationError('Upload a .csv or .xlsx file.')
+        return value
+
+
+class LeadMergeSerializer(serializers.Serializer):
+    duplicate_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=50
+    )
+
+
+class LeadNoteBatchSerializer(serializers.ModelSerializer):
+    lead_id = serializers.IntegerField()
+    
+    class Meta:
+        model = LeadNote
+        fields = ['lead_id', 'text']
+
+
+class LeadActivityBatchSerializer(serializers.ModelSerializer):
+    lead_id = serializers.IntegerField()
+    
+    class Meta:
+        model = LeadActivity
+        fields = ['lead_id', 'activity_type', 'description', 'activity_date']
+
+
+class LeadConvertSerializer(serializers.Serializer):
+    lead_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=500
+    )
+
+
+class LeadBulkPatchSerializer(serializers.ModelSerializer):
+    """Fields a bulk update may set; owner reassigns the leads (staff only)"""
+    owner = serializers.PrimaryKeyRelatedField(queryset=User.objects.none())
+    
+    class Meta:
+        model = Lead
+        fields = ['stage', 'status', 'source', 'value', 'company', 'position', 'owner']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Leads never leave the requester's account unless a staff member moves them
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            self.fields['owner'].queryset = (
+                User.objects.filter(is_active=True) if user.is_staff else User.objects.filter(pk=user.pk)
+            )
+
+
+class LeadBulkSelectionSerializer(serializers.Serializer):
+    """Leads picked by id, or by the list endpoint's filter parameters"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=5000, required=False
+    )
+    filters = serializers.DictField(child=serializers.CharField(), allow_empty=False, required=False)
+    
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filters' in attrs):
+            raise serializers.ValidationError('Provide either ids or filters.')
+        return attrs
+
+
+class LeadBulkUpdateSerializer(LeadBulkSelectionSerializer):
+    patch = serializers.DictField(allow_empty=False)
+    
+    def validate_patch(self, value):
+        unknown = set(value) - set(LeadBulkPatchSerializer.Meta.fields)
+        if unknown:
+            raise serializers.ValidationError(f'Fields cannot be bulk updated: {", ".join(sorted(unknown))}.')
+        serializer = LeadBulkPatchSerializer(data=value, partial=True, context=self.context)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
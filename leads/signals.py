@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.dispatch import Signal
+
+# Sent with sender=Lead and owner_ids after bulk writes that bypass the per-row
+# save/delete signals (imports, conversions, batch updates and deletes)
+leads_bulk_changed = Signal()
+
+_per_lead_receivers_suspended = ContextVar('per_lead_receivers_suspended', default=False)
+
+
+@contextmanager
+def suspend_per_lead_receivers():
+    """
+    Let ORM deletes/saves of many leads skip receivers that do per-row work
+    (see dashboard.signals); send leads_bulk_changed once afterwards instead.
+    """
+    token = _per_lead_receivers_suspended.set(True)
+    try:
+        yield
+    finally:
+        _per_lead_receivers_suspended.reset(token)
+
+
+def per_lead_receivers_suspended():
+    return _per_lead_receivers_suspended.get()
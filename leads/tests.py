@@ -1,3 +1,659 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from crmbackend.thumbnails import generate_thumbnails, thumbnail_names
+from dashboard.models import DashboardMetric
+from deals.models import Deal
+
+from .dedup import find_duplicate_groups, merge_leads
+from .imports import ImportReclaimed, LeadImporter
+from .keys import normalize_company, normalize_email, normalize_phone
+from .models import Lead, LeadActivity, LeadImportJob, LeadNote
+from .scoring import LEAD_COLUMNS, lead_arrays, score_leads
+from .search import search_leads
+
+
+@skipUnless(connection.vendor == 'sqlite', "Asserts on SQLite query plans")
+class LeadListIndexTests(TestCase):
+
+    def test_owner_list_uses_composite_index(self):
+        plan = Lead.objects.filter(owner_id=1).order_by('-created_at', '-id').explain()
+        self.assertIn('lead_owner_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_stage_and_status_filters_use_composite_indexes(self):
+        for field, value in [('stage', 'New'), ('status', 'Active')]:
+            with self.subTest(field=field):
+                plan = Lead.objects.filter(owner_id=1, **{field: value}).order_by('-created_at', '-id').explain()
+                self.assertIn(f'lead_owner_{field}_created_idx', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+
+class LeadAPITestCase(TestCase):
+
+    def setUp(self):
+        # Cached facet payloads are keyed by user id, which the test database reuses
+        cache.clear()
+        self.alice = User.objects.create_user('alice', 'alice@example.com')
+        self.bob = User.objects.create_user('bob', 'bob@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+
+class LeadKeysetPaginationTests(LeadAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        Lead.objects.bulk_create([
+            Lead(owner=self.alice, name=f'Lead {i % 4}', value=i % 3, stage=Lead.STAGE_CHOICES[i % 5][0])
+            for i in range(23)
+        ])
+        Lead.objects.create(owner=self.bob, name='Not mine')
+        # Ties on every ordering key, so pages must break them on id
+        now = timezone.now()
+        for i, lead in enumerate(Lead.objects.filter(owner=self.alice).order_by('id')):
+            Lead.objects.filter(pk=lead.pk).update(created_at=now - timedelta(minutes=i // 5), score=(i % 4) / 3)
+
+    def walk(self, ordering):
+        url = f'/api/leads/?ordering={ordering}&page_size=4'
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(lead['id'] for lead in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pages_cover_every_lead_once_in_order(self):
+        for ordering in ['-created_at', 'name', '-value', 'stage', '-score', 'score']:
+            expected = list(
+                Lead.objects.filter(owner=self.alice)
+                .order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+                .values_list('id', flat=True)
+            )
+            with self.subTest(ordering=ordering):
+                self.assertEqual(self.walk(ordering), expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/leads/?cursor=bm90LWpzb24')
+        self.assertEqual(response.status_code, 404)
+
+
+class LeadSearchTests(LeadAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ann = Lead.objects.create(
+            owner=self.alice, name='Ann Archer', email='ann@acme.example', phone='+1 555 0100',
+        )
+        self.ben = Lead.objects.create(owner=self.alice, name='Ben Baker', company='Acme Corp')
+        Lead.objects.create(owner=self.alice, name='Cat Cole', email='cat@other.example')
+        Lead.objects.create(owner=self.bob, name='Acme of Bob', company='Acme')
+
+    def search(self, term):
+        response = self.client.get('/api/leads/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return {lead['id'] for lead in response.data['results']}
+
+    def test_matches_substrings_of_every_field_case_insensitively(self):
+        self.assertEqual(self.search('ACME'), {self.ann.id, self.ben.id})
+        self.assertEqual(self.search('archer'), {self.ann.id})
+        self.assertEqual(self.search('555 01'), {self.ann.id})
+        self.assertEqual(self.search('nobody'), set())
+
+    def test_blank_term_does_not_filter(self):
+        self.assertEqual(search_leads(Lead.objects.all(), '   ').count(), 4)
+
+    @skipUnless(connection.vendor == 'postgresql', "Trigram ranking needs pg_trgm")
+    def test_results_are_ranked_by_similarity(self):
+        ids = [lead.id for lead in search_leads(Lead.objects.filter(owner=self.alice), 'Ben Baker')]
+        self.assertEqual(ids[0], self.ben.id)
+
+
+@override_settings(DASHBOARD_CACHE_ENABLED=True)
+class LeadFacetTests(LeadAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        rows = [
+            ('New', 'Direct'), ('New', 'Direct'), ('New', 'Referral'),
+            ('Opened', 'Direct'), ('Closed', 'Website'),
+        ]
+        Lead.objects.bulk_create([
+            Lead(owner=self.alice, name=f'Lead {i}', stage=stage, source=source)
+            for i, (stage, source) in enumerate(rows)
+        ])
+        Lead.objects.create(owner=self.bob, name='Not mine', stage='New', source='Direct')
+
+    def test_counts_without_selection(self):
+        data = self.client.get('/api/leads/facets/').data
+        self.assertEqual(data['total'], 5)
+        self.assertEqual(data['facets']['stage'], {
+            'New': 3, 'Opened': 1, 'Interested': 0, 'Rejected': 0, 'Closed': 1,
+        })
+        self.assertEqual(data['facets']['source']['Direct'], 3)
+        self.assertEqual(data['facets']['status'], {'Active': 5, 'Inactive': 0, 'Converted': 0})
+
+    def test_selection_ignores_its_own_field(self):
+        data = self.client.get('/api/leads/facets/?stage=New&source=Direct').data
+        self.assertEqual(data['total'], 2)
+        # Stage counts honour the source selection only, and source counts the stage one
+        self.assertEqual(data['facets']['stage']['New'], 2)
+        self.assertEqual(data['facets']['stage']['Opened'], 1)
+        self.assertEqual(data['facets']['source']['Direct'], 2)
+        self.assertEqual(data['facets']['source']['Referral'], 1)
+        self.assertEqual(data['facets']['source']['Website'], 0)
+
+    def test_search_narrows_counts(self):
+        data = self.client.get('/api/leads/facets/?search=Lead 4').data
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['facets']['stage']['Closed'], 1)
+
+    def test_scoring_run_invalidates_min_score_counts(self):
+        self.assertEqual(self.client.get('/api/leads/facets/?min_score=1').data['total'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            score_leads(full=True)
+        scored = Lead.objects.filter(owner=self.alice, score__gte=1).count()
+        self.assertGreater(scored, 0)
+        self.assertEqual(self.client.get('/api/leads/facets/?min_score=1').data['total'], scored)
+
+
+class LeadBulkEndpointTests(LeadAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mine = [Lead.objects.create(owner=self.alice, name=f'Lead {i}') for i in range(3)]
+        self.theirs = Lead.objects.create(owner=self.bob, name='Not mine')
+
+    def post(self, path, data):
+        return self.client.post(f'/api/leads/{path}/', data, format='json')
+
+    def test_update_skips_other_owners_leads(self):
+        ids = [lead.id for lead in self.mine] + [self.theirs.id]
+        response = self.post('bulk_update', {'ids': ids, 'patch': {'stage': 'Closed'}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'updated': 3})
+        self.theirs.refresh_from_db()
+        self.assertEqual(self.theirs.stage, 'New')
+
+    def test_non_staff_cannot_reassign(self):
+        response = self.post('bulk_update', {
+            'ids': [self.mine[0].id], 'patch': {'owner': self.bob.id},
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Lead.objects.filter(owner=self.bob, pk=self.mine[0].id).exists())
+
+    def test_staff_can_reassign_own_leads(self):
+        self.alice.is_staff = True
+        self.alice.save()
+        response = self.post('bulk_update', {
+            'filters': {'stage': 'New'}, 'patch': {'owner': self.bob.id},
+        })
+        self.assertEqual(response.data, {'updated': 3})
+        self.assertEqual(Lead.objects.filter(owner=self.bob).count(), 4)
+
+    def test_delete_skips_other_owners_leads(self):
+        response = self.post('bulk_delete', {'ids': [self.mine[0].id, self.theirs.id]})
+        self.assertEqual(response.data, {'deleted': 1})
+        self.assertTrue(Lead.objects.filter(pk=self.theirs.pk).exists())
+        self.assertEqual(Lead.objects.filter(owner=self.alice).count(), 2)
+
+
+
+class LeadExportTests(LeadAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.lead = Lead.objects.create(
+            owner=self.alice, name='=HYPERLINK("http://evil.example","x")', phone='+1 555 0100',
+            company='@SUM(A1)', notes='-2+3', email='ann@example.com',
+        )
+        Lead.objects.create(owner=self.bob, name='Not mine')
+
+    def export(self, query):
+        response = self.client.get(f'/api/leads/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_neutralises_formula_cells(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('fields=id,name,phone,company,notes,email'))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], str(self.lead.id))
+        self.assertEqual(rows[0]['name'], '\'=HYPERLINK("http://evil.example","x")')
+        self.assertEqual(rows[0]['phone'], "'+1 555 0100")
+        self.assertEqual(rows[0]['company'], "'@SUM(A1)")
+        self.assertEqual(rows[0]['notes'], "'-2+3")
+        self.assertEqual(rows[0]['email'], 'ann@example.com')
+
+    def test_ndjson_keeps_values_as_stored(self):
+        rows = [json.loads(line) for line in self.export('file_format=ndjson&fields=name,company').splitlines()]
+        self.assertEqual(rows, [{'name': self.lead.name, 'company': '@SUM(A1)'}])
+
+
+
+class LeadScoringTests(LeadAPITestCase):
+
+    def test_lead_arrays_fills_missing_stats(self):
+        now = timezone.now()
+        rows = [
+            (1, self.alice.id, 'New', 'Website', 'Active', 100, 'a@example.com', '', None, now - timedelta(days=2)),
+            (2, self.alice.id, 'Opened', 'Direct', 'Active', 0, None, '+1555', 'Acme', now),
+        ]
+        activity = {2: {'total': 3, 'recent': 1, 'last': now - timedelta(days=1)}}
+        categories, arrays = lead_arrays(rows, activity, {1: 4}, now)
+        self.assertEqual(categories, (('New', 'Opened'), ('Website', 'Direct'), ('Active', 'Active')))
+        self.assertEqual(arrays['has_email'].tolist(), [True, False])
+        self.assertEqual(arrays['has_phone'].tolist(), [False, True])
+        self.assertEqual(arrays['age_days'].tolist(), [2.0, 0.0])
+        self.assertEqual(arrays['activity_counts'].tolist(), [0.0, 3.0])
+        self.assertEqual(arrays['note_counts'].tolist(), [4.0, 0.0])
+        self.assertTrue(np.isnan(arrays['days_since_activity'][0]))
+        self.assertAlmostEqual(arrays['days_since_activity'][1], 1.0)
+        self.assertEqual(len(rows[0]), len(LEAD_COLUMNS))
+
+    def test_engaged_leads_outscore_cold_ones(self):
+        hot = Lead.objects.create(
+            owner=self.alice, name='Hot', stage='Interested', source='Referral', value=50000,
+            email='hot@example.com', phone='+1555', company='Acme',
+        )
+        cold = Lead.objects.create(owner=self.alice, name='Cold', stage='Rejected', status='Inactive')
+        for _ in range(3):
+            LeadActivity.objects.create(
+                lead=hot, activity_type='call', description='Call', created_by=self.alice, activity_date=timezone.now(),
+            )
+        self.assertEqual(score_leads(full=True), 2)
+        hot.refresh_from_db()
+        cold.refresh_from_db()
+        self.assertGreater(hot.score, 80)
+        self.assertLess(cold.score, 5)
+
+    def test_incremental_run_rescores_only_changed_leads(self):
+        lead = Lead.objects.create(owner=self.alice, name='Lead')
+        Lead.objects.create(owner=self.alice, name='Other')
+        self.assertEqual(score_leads(), 2)
+        self.assertEqual(score_leads(), 0)
+        LeadNote.objects.create(lead=lead, text='Called back', created_by=self.alice)
+        self.assertEqual(score_leads(), 1)
+
+
+class LeadDedupKeyTests(TestCase):
+
+    def test_normalizers(self):
+        self.assertEqual(normalize_email(' John.Doe@Example.COM '), 'john.doe@example.com')
+        self.assertEqual(normalize_company('The ACME Corp., Inc.'), 'acme')
+        for raw, expected in [
+            ('+44 (0)20 7946 0958', '+442079460958'),
+            ('0044 20 7946 0958', '+442079460958'),
+            ('(555) 010-0199', '+15550100199'),
+            ('1 555 010 0199', '+15550100199'),
+            ('12', ''),
+            (None, ''),
+        ]:
+            with self.subTest(raw=raw):
+                self.assertEqual(normalize_phone(raw), expected)
+
+
+class LeadDuplicateTests(LeadAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.by_email = [self.lead('Ann', email='Ann@Example.com'), self.lead('A. Smith', email=' ann@example.com')]
+        self.by_phone = [self.lead('Ben', phone='(555) 010-0199'), self.lead('Benjamin', phone='+1 555 010 0199')]
+        # Same company and name are duplicates; same company alone is not
+        self.by_company = [self.lead('Cat Cole', company='Acme Corp'), self.lead('cat  cole', company='ACME Inc.')]
+        self.lead('Dan Dale', company='Acme')
+        Lead.objects.create(owner=self.bob, name='Ann', email='ann@example.com')
+
+    def lead(self, name, **fields):
+        return Lead.objects.create(owner=self.alice, name=name, **fields)
+
+    def test_groups_by_email_phone_and_company_with_name(self):
+        groups = find_duplicate_groups(Lead.objects.filter(owner=self.alice))
+        self.assertEqual(sorted(groups), sorted([
+            (sorted(lead.id for lead in self.by_email), ['email']),
+            (sorted(lead.id for lead in self.by_phone), ['phone']),
+            (sorted(lead.id for lead in self.by_company), ['company_and_name']),
+        ]))
+
+    def test_overlapping_matches_join_one_group(self):
+        Lead.objects.filter(pk=self.by_phone[0].pk).update(email_key='ann@example.com')
+        ids, matched_on = find_duplicate_groups(Lead.objects.filter(owner=self.alice))[0]
+        self.assertEqual(ids, sorted(lead.id for lead in self.by_email + self.by_phone))
+        self.assertEqual(matched_on, ['email', 'phone'])
+
+    def test_duplicates_endpoint_lists_own_groups(self):
+        data = self.client.get('/api/leads/duplicates/').data
+        self.assertEqual(data['count'], 3)
+        listed = {lead['id'] for group in data['results'] for lead in group['leads']}
+        self.assertEqual(listed, {lead.id for lead in self.by_email + self.by_phone + self.by_company})
+
+    def test_merge_folds_duplicates_into_the_survivor(self):
+        survivor, duplicate = self.by_email
+        Lead.objects.filter(pk=duplicate.pk).update(phone='+15550100', company='Acme', value=500, notes='Met at expo')
+        LeadNote.objects.create(lead=duplicate, text='Called', created_by=self.alice)
+
+        response = self.client.post(
+            f'/api/leads/{survivor.id}/merge/', {'duplicate_ids': [duplicate.id]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['merged'], 1)
+        survivor.refresh_from_db()
+        self.assertEqual((survivor.phone, survivor.company, survivor.value), ('+15550100', 'Acme', 500))
+        self.assertEqual(survivor.notes, 'Met at expo')
+        self.assertEqual(survivor.phone_key, '+15550100')
+        self.assertEqual(LeadNote.objects.get().lead_id, survivor.id)
+        self.assertFalse(Lead.objects.filter(pk=duplicate.pk).exists())
+
+    def test_merge_rejects_other_owners_leads(self):
+        theirs = Lead.objects.get(owner=self.bob)
+        response = self.client.post(
+            f'/api/leads/{self.by_email[0].id}/merge/', {'duplicate_ids': [theirs.id]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Lead.objects.filter(pk=theirs.pk).exists())
+
+
+
+class LeadHistoryTests(LeadAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.lead = Lead.objects.create(owner=self.alice, name='Lead')
+        now = timezone.now()
+        LeadNote.objects.bulk_create([
+            LeadNote(lead=self.lead, text=f'Note {i}', created_by=self.alice) for i in range(25)
+        ])
+        LeadActivity.objects.bulk_create([
+            LeadActivity(
+                lead=self.lead, activity_type='call', description=f'Call {i}', created_by=self.alice,
+                activity_date=now - timedelta(hours=i),
+            )
+            for i in range(25)
+        ])
+
+    def detail_queries(self, lead):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/leads/{lead.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_detail_embeds_a_bounded_preview(self):
+        data, queries = self.detail_queries(self.lead)
+        self.assertEqual((len(data['lead_notes']), data['lead_notes_count']), (10, 25))
+        self.assertEqual((len(data['activities']), data['activities_count']), (10, 25))
+        self.assertEqual(data['activities'][0]['description'], 'Call 0')
+
+        quiet = Lead.objects.create(owner=self.alice, name='Quiet')
+        LeadNote.objects.create(lead=quiet, text='Only note', created_by=self.alice)
+        self.assertEqual(self.detail_queries(quiet)[1], queries)
+
+    def test_history_endpoints_page_through_everything(self):
+        for path, key in [('notes', 'text'), ('activities', 'description')]:
+            with self.subTest(path=path):
+                url, seen = f'/api/leads/{self.lead.id}/{path}/?page_size=10', []
+                while url:
+                    response = self.client.get(url)
+                    seen.extend(item[key] for item in response.data['results'])
+                    url = response.data['next']
+                self.assertEqual(len(seen), 25)
+                self.assertEqual(len(set(seen)), 25)
+
+    def test_history_of_other_owners_lead_is_hidden(self):
+        theirs = Lead.objects.create(owner=self.bob, name='Not mine')
+        self.assertEqual(self.client.get(f'/api/leads/{theirs.id}/notes/').status_code, 404)
+
+
+
+class LeadActionTests(LeadAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mine = [
+            Lead.objects.create(owner=self.alice, name=f'Lead {i}', company='Acme', value=100 * (i + 1))
+            for i in range(3)
+        ]
+        self.theirs = Lead.objects.create(owner=self.bob, name='Not mine')
+
+    def post(self, path, data):
+        return self.client.post(f'/api/leads/{path}/', data, format='json')
+
+    def test_notes_and_activities_can_be_added(self):
+        lead = self.mine[0]
+        response = self.post(f'{lead.id}/notes', {'text': 'Called'})
+        self.assertEqual(response.status_code, 201)
+        response = self.post(f'{lead.id}/activities', {
+            'activity_type': 'call', 'description': 'Call', 'activity_date': timezone.now().isoformat(),
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(LeadNote.objects.get().created_by, self.alice)
+        self.assertEqual(LeadActivity.objects.get().lead, lead)
+        self.assertEqual(self.post(f'{self.theirs.id}/notes', {'text': 'Hi'}).status_code, 404)
+
+    def test_batch_notes_and_activities(self):
+        response = self.post('batch_notes', {'notes': [{'lead_id': lead.id, 'text': 'Hi'} for lead in self.mine]})
+        self.assertEqual(response.data, {'created': 3})
+        response = self.post('batch_activities', [
+            {'lead_id': self.mine[0].id, 'activity_type': 'email', 'description': 'Sent',
+             'activity_date': timezone.now().isoformat()},
+        ])
+        self.assertEqual(response.data, {'created': 1})
+
+        # One lead of another owner rejects the whole batch
+        response = self.post('batch_notes', [
+            {'lead_id': self.mine[0].id, 'text': 'Hi'}, {'lead_id': self.theirs.id, 'text': 'Hi'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(LeadNote.objects.count(), 3)
+        self.assertEqual(self.post('batch_notes', []).status_code, 400)
+
+    def test_convert_creates_a_deal_once(self):
+        lead = self.mine[0]
+        response = self.post(f'{lead.id}/convert', {})
+        self.assertEqual(response.status_code, 201)
+        deal = Deal.objects.get(pk=response.data['deal_id'])
+        self.assertEqual((deal.owner, deal.client, deal.amount), (self.alice, 'Acme', 100))
+        lead.refresh_from_db()
+        self.assertEqual(lead.status, 'Converted')
+        self.assertEqual(self.post(f'{lead.id}/convert', {}).status_code, 400)
+
+    def test_batch_convert_reports_skipped_leads(self):
+        Lead.objects.filter(pk=self.mine[2].pk).update(status='Converted')
+        self.assertEqual(DashboardMetric.get_for_user(self.alice).active_deals, 0)
+        ids = [lead.id for lead in self.mine] + [self.theirs.id, 999999]
+        response = self.post('batch_convert', {'lead_ids': ids})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['converted'], 2)
+        self.assertEqual(response.data['skipped'], sorted([self.mine[2].id, self.theirs.id, 999999]))
+        self.assertEqual(Deal.objects.filter(owner=self.alice).count(), 2)
+        self.assertFalse(Deal.objects.filter(owner=self.bob).exists())
+        # The bulk writes still reach the owner's stored dashboard metrics
+        metric = DashboardMetric.objects.get(user=self.alice)
+        self.assertEqual((metric.active_deals, metric.total_deal_value), (2, 300))
+
+
+
+IMPORT_CSV = (
+    "Name,Email,Stage\n"
+    "Ann,ann@example.com,New\n"
+    "Ben,ben@example.com,Opened\n"
+    "Cat,not-an-email,New\n"
+    "\n"
+    "Dan,dan@example.com,Closed\n"
+    "Eve,eve@example.com,New\n"
+)
+
+
+class LeadImportTests(LeadAPITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root, LEAD_IMPORT_IN_BACKGROUND=False))
+
+    def create_job(self, **fields):
+        return LeadImportJob.objects.create(
+            owner=self.alice, file=ContentFile(IMPORT_CSV.encode(), name='leads.csv'),
+            original_name='leads.csv', file_format='csv', **fields
+        )
+
+    def test_upload_is_processed_by_the_worker_command(self):
+        upload = SimpleUploadedFile('leads.csv', IMPORT_CSV.encode(), content_type='text/csv')
+        response = self.client.post('/api/lead-imports/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+
+        call_command('process_lead_imports', stdout=io.StringIO())
+        job = self.client.get(f"/api/lead-imports/{response.data['id']}/").data
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual((job['total_rows'], job['processed_rows'], job['created_count']), (6, 5, 4))
+        self.assertEqual(job['error_count'], 1)
+        self.assertEqual(job['errors'][0]['row'], 4)
+        self.assertEqual(
+            sorted(Lead.objects.filter(owner=self.alice).values_list('name', flat=True)),
+            ['Ann', 'Ben', 'Dan', 'Eve'],
+        )
+
+    def test_stale_running_job_resumes_after_its_checkpoint(self):
+        # The dead importer committed Ann and Ben, then got as far as Cat
+        Lead.objects.bulk_create([Lead(owner=self.alice, name='Ann'), Lead(owner=self.alice, name='Ben')])
+        job = self.create_job(
+            status='running', started_at=timezone.now() - timedelta(hours=1),
+            heartbeat_at=timezone.now() - timedelta(hours=1), processed_rows=3,
+            checkpoint={'row': 3, 'processed_rows': 2, 'created_count': 2, 'error_count': 0, 'reported_errors': 0},
+        )
+        call_command('process_lead_imports', stdout=io.StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.processed_rows, job.created_count, job.error_count), (5, 4, 1))
+        self.assertEqual(Lead.objects.filter(owner=self.alice).count(), 4)
+
+    def test_live_running_job_is_left_alone(self):
+        job = self.create_job(status='running', started_at=timezone.now(), heartbeat_at=timezone.now())
+        call_command('process_lead_imports', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+        self.assertFalse(Lead.objects.exists())
+
+    def test_reclaimed_importer_stops_without_inserting(self):
+        job = self.create_job(status='running', started_at=timezone.now(), heartbeat_at=timezone.now())
+        importer = LeadImporter(job)
+        importer.pending = [Lead(owner=self.alice, name='Ann')]
+        # Another process reclaims the job and writes its own heartbeat
+        LeadImportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() + timedelta(seconds=1))
+
+        with self.assertRaises(ImportReclaimed):
+            importer._flush(row_number=2)
+        self.assertFalse(Lead.objects.exists())
+
+
+def image_file(name, color='red', image_format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 200), color).save(buffer, image_format)
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+class LeadThumbnailTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root, THUMBNAILS_IN_BACKGROUND=False))
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@example.com')
+
+    def lead_with_image(self, name, **kwargs):
+        lead = Lead.objects.create(owner=self.alice, name='Lead', image=image_file(name, **kwargs))
+        generate_thumbnails(Lead, lead.pk)
+        lead.refresh_from_db()
+        return lead
+
+    def assertFilesExist(self, names, exist=True):
+        for name in names:
+            self.assertEqual(default_storage.exists(name), exist, name)
+
+    def test_sources_sharing_a_stem_get_their_own_thumbnails(self):
+        png = self.lead_with_image('photo.png')
+        jpg = self.lead_with_image('photo.jpg', image_format='JPEG')
+        same = self.lead_with_image('photo.png', color='blue')
+        names = [set(thumbnail_names(lead.image_thumbnails)) for lead in (png, jpg, same)]
+        self.assertEqual(len(names[0] | names[1] | names[2]), 3 * 6)
+        self.assertIn('_png_256.webp', png.image_thumbnails['medium']['webp'])
+
+        # Re-rendering one row leaves the others' files alone
+        generate_thumbnails(Lead, png.pk)
+        self.assertFilesExist(names[1] | names[2])
+        self.assertFilesExist([png.image.name, jpg.image.name, same.image.name])
+
+    def test_stale_save_keeps_recorded_thumbnails(self):
+        lead = Lead.objects.create(owner=self.alice, name='Lead', image=image_file('photo.png'))
+        stale = Lead.objects.get(pk=lead.pk)
+        thumbnails = generate_thumbnails(Lead, lead.pk)
+        stale.name = 'Renamed'
+        stale.save()
+        lead.refresh_from_db()
+        self.assertEqual(lead.image_thumbnails, thumbnails)
+
+    def test_replacing_the_image_deletes_its_thumbnails(self):
+        lead = self.lead_with_image('photo.png')
+        old_names = thumbnail_names(lead.image_thumbnails)
+        lead.image = image_file('other.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            lead.save()
+        lead.refresh_from_db()
+        self.assertEqual(lead.image_thumbnails, {})
+        self.assertFilesExist(old_names, exist=False)
+
+    def test_render_for_a_replaced_image_is_discarded(self):
+        lead = Lead.objects.create(owner=self.alice, name='Lead', image=image_file('photo.png'))
+
+        def render_while_replaced(field_file):
+            # Another request replaces the image while this render runs
+            Lead.objects.filter(pk=lead.pk).update(image='leads/elsewhere.png')
+            return {'small': {'webp': default_storage.save('leads/orphan.webp', ContentFile(b'x'))}}
+
+        with mock.patch('crmbackend.thumbnails.render_thumbnails', side_effect=render_while_replaced):
+            self.assertIsNone(generate_thumbnails(Lead, lead.pk))
+        self.assertFalse(default_storage.exists('leads/orphan.webp'))
+        lead.refresh_from_db()
+        self.assertEqual(lead.image_thumbnails, {})
+
+    def test_merge_carries_the_donors_thumbnails(self):
+        survivor = Lead.objects.create(owner=self.alice, name='Survivor')
+        donor = self.lead_with_image('photo.png')
+        merge_leads(survivor, [donor])
+        survivor.refresh_from_db()
+        self.assertEqual(survivor.image.name, donor.image.name)
+        self.assertEqual(survivor.image_thumbnails, donor.image_thumbnails)
+        self.assertFilesExist(thumbnail_names(survivor.image_thumbnails))
+
+    def test_merge_schedules_a_render_when_the_donor_has_none(self):
+        survivor = Lead.objects.create(owner=self.alice, name='Survivor')
+        donor = Lead.objects.create(owner=self.alice, name='Donor', image=image_file('photo.png'))
+        with mock.patch('leads.dedup.schedule_thumbnails') as schedule:
+            merge_leads(survivor, [donor])
+        schedule.assert_called_once_with(survivor)
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LeadViewSet
+from .views import LeadViewSet, LeadImportViewSet
 
 router = DefaultRouter()
 router.register(r'leads', LeadViewSet, basename='lead')
+router.register(r'lead-imports', LeadImportViewSet, basename='lead-import')
 
 urlpatterns = [
     path('', include(router.urls)),
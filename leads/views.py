@@ -1,43 +1,147 @@
+import math
+
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.shortcuts import get_object_or_404
-from django.db import models
-from django.apps import apps
-from .models import Lead, LeadNote, LeadActivity
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from crmbackend.facets import facet_counts, params_digest
+from crmbackend.pagination import KeysetPagination
+from dashboard.cache import FACETS_CACHE_TTL, get_or_build
+from .bulk import bulk_delete_leads, bulk_update_leads
+from .conversion import convert_leads
+from .dedup import find_duplicate_groups, merge_leads
+from .exports import EXPORT_FIELDS, EXPORT_FORMATS, stream_leads
+from .imports import schedule_import
+from .models import Lead, LeadNote, LeadActivity, LeadImportJob
+from .search import search_leads
 from .serializers import (
     LeadSerializer, LeadListSerializer,
-    LeadNoteSerializer, LeadActivitySerializer
+    LeadNoteSerializer, LeadActivitySerializer,
+    LeadImportJobSerializer, LeadImportUploadSerializer,
+    LeadMergeSerializer, NESTED_PREVIEW_LIMIT,
+    LeadNoteBatchSerializer, LeadActivityBatchSerializer, LeadConvertSerializer,
+    LeadBulkSelectionSerializer, LeadBulkUpdateSerializer,
 )
 
 
-def get_lead_queryset(request):
+# Filters that are also facets; the facets endpoint applies them itself
+LEAD_FACETS = {
+    'stage': Lead.STAGE_CHOICES,
+    'status': Lead.STATUS_CHOICES,
+    'source': Lead.SOURCE_CHOICES,
+}
+LEAD_FILTER_PARAMS = ['stage', 'status', 'source', 'min_score', 'search']
+
+
+def get_lead_queryset(request, apply_facets=True, params=None):
+    """The user's leads filtered by params (default: the query string)"""
     if not request or not request.user.is_authenticated:
         return Lead.objects.none()
 
+    params = request.query_params if params is None else params
     queryset = Lead.objects.filter(owner=request.user)
 
-    stage = request.query_params.get('stage')
-    if stage:
-        queryset = queryset.filter(stage=stage)
+    if apply_facets:
+        for field in LEAD_FACETS:
+            value = params.get(field)
+            if value:
+                queryset = queryset.filter(**{field: value})
 
-    status_param = request.query_params.get('status')
-    if status_param:
-        queryset = queryset.filter(status=status_param)
+    min_score = params.get('min_score')
+    if min_score:
+        try:
+            min_score = float(min_score)
+        except ValueError:
+            min_score = math.nan
+        if not math.isfinite(min_score):
+            raise ValidationError({'min_score': 'Must be a number.'})
+        queryset = queryset.filter(score__gte=min_score)
 
-    search = request.query_params.get('search')
+    search = params.get('search')
     if search:
-        queryset = queryset.filter(
-            models.Q(name__icontains=search) |
-            models.Q(email__icontains=search) |
-            models.Q(company__icontains=search) |
-            models.Q(phone__icontains=search)
-        )
+        queryset = search_leads(queryset, search)
 
     return queryset
 
-class LeadViewSet(viewsets.ModelViewSet):
+
+def _history_count(model):
+    return Coalesce(Subquery(
+        model.objects.filter(lead=OuterRef('pk')).order_by()
+        .values('lead').annotate(total=Count('id')).values('total')
+    ), 0)
+
+
+def with_recent_history(queryset):
+    """Prefetch the latest notes and activities, with authors, embedded in lead detail"""
+    return queryset.select_related('owner').annotate(
+        notes_count=_history_count(LeadNote),
+        activities_count=_history_count(LeadActivity),
+    ).prefetch_related(
+        Prefetch(
+            'lead_notes',
+            queryset=LeadNote.objects.select_related('created_by')
+            .order_by('-created_at', '-id')[:NESTED_PREVIEW_LIMIT],
+            to_attr='recent_notes',
+        ),
+        Prefetch(
+            'activities',
+            queryset=LeadActivity.objects.select_related('created_by')
+            .order_by('-activity_date', '-id')[:NESTED_PREVIEW_LIMIT],
+            to_attr='recent_activities',
+        ),
+    )
+
+
+class LeadPagination(KeysetPagination):
+    page_size = 25
+    max_page_size = 100
+    # Non-null columns only, so the keyset predicate never has to handle NULLs
+    ordering_fields = ['created_at', 'updated_at', 'name', 'value', 'stage', 'status', 'score']
+    
+    def get_ordering(self, request, queryset):
+        # Ranked search results default to relevance order
+        if 'search_rank' in queryset.query.annotations and not request.query_params.get(self.ordering_query_param):
+            return '-search_rank'
+        return super().get_ordering(request, queryset)
+
+
+# Upper bound on items accepted by a single batch_* request
+MAX_LEAD_BATCH_SIZE = 500
+
+
+class LeadNotePagination(KeysetPagination):
+    page_size = 20
+    max_page_size = 100
+
+
+class LeadActivityPagination(LeadNotePagination):
+    ordering = '-activity_date'
+
+
+class LeadListMixin:
+    """Cursor-paginated lead listing that only selects the requested columns"""
+    pagination_class = LeadPagination
+    
+    def get_list_queryset(self):
+        queryset = get_lead_queryset(self.request)
+        columns = {'id', self.paginator.get_ordering(self.request, queryset).lstrip('-')}
+        for name in LeadListSerializer.get_requested_fields(self.request):
+            if name == 'owner_email':
+                columns.add('owner__email')
+            else:
+                columns.add(name)
+        columns.discard('search_rank')
+        if 'owner__email' in columns:
+            queryset = queryset.select_related('owner')
+        return queryset.only(*columns)
+
+
+class LeadViewSet(LeadListMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_serializer_class(self):
@@ -46,18 +150,240 @@ class LeadViewSet(viewsets.ModelViewSet):
         return LeadSerializer
     
     def get_queryset(self):
+        if self.action == 'list':
+            return self.get_list_queryset()
+        if self.action in ('retrieve', 'update', 'partial_update'):
+            return with_recent_history(get_lead_queryset(self.request))
         return get_lead_queryset(self.request)
     
+    def _paginated_history(self, queryset, paginator, serializer_class):
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+    
+    def _add_history(self, lead, serializer_class):
+        serializer = serializer_class(data=self.request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        serializer.save(lead=lead, created_by=self.request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    def _batch_items(self, key):
+        items = self.request.data.get(key) if isinstance(self.request.data, dict) else self.request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'detail': f'Expected a non-empty list of {key}.'})
+        if len(items) > MAX_LEAD_BATCH_SIZE:
+            raise ValidationError({'detail': f'At most {MAX_LEAD_BATCH_SIZE} {key} can be added per request.'})
+        return items
+    
+    def _create_batch(self, model, serializer_class, key):
+        """Validate a list of items for the user's leads and insert them with one bulk_create"""
+        serializer = serializer_class(data=self._batch_items(key), many=True)
+        serializer.is_valid(raise_exception=True)
+        
+        lead_ids = {item['lead_id'] for item in serializer.validated_data}
+        owned = set(Lead.objects.filter(owner=self.request.user, id__in=lead_ids).values_list('id', flat=True))
+        missing = lead_ids - owned
+        if missing:
+            raise ValidationError({'lead_id': f'Leads not found: {", ".join(map(str, sorted(missing)))}.'})
+        
+        created = model.objects.bulk_create([
+            model(created_by=self.request.user, **item) for item in serializer.validated_data
+        ])
+        return Response({'created': len(created)}, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get', 'post'], url_path='notes')
+    def notes(self, request, pk=None):
+        """Full note history for a lead, newest first; POST adds a note"""
+        lead = self.get_object()
+        if request.method == 'POST':
+            return self._add_history(lead, LeadNoteSerializer)
+        return self._paginated_history(
+            LeadNote.objects.filter(lead=lead).select_related('created_by'),
+            LeadNotePagination(),
+            LeadNoteSerializer,
+        )
+    
+    @action(detail=True, methods=['get', 'post'], url_path='activities')
+    def activities(self, request, pk=None):
+        """Full activity history for a lead, most recent first; POST adds an activity"""
+        lead = self.get_object()
+        if request.method == 'POST':
+            return self._add_history(lead, LeadActivitySerializer)
+        return self._paginated_history(
+            LeadActivity.objects.filter(lead=lead).select_related('created_by'),
+            LeadActivityPagination(),
+            LeadActivitySerializer,
+        )
+    
+    @action(detail=False, methods=['post'])
+    def batch_notes(self, request):
+        """Add notes to many leads with a single insert"""
+        return self._create_batch(LeadNote, LeadNoteBatchSerializer, 'notes')
+    
+    @action(detail=False, methods=['post'])
+    def batch_activities(self, request):
+        """Add activities to many leads with a single insert"""
+        return self._create_batch(LeadActivity, LeadActivityBatchSerializer, 'activities')
+    
+    @action(detail=True, methods=['post'])
+    def convert(self, request, pk=None):
+        """Convert lead to deal"""
+        lead = self.get_object()
+        converted = convert_leads(request.user, [lead.id])
+        if not converted:
+            return Response(
+                {'detail': 'Lead has already been converted.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        _, deal = converted[0]
+        return Response({
+            'message': 'Lead converted to deal successfully',
+            'deal_id': deal.id
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'])
+    def batch_convert(self, request):
+        """Convert many leads to deals in one transaction"""
+        serializer = LeadConvertSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lead_ids = serializer.validated_data['lead_ids']
+        
+        converted = convert_leads(request.user, lead_ids)
+        converted_ids = {lead.id for lead, _ in converted}
+        return Response({
+            'converted': len(converted),
+            'deals': [{'lead_id': lead.id, 'deal_id': deal.id} for lead, deal in converted],
+            # Not found, not owned or already converted
+            'skipped': sorted(set(lead_ids) - converted_ids),
+        }, status=status.HTTP_201_CREATED if converted else status.HTTP_200_OK)
+    
+    def _bulk_selection(self, data):
+        """Queryset of the leads a bulk request selects by ids or filters"""
+        if 'ids' in data:
+            return get_lead_queryset(self.request, params={}).filter(id__in=data['ids'])
+        unknown = set(data['filters']) - set(LEAD_FILTER_PARAMS)
+        if unknown:
+            raise ValidationError({'filters': f'Unknown filters: {", ".join(sorted(unknown))}.'})
+        return get_lead_queryset(self.request, params=data['filters'])
+    
+    @action(detail=False, methods=['post'])
+    def bulk_update(self, request):
+        """Set the same fields on many leads with one UPDATE"""
+        serializer = LeadBulkUpdateSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        leads = self._bulk_selection(serializer.validated_data)
+        updated = bulk_update_leads(request.user, leads, serializer.validated_data['patch'])
+        return Response({'updated': updated})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_delete(self, request):
+        """Delete many leads, in chunks"""
+        serializer = LeadBulkSelectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        deleted = bulk_delete_leads(request.user, self._bulk_selection(serializer.validated_data))
+        return Response({'deleted': deleted})
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the filtered leads as CSV or NDJSON"""
+        # Not ?format=, which DRF reserves for renderer selection
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {'file_format': f'Must be one of: {", ".join(EXPORT_FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        fields = EXPORT_FIELDS
+        if request.query_params.get('fields'):
+            fields = [name.strip() for name in request.query_params['fields'].split(',') if name.strip()]
+            unknown = [name for name in fields if name not in EXPORT_FIELDS]
+            if unknown:
+                return Response(
+                    {'fields': f'Unknown fields: {", ".join(unknown)}.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        response = StreamingHttpResponse(
+            stream_leads(self.get_queryset(), fields, file_format),
+            content_type=EXPORT_FORMATS[file_format],
+        )
+        filename = f"leads-{timezone.now():%Y%m%d}.{file_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Lead counts per stage, status and source for the current search and filters"""
+        selected = {
+            field: (lambda value, wanted=request.query_params[field]: value == wanted)
+            for field in LEAD_FACETS if request.query_params.get(field)
+        }
+        data = get_or_build(
+            f'lead_facets:{params_digest(request.query_params, LEAD_FILTER_PARAMS)}', request.user.id,
+            lambda: facet_counts(get_lead_queryset(request, apply_facets=False), LEAD_FACETS, selected),
+            FACETS_CACHE_TTL,
+        )
+        return Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def duplicates(self, request):
+        """List groups of likely duplicate leads"""
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            limit = 50
+        
+        groups = find_duplicate_groups(Lead.objects.filter(owner=request.user))
+        shown = groups[:limit]
+        leads = Lead.objects.in_bulk([lead_id for ids, _ in shown for lead_id in ids])
+        context = self.get_serializer_context()
+        
+        return Response({
+            'count': len(groups),
+            'results': [
+                {
+                    'matched_on': matched_on,
+                    'leads': LeadListSerializer([leads[lead_id] for lead_id in ids], many=True, context=context).data,
+                }
+                for ids, matched_on in shown
+            ],
+        })
+    
+    @action(detail=True, methods=['post'])
+    def merge(self, request, pk=None):
+        """Merge duplicate leads into this one"""
+        serializer = LeadMergeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        duplicate_ids = set(serializer.validated_data['duplicate_ids'])
+        
+        survivor = self.get_object()
+        duplicate_ids.discard(survivor.id)
+        duplicates = list(
+            Lead.objects.filter(owner=request.user, id__in=duplicate_ids).order_by('created_at')
+        )
+        missing = duplicate_ids - {lead.id for lead in duplicates}
+        if missing or not duplicates:
+            return Response(
+                {'duplicate_ids': f'Leads not found: {", ".join(map(str, sorted(missing)))}.'
+                 if missing else 'Give at least one other lead to merge.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        survivor = merge_leads(survivor, duplicates)
+        data = LeadSerializer(survivor, context=self.get_serializer_context()).data
+        return Response({'merged': len(duplicates), 'lead': data})
+    
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 
-class ListLeadAPIView(generics.ListAPIView):
+class ListLeadAPIView(LeadListMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = LeadListSerializer
 
     def get_queryset(self):
-        return get_lead_queryset(self.request)
+        return self.get_list_queryset()
 
 
 class CreateLeadAPIView(generics.CreateAPIView):
@@ -66,61 +392,29 @@ class CreateLeadAPIView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
+
+
+class LeadImportViewSet(viewsets.ReadOnlyModelViewSet):
+    """Upload lead spreadsheets and poll the background import"""
+    permission_classes = [IsAuthenticated]
+    serializer_class = LeadImportJobSerializer
     
-    @action(detail=True, methods=['post'])
-    def notes(self, request, pk=None):
-        """Add a note to a lead"""
-        lead = self.get_object()
-        serializer = LeadNoteSerializer(data=request.data)
-        
-        if serializer.is_valid():
-            serializer.save(lead=lead, created_by=request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    def get_queryset(self):
+        return LeadImportJob.objects.filter(owner=self.request.user)
     
-    @action(detail=True, methods=['post'])
-    def activities(self, request, pk=None):
-        """Add an activity to a lead"""
-        lead = self.get_object()
-        serializer = LeadActivitySerializer(data=request.data)
+    def create(self, request):
+        """Queue a CSV or XLSX file for import; poll the returned job for progress"""
+        upload = LeadImportUploadSerializer(data=request.data)
+        upload.is_valid(raise_exception=True)
+        file = upload.validated_data['file']
         
-        if serializer.is_valid():
-            serializer.save(lead=lead, created_by=request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    
-    @action(detail=True, methods=['post'])
-    def convert(self, request, pk=None):
-        """Convert lead to deal"""
-        lead = self.get_object()
-        
-        # Create a deal from this lead (requires deals app)
-        # This is a placeholder - implement based on your deals model
-        try:
-            Deal = apps.get_model('deals', 'Deal')
-        except LookupError:
-            return Response(
-                {'detail': 'Deals app is not installed.'},
-                status=status.HTTP_501_NOT_IMPLEMENTED,
-            )
-        
-        deal = Deal.objects.create(
-            name=f"Deal with {lead.company or lead.name}",
-            contact_name=lead.name,
-            contact_email=lead.email,
-            contact_phone=lead.phone,
-            company=lead.company,
-            value=lead.value,
-            stage='Qualification',
+        job = LeadImportJob.objects.create(
             owner=request.user,
-            source_lead=lead
+            file=file,
+            original_name=file.name,
+            file_format=file.name.rsplit('.', 1)[-1].lower(),
         )
+        schedule_import(job)
         
-        # Update lead status
-        lead.status = 'Converted'
-        lead.save()
-        
-        return Response({
-            'message': 'Lead converted to deal successfully',
-            'deal_id': deal.id
-        }, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        serializer = self.get_serializer(job)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
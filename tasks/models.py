@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
+from crmbackend.thumbnails import prepare_thumbnails, schedule_thumbnails
+
 
 class Task(models.Model):
     PRIORITY_CHOICES = [
@@ -42,6 +44,7 @@ class Task(models.Model):
     
     # Cover image
     image = models.ImageField(upload_to='task_images/', null=True, blank=True)
+    image_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -56,10 +59,23 @@ class Task(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # The list is "created by OR assigned to" the user, optionally by stage
+        indexes = [
+            models.Index(fields=['created_by', '-created_at'], name='task_creator_created_idx'),
+            models.Index(fields=['assigned_to', '-created_at'], name='task_assignee_created_idx'),
+            models.Index(fields=['created_by', 'stage', '-created_at'], name='task_creator_stage_idx'),
+            models.Index(fields=['assigned_to', 'stage', '-created_at'], name='task_assignee_stage_idx'),
+        ]
         
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        image_uploaded = prepare_thumbnails(self, kwargs)
+        super().save(*args, **kwargs)
+        if image_uploaded:
+            schedule_thumbnails(self)
+    
     @property
     def priority_color(self):
         colors = {
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from crmbackend.serializers import ThumbnailsField
 from .models import Task, TaskComment, TaskAttachment
 from django.contrib.auth.models import User
 
@@ -72,12 +73,13 @@ class TaskSerializer(serializers.ModelSerializer):
     activity = serializers.SerializerMethodField()
     commentsList = TaskCommentSerializer(source='comments', many=True, read_only=True)
     attachmentsList = TaskAttachmentSerializer(source='attachments', many=True, read_only=True)
+    image_thumbnails = ThumbnailsField()
     
     class Meta:
         model = Task
         fields = [
             'id', 'title', 'description', 'client', 'priority', 
-            'due_date', 'stage', 'assignee', 'image', 
+            'due_date', 'stage', 'assignee', 'image', 'image_thumbnails', 
             'priority_color', 'is_overdue', 'activity',
             'commentsList', 'attachmentsList',
             'created_at', 'updated_at'
@@ -1,3 +1,24 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import Q
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Task
+
+
+@skipUnless(connection.vendor == 'sqlite', "Asserts on SQLite query plans")
+class TaskListIndexTests(TestCase):
+
+    def test_created_by_or_assigned_to_uses_both_indexes(self):
+        plan = Task.objects.filter(Q(created_by_id=1) | Q(assigned_to_id=1)).order_by('-created_at').explain()
+        self.assertIn('task_creator_created_idx', plan)
+        self.assertIn('task_assignee_created_idx', plan)
+
+    def test_stage_tab_uses_stage_indexes(self):
+        plan = (
+            Task.objects.filter(Q(created_by_id=1) | Q(assigned_to_id=1), stage='To Do')
+            .order_by('-created_at').explain()
+        )
+        self.assertIn('task_creator_stage_idx', plan)
+        self.assertIn('task_assignee_stage_idx', plan)